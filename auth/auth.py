@@ -1,19 +1,22 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from dataclasses import dataclass
+import hashlib
 import os
 
-from models.database import get_db, Usuario
+from models.database import get_db, SessionLocal, Usuario
+from utils import cache, metricas
+from auth.hashing import pwd_context
 
 SECRET_KEY = os.getenv("SECRET_KEY", "llave")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 def get_password_hash(password):
@@ -27,7 +30,73 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPBearer = Depends(security), db: Session = Depends(get_db)):
+# ===============================
+# Principal autenticado (cacheado)
+# ===============================
+
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "10000"))
+
+# token (hash) -> (principal, versión "auth" del usuario al cachearlo).
+# Los principales siempre viven en el proceso; la versión "auth" vive en
+# cache.backend. Con varios workers, una invalidación solo llega a los demás
+# si CACHE_BACKEND=redis: con "memoria" cada worker tiene sus versiones y
+# sigue sirviendo su principal hasta AUTH_CACHE_TTL.
+_principales = cache.MemoriaBackend(max_entradas=AUTH_CACHE_MAX)
+_stats = {"hits": 0, "misses": 0}
+
+
+@dataclass(frozen=True)
+class UsuarioPrincipal:
+    """
+    Lo que los handlers usan del usuario autenticado, sin sesión de BD.
+    Si un handler necesita el Usuario ORM completo: principal.cargar(db)
+    o la dependencia get_current_usuario.
+    """
+    id: int
+    nombre: str
+    apellidos: str
+    telefono: int
+    correo: str
+    fecha_creacion: Optional[datetime]
+
+    def cargar(self, db: Session) -> Optional[Usuario]:
+        return db.get(Usuario, self.id)
+
+
+def _llave_token(token: str) -> str:
+    # No se guarda el token en claro
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cargar_principal(user_id: int) -> Optional[UsuarioPrincipal]:
+    db = SessionLocal()
+    try:
+        user = db.query(Usuario).filter(Usuario.id == user_id).first()
+        if user is None:
+            return None
+        return UsuarioPrincipal(
+            id=user.id,
+            nombre=user.nombre,
+            apellidos=user.apellidos,
+            telefono=user.telefono,
+            correo=user.correo,
+            fecha_creacion=user.fecha_creacion,
+        )
+    finally:
+        db.close()
+
+
+def invalidar_usuario(user_id: int) -> None:
+    """
+    Descarta de inmediato los principales cacheados del usuario (todas sus
+    sesiones). Llamar después de actualizar o eliminar el usuario.
+    Entre workers requiere CACHE_BACKEND=redis (ver _principales).
+    """
+    cache.invalidar(user_id, "auth")
+
+
+async def get_current_user(credentials: HTTPBearer = Depends(security)) -> UsuarioPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -38,10 +107,36 @@ async def get_current_user(credentials: HTTPBearer = Depends(security), db: Sess
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
-    
-    user = db.query(Usuario).filter(Usuario.id == int(user_id)).first()
-    if user is None:
+
+    llave = _llave_token(credentials.credentials)
+    entrada = _principales.get(llave)
+    if entrada is not None:
+        principal, version = entrada
+        if version == await cache.version_async(user_id, "auth"):
+            _stats["hits"] += 1
+            return principal
+
+    _stats["misses"] += 1
+    version = await cache.version_async(user_id, "auth")
+    principal = await run_in_threadpool(_cargar_principal, user_id)
+    if principal is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    _principales.set(llave, (principal, version), AUTH_CACHE_TTL)
+    return principal
+
+
+def get_current_usuario(
+    principal: UsuarioPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Usuario:
+    """Usuario ORM completo, para los handlers que lo necesiten."""
+    user = principal.cargar(db)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuario no encontrado")
+    return user
+
+
+metricas.registrar("auth", lambda: {**_stats, "principales": _principales.tamano()})
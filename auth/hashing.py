@@ -0,0 +1,121 @@
+# auth/hashing.py
+"""
+Hash/verificación bcrypt fuera del event loop y fuera del threadpool.
+
+Cada hash cuesta ~250 ms de CPU. Se ejecutan en un ProcessPoolExecutor de
+tamaño fijo (BCRYPT_WORKERS) con una cola acotada (BCRYPT_MAX_COLA): si se
+llena, se responde 503 en vez de dejar que un pico de logins bloquee al
+resto de endpoints.
+
+Este módulo solo importa passlib: los procesos hijos (spawn) lo importan
+sin cargar la app ni abrir conexiones a la BD.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from utils import metricas
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_MAX_COLA = int(os.getenv("BCRYPT_MAX_COLA", "64"))
+
+# min_rounds == max_rounds == rounds: needs_update() marca cualquier hash con
+# otro costo y verify_and_update() devuelve el hash nuevo.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+# --- Funciones que corren en el proceso hijo ---
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verificar(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+# --- Pool y métricas (proceso de la API) ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_stats = {"pendientes": 0, "completadas": 0, "fallidas": 0, "rechazadas": 0, "segundos": 0.0}
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=BCRYPT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def cerrar_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _ejecutar(fn, *args):
+    if _stats["pendientes"] >= BCRYPT_MAX_COLA:
+        _stats["rechazadas"] += 1
+        raise HTTPException(status_code=503, detail="Servidor ocupado, intenta de nuevo")
+
+    _stats["pendientes"] += 1
+    inicio = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        resultado = await loop.run_in_executor(_obtener_pool(), fn, *args)
+    except Exception:
+        # Hash inválido, proceso hijo caído, etc.: no cuentan en el promedio
+        _stats["fallidas"] += 1
+        raise
+    else:
+        _stats["completadas"] += 1
+        _stats["segundos"] += time.perf_counter() - inicio
+        return resultado
+    finally:
+        _stats["pendientes"] -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _ejecutar(_hash, password)
+
+
+async def verificar_password_async(password: str, hashed: str) -> tuple[bool, Optional[str]]:
+    """
+    Devuelve (válida, hash_nuevo). hash_nuevo no es None cuando el hash
+    guardado usa parámetros viejos y debe reemplazarse.
+    """
+    return await _ejecutar(_verificar, password, hashed)
+
+
+def estadisticas() -> dict:
+    completadas = _stats["completadas"]
+    return {
+        "workers": BCRYPT_WORKERS,
+        "rounds": BCRYPT_ROUNDS,
+        "max_cola": BCRYPT_MAX_COLA,
+        "pendientes": _stats["pendientes"],
+        "completadas": completadas,
+        "fallidas": _stats["fallidas"],
+        "rechazadas": _stats["rechazadas"],
+        "promedio_ms": round(_stats["segundos"] / completadas * 1000, 1) if completadas else 0.0,
+    }
+
+
+metricas.registrar("bcrypt", estadisticas)
@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import datetime
+import anyio
 
-from routers import usuarios, lista_cuentas, categoria_metodos, categorias, subcategorias, registros, deudas, dashboard, presupuestos, pagos_fijos, objetivos
+from utils import metricas
+from models.database import THREADPOOL_LIMIT
+from auth.hashing import cerrar_pool
+from utils import sms, catalogo, condicional
+from routers import usuarios, lista_cuentas, categoria_metodos, categorias, subcategorias, catalogo as catalogo_router, registros, deudas, dashboard, presupuestos, pagos_fijos, objetivos, home
 app = FastAPI(
     title="Lana App API",
     description="API para control de finanzas personales",
@@ -17,12 +22,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El cliente web necesita leer el ETag para mandarlo en If-None-Match
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(condicional.MedidorETag)
+
+# Limitador del threadpool; se guarda al arrancar porque solo se puede
+# obtener desde el event loop y /metricas corre en un hilo
+_limitador = None
+
+@app.on_event("startup")
+async def configurar_threadpool():
+    global _limitador
+    # Handlers sync: hilos acotados a la capacidad del pool de conexiones
+    _limitador = anyio.to_thread.current_default_thread_limiter()
+    _limitador.total_tokens = THREADPOOL_LIMIT
+
+@app.on_event("startup")
+def cargar_catalogo():
+    # Si la BD aún no responde, el catálogo se carga en el primer uso
+    try:
+        catalogo.cargar()
+    except Exception as e:
+        print(f"[CATALOGO] carga inicial fallida: {e}")
+
+@app.on_event("shutdown")
+def detener_pool_bcrypt():
+    cerrar_pool()
+
+@app.on_event("shutdown")
+async def cerrar_cliente_sms():
+    await sms.cerrar()
+
+def _metricas_threadpool() -> dict:
+    if _limitador is None:
+        return {"limite": THREADPOOL_LIMIT, "en_uso": None}
+    # en_uso incluye el hilo que está respondiendo /metricas
+    return {"limite": _limitador.total_tokens, "en_uso": _limitador.borrowed_tokens}
+
+metricas.registrar("threadpool", _metricas_threadpool)
 
 app.include_router(usuarios.router)
 app.include_router(categorias.router)
 app.include_router(subcategorias.router)
 app.include_router(categoria_metodos.router)
+app.include_router(catalogo_router.router)
 app.include_router(lista_cuentas.router)
 app.include_router(registros.router)
 app.include_router(deudas.router)
@@ -30,10 +74,16 @@ app.include_router(presupuestos.router)
 app.include_router(pagos_fijos.router)
 app.include_router(dashboard.router)
 app.include_router(objetivos.router)
+app.include_router(home.router)
 
 @app.get("/")
 async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+
+@app.get("/metricas")
+def ver_metricas():
+    # def (threadpool): varios proveedores consultan la BD o redis de forma sync
+    return metricas.snapshot()
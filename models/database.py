@@ -1,18 +1,163 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Float, func, Text, Enum, Numeric
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Date, ForeignKey, Float, func, Text, Enum, Numeric, UniqueConstraint, Index
 from sqlalchemy.orm import sessionmaker, Session, relationship, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
 
+from utils import metricas
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 print("DATABASE_URL:", DATABASE_URL)  # debug temporal
-engine = create_engine(DATABASE_URL)
+
+# ===============================
+# Presupuesto de concurrencia
+# ===============================
+# Pool de conexiones y threadpool de anyio se configuran juntos: por defecto
+# el threadpool tiene tantos hilos como conexiones puede dar el pool sync
+# (pool_size + max_overflow), así ningún handler sync se queda esperando
+# checkout hasta el timeout.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # < wait_timeout de MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+THREADPOOL_LIMIT = int(os.getenv("THREADPOOL_LIMIT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+# Pool de la ruta async (no consume hilos, puede ser distinto)
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", str(DB_POOL_SIZE)))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+
+
+class _EsperaCheckout:
+    """Acumula el tiempo que se espera por una conexión del pool."""
+
+    BUCKETS = (0.001, 0.01, 0.1, 1.0, 5.0)
+
+    def __init__(self):
+        self.total = 0
+        self.segundos = 0.0
+        self.maximo = 0.0
+        self.buckets = {b: 0 for b in self.BUCKETS}
+
+    def registrar(self, segundos: float) -> None:
+        self.total += 1
+        self.segundos += segundos
+        self.maximo = max(self.maximo, segundos)
+        for b in self.BUCKETS:
+            if segundos <= b:
+                self.buckets[b] += 1
+                break
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.total,
+            "espera_promedio_ms": round(self.segundos / self.total * 1000, 3) if self.total else 0.0,
+            "espera_max_ms": round(self.maximo * 1000, 3),
+            "espera_hasta_s": {str(b): n for b, n in self.buckets.items()},
+        }
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que mide la espera de cada checkout."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.espera = _EsperaCheckout()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.espera.registrar(time.perf_counter() - inicio)
+
+
+class PoolMedidoAsync(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.espera = _EsperaCheckout()
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.espera.registrar(time.perf_counter() - inicio)
+
+
+def _opciones_pool(url: str, poolclass, pool_size: int, max_overflow: int) -> dict:
+    if url.startswith("sqlite"):
+        # sqlite maneja su propio pool; solo aplican los defaults
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, **_opciones_pool(DATABASE_URL, PoolMedido, DB_POOL_SIZE, DB_MAX_OVERFLOW))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def _url_async(url: str) -> str:
+    """
+    Mismo DATABASE_URL con driver async: PyMySQL -> aiomysql, sqlite -> aiosqlite
+    (aiosqlite sirve como sustituto local en pruebas).
+    """
+    for sync_prefix, async_prefix in (
+        ("mysql+pymysql://", "mysql+aiomysql://"),
+        ("mysql://", "mysql+aiomysql://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+# Ruta async para routers de solo lectura (dashboard y listados)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url_async(DATABASE_URL)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **_opciones_pool(ASYNC_DATABASE_URL, PoolMedidoAsync, DB_ASYNC_POOL_SIZE, DB_ASYNC_MAX_OVERFLOW),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def _estado_pool(pool) -> dict:
+    datos = {"clase": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        datos.update({
+            "tamano": pool.size(),
+            "en_uso": pool.checkedout(),
+            "libres": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "capacidad": pool.size() + pool._max_overflow,
+        })
+    if hasattr(pool, "espera"):
+        datos.update(pool.espera.snapshot())
+    return datos
+
+
+def _metricas_db() -> dict:
+    return {
+        "sync": _estado_pool(engine.pool),
+        "async": _estado_pool(async_engine.sync_engine.pool),
+    }
+
+
+metricas.registrar("db", _metricas_db)
+
+
 class Usuario(Base):
     __tablename__ = "usuarios"
 
@@ -70,21 +215,57 @@ class ListaCuenta(Base):
     usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     nombre = Column(String(45), nullable=False)
     cantidad = Column(String(45), nullable=False)
+    # Saldo en centavos (doble escritura con 'cantidad'; ver utils/montos.py)
+    cantidad_centavos = Column(BigInteger, nullable=False)
+    # Saldo de apertura: cantidad_centavos == saldo_inicial + suma de registros
+    # (lo verifica utils/saldos.py conciliar)
+    saldo_inicial_centavos = Column(BigInteger, nullable=True)
 
     usuario = relationship("Usuario", back_populates="lista_cuentas")
     registros = relationship("Registro", back_populates="lista_cuenta")
 
 
+class SaldoDiario(Base):
+    """
+    Corte de saldo de una cuenta al cierre de un día (UTC) con movimientos.
+    Lo escribe utils/historial.py (job diario) y las escrituras de registros
+    con fecha pasada lo desplazan; el saldo a cualquier fecha es el último
+    corte más los registros posteriores.
+    """
+    __tablename__ = "saldos_diarios"
+    __table_args__ = (
+        UniqueConstraint("lista_cuentas_id", "fecha", name="uq_saldo_diario"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    lista_cuentas_id = Column(Integer, ForeignKey("lista_cuentas.id"), nullable=False)
+    fecha = Column(Date, nullable=False)
+    saldo_centavos = Column(BigInteger, nullable=False)
+
+
 class Registro(Base):
     __tablename__ = "registros"
+    __table_args__ = (
+        Index("ix_registros_usuario_fecha_monto", "usuarios_id", "fecha_registro", "monto_centavos"),
+        # Paginación keyset por (fecha_registro, id)
+        Index("ix_registros_usuario_fecha_id", "usuarios_id", "fecha_registro", "id"),
+        # Historial de saldo por cuenta (delta desde el último corte)
+        Index("ix_registros_cuenta_fecha", "lista_cuentas_id", "fecha_registro"),
+        # Deduplicación de importaciones (NULL en registros capturados a mano)
+        Index("uq_registros_usuario_hash", "usuarios_id", "hash_contenido", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     lista_cuentas_id = Column(Integer, ForeignKey("lista_cuentas.id"), nullable=False)
     subCategorias_id = Column(Integer, ForeignKey("subcategorias.id"), nullable=False)
     monto = Column(String(45), nullable=False)
+    # Monto en centavos (doble escritura con 'monto'; ver utils/montos.py)
+    monto_centavos = Column(BigInteger, nullable=False)
     fecha_registro = Column(DateTime, nullable=False, default=datetime.utcnow)
     categori_metodos_id = Column(Integer, ForeignKey("categori_metodos.id"), nullable=False)
+    # sha256 del contenido de la fila importada (ver utils/importacion.py)
+    hash_contenido = Column(String(64), nullable=True)
 
     usuario = relationship("Usuario", back_populates="registros")
     lista_cuenta = relationship("ListaCuenta", back_populates="registros")
@@ -93,6 +274,30 @@ class Registro(Base):
     estadisticas = relationship("Estadistica", back_populates="registro")
 
 
+class ResumenDiario(Base):
+    """
+    Rollup por usuario / día / subcategoría / método de los registros.
+    Se mantiene en la misma transacción que las escrituras de /registros
+    (ver utils/rollups.py) y es lo único que leen las gráficas de /graficos.
+    """
+    __tablename__ = "resumen_diario"
+    __table_args__ = (
+        UniqueConstraint("usuarios_id", "fecha", "subCategorias_id", "categori_metodos_id", name="uq_resumen_diario"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    fecha = Column(Date, nullable=False)
+    subCategorias_id = Column(Integer, nullable=False)
+    # 0 = sin método (NULL rompería la llave única en MySQL)
+    categori_metodos_id = Column(Integer, nullable=False, default=0)
+    ingresos = Column(Numeric(14, 2), nullable=False, default=0)
+    gastos = Column(Numeric(14, 2), nullable=False, default=0)  # valor absoluto
+    cantidad_ingresos = Column(Integer, nullable=False, default=0)
+    cantidad_gastos = Column(Integer, nullable=False, default=0)
+    cantidad_movimientos = Column(Integer, nullable=False, default=0)
+
+
 class Deuda(Base):
     __tablename__ = "deudas"
 
@@ -131,11 +336,85 @@ class Presupuesto(Base):
     monto_limite = Column(Float, nullable=False)
     estado = Column(Enum("activo", "inactivo", name="estado_presupuesto"), nullable=False, server_default="activo")
     fecha_creacion = Column(DateTime, nullable=True, server_default=func.now())
+    # 'unico' (acumula desde fecha_creacion) | 'semanal' | 'mensual'
+    periodo = Column(String(10), nullable=False, server_default="unico")
+    # Inicio del periodo abierto (NULL en 'unico': se usa fecha_creacion)
+    periodo_inicio = Column(DateTime, nullable=True)
+    # Acumulado de gastos del periodo abierto; lo mantiene utils/gastado.py
+    gastado_centavos = Column(BigInteger, nullable=False, server_default="0")
 
     usuario = relationship("Usuario", back_populates="presupuestos")
     categoria = relationship("Categoria", back_populates="presupuestos")
 
 
+class PresupuestoPeriodo(Base):
+    """
+    Foto inmutable de un periodo cerrado de un presupuesto recurrente. Se
+    escribe una sola vez al cerrar el periodo (utils/gastado.cerrar_periodos)
+    y el historial se sirve desde aquí sin recalcular.
+    """
+    __tablename__ = "presupuesto_periodos"
+    __table_args__ = (
+        UniqueConstraint("presupuestos_id", "inicio", name="uq_presupuesto_periodo"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    presupuestos_id = Column(Integer, ForeignKey("presupuestos.id"), nullable=False)
+    usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    inicio = Column(DateTime, nullable=False)
+    fin = Column(DateTime, nullable=False)  # exclusivo
+    monto_limite = Column(Float, nullable=False)
+    gastado_centavos = Column(BigInteger, nullable=False)
+    porcentaje_usado = Column(Numeric(7, 2), nullable=False)
+
+
+class PresupuestoAlerta(Base):
+    """
+    Alertas de presupuesto ya emitidas. La llave única (presupuesto, nivel,
+    periodo) hace que cada alerta se emita una sola vez aunque haya varios
+    workers: el que logra insertar la fila es el que envía (utils/alertas.py).
+    """
+    __tablename__ = "presupuesto_alertas"
+    __table_args__ = (
+        UniqueConstraint("presupuestos_id", "nivel", "periodo_inicio", name="uq_presupuesto_alerta"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    presupuestos_id = Column(Integer, ForeignKey("presupuestos.id"), nullable=False)
+    usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    nivel = Column(String(10), nullable=False)  # 'near' | 'exceeded'
+    # Inicio del periodo alertado (fecha_creacion en presupuestos 'unico')
+    periodo_inicio = Column(DateTime, nullable=False)
+    fecha_creacion = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class Notificacion(Base):
+    """
+    Outbox de notificaciones (correo/SMS). Las escrituras de la API solo
+    insertan aquí, en su propia transacción; el worker utils/outbox.py las
+    entrega por lotes con reintentos, así que sobreviven a reinicios.
+    """
+    __tablename__ = "notificaciones_outbox"
+    __table_args__ = (
+        Index("ix_outbox_estado_proximo", "estado", "proximo_intento"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuarios_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True, index=True)
+    canal = Column(String(10), nullable=False)  # 'email' | 'sms'
+    destino = Column(String(255), nullable=False)
+    asunto = Column(String(255), nullable=True)
+    cuerpo = Column(Text, nullable=False)
+    # 'pendiente' | 'enviando' | 'enviada' | 'fallida'
+    estado = Column(String(10), nullable=False, server_default="pendiente")
+    intentos = Column(Integer, nullable=False, server_default="0")
+    # Pendiente: cuándo reintentar. Enviando: vence la reserva del worker.
+    proximo_intento = Column(DateTime, nullable=False, server_default=func.now())
+    ultimo_error = Column(Text, nullable=True)
+    fecha_creacion = Column(DateTime, nullable=False, server_default=func.now())
+    fecha_envio = Column(DateTime, nullable=True)
+
+
 class PagoFijo(Base):
     __tablename__ = "pagos_fijos"
 
@@ -156,3 +435,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional, Union
 class UsuarioResponse(BaseModel):
     id: int
     nombre: str
@@ -104,4 +104,24 @@ class PagoFijoResponse(PagoFijoBase):
     fecha_creacion: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class RegistroBatchOperacion(BaseModel):
+    op: Literal["crear", "actualizar", "eliminar"]
+    # Registro a actualizar/eliminar
+    id: Optional[int] = None
+    # Id del cliente para la operación: en 'crear' hace idempotente el reintento
+    ref: Optional[str] = Field(None, max_length=100)
+    lista_cuentas_id: Optional[int] = None
+    subCategorias_id: Optional[int] = None
+    monto: Optional[Union[str, int, float]] = None
+    # En 'actualizar', null explícito lo quita; si no viene, no cambia
+    categori_metodos_id: Optional[int] = None
+    # Momento de captura (offline); por defecto, ahora
+    fecha_registro: Optional[datetime] = None
+
+class RegistroBatchRequest(BaseModel):
+    operaciones: List[RegistroBatchOperacion]
+    # True: si alguna operación falla no se aplica ninguna
+    atomico: bool = False
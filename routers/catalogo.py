@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, Request, Response
+
+from models.database import Usuario
+from auth.auth import get_current_user
+from utils import catalogo, condicional
+
+router = APIRouter(prefix="/catalogo", tags=["Catalogo"])
+
+@router.get("/")
+def obtener_catalogo(request: Request, current_user: Usuario = Depends(get_current_user)):
+    """
+    Árbol categoría -> subcategorías y métodos de pago en una sola respuesta.
+    Sale del catálogo en memoria (utils/catalogo.py), ya serializado; con
+    If-None-Match igual al ETag vigente responde 304 sin cuerpo.
+    """
+    huella, cuerpo = catalogo.arbol_json()
+    etag = condicional.etag(huella)
+    no_modificado = condicional.no_modificado(request, etag)
+    if no_modificado is not None:
+        return no_modificado
+    return Response(
+        content=cuerpo,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": condicional.CACHE_CONTROL},
+    )
@@ -5,12 +5,13 @@ from typing import List
 from models.database import get_db, CategoriaMetodo, Usuario
 from models.schemas import CategoriaMetodoResponse
 from auth.auth import get_current_user
+from utils import catalogo
 
 router = APIRouter(prefix="/categoria_metodos", tags=["Categoria Metodos"])
 
 @router.get("/", response_model=List[CategoriaMetodoResponse])
-def listar_categoria_metodos(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(CategoriaMetodo).all()
+def listar_categoria_metodos(current_user: Usuario = Depends(get_current_user)):
+    return catalogo.metodos()
 
 @router.post("/", response_model=CategoriaMetodoResponse)
 def crear_categoria_metodo(
@@ -21,6 +22,7 @@ def crear_categoria_metodo(
     db_categoria_metodo = CategoriaMetodo(nombre=nombre)
     db.add(db_categoria_metodo)
     db.commit()
+    catalogo.invalidar()
     db.refresh(db_categoria_metodo)
     return db_categoria_metodo
 
@@ -37,6 +39,7 @@ def actualizar_categoria_metodo(
     
     categoria_metodo.nombre = nombre
     db.commit()
+    catalogo.invalidar()
     db.refresh(categoria_metodo)
     return categoria_metodo
 
@@ -52,4 +55,5 @@ def eliminar_categoria_metodo(
     
     db.delete(categoria_metodo)
     db.commit()
+    catalogo.invalidar()
     return {"mensaje": "Categoría método eliminada exitosamente"}
\ No newline at end of file
@@ -5,12 +5,13 @@ from typing import List
 from models.database import get_db, Categoria, Usuario
 from models.schemas import CategoriaResponse
 from auth.auth import get_current_user
+from utils import catalogo
 
 router = APIRouter(prefix="/categorias", tags=["Categorias"])
 
 @router.get("/", response_model=List[CategoriaResponse])
-def listar_categorias(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Categoria).all()
+def listar_categorias(current_user: Usuario = Depends(get_current_user)):
+    return catalogo.categorias()
 
 @router.post("/", response_model=CategoriaResponse)
 def crear_categoria(
@@ -21,6 +22,7 @@ def crear_categoria(
     db_categoria = Categoria(descripcion=descripcion)
     db.add(db_categoria)
     db.commit()
+    catalogo.invalidar()
     db.refresh(db_categoria)
     return db_categoria
 
@@ -37,6 +39,7 @@ def actualizar_categoria(
     
     categoria.descripcion = descripcion
     db.commit()
+    catalogo.invalidar()
     db.refresh(categoria)
     return categoria
 
@@ -52,4 +55,5 @@ def eliminar_categoria(
     
     db.delete(categoria)
     db.commit()
+    catalogo.invalidar()
     return {"mensaje": "Categoría eliminada exitosamente"}
\ No newline at end of file
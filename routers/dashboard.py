@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, Float, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, extract, case, and_, select
 from datetime import datetime, timedelta
 from typing import Optional
 
-from models.database import get_db, ListaCuenta, Registro, Deuda, Subcategoria, Usuario, CategoriaMetodo
+from models.database import get_async_db, ListaCuenta, Registro, Deuda, Subcategoria, Usuario, CategoriaMetodo, ResumenDiario
 from auth.auth import get_current_user
+from utils import montos, paginacion, cache
 
 router = APIRouter(prefix="/graficos", tags=["Graficos"])
 
@@ -16,70 +17,120 @@ MESES_ESPAÑOL = {
     9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
 }
 
+def _rango_mes(ahora: datetime) -> tuple[datetime, datetime]:
+    """
+    Devuelve [inicio_mes, inicio_mes_siguiente) para filtrar por rango
+    directamente sobre fecha_registro (sin extract, así MySQL usa el índice).
+    """
+    inicio = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if inicio.month == 12:
+        siguiente = inicio.replace(year=inicio.year + 1, month=1)
+    else:
+        siguiente = inicio.replace(month=inicio.month + 1)
+    return inicio, siguiente
+
 @router.get("/resumen")
-def resumen_financiero(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    total_saldo = db.query(func.sum(func.cast(ListaCuenta.cantidad, Float))).filter(
+@cache.cache_por_usuario("resumen")
+async def resumen_financiero(current_user: Usuario = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    inicio_mes, inicio_mes_siguiente = _rango_mes(datetime.now())
+    monto = Registro.monto_centavos
+
+    # Saldo y total de movimientos como subconsultas escalares: todo sale de
+    # UNA sola sentencia, así los cuatro valores corresponden al mismo snapshot.
+    saldo = select(func.sum(ListaCuenta.cantidad_centavos)).where(
         ListaCuenta.usuarios_id == current_user.id
-    ).scalar() or 0
-    
-    total_movimientos = db.query(func.count(Registro.id)).filter(
+    ).scalar_subquery()
+    total_movimientos = select(func.count(Registro.id)).where(
         Registro.usuarios_id == current_user.id
-    ).scalar() or 0
-    
-    ingresos_mes = db.query(func.sum(func.cast(Registro.monto, Float))).filter(
-        Registro.usuarios_id == current_user.id,
-        func.cast(Registro.monto, Float) > 0,
-        extract('month', Registro.fecha_registro) == datetime.now().month,
-        extract('year', Registro.fecha_registro) == datetime.now().year
-    ).scalar() or 0
-    
-    gastos_mes = db.query(func.sum(func.cast(Registro.monto, Float))).filter(
+    ).scalar_subquery()
+
+    # El rango del mes va en el WHERE: solo se recorre el mes sobre
+    # ix_registros_usuario_fecha_monto, no todo el historial del usuario
+    fila = (await db.execute(select(
+        saldo.label('total_saldo'),
+        total_movimientos.label('total_movimientos'),
+        func.sum(case((monto > 0, monto), else_=0)).label('ingresos_mes'),
+        func.sum(case((monto < 0, monto), else_=0)).label('gastos_mes')
+    ).where(
         Registro.usuarios_id == current_user.id,
-        func.cast(Registro.monto, Float) < 0,
-        extract('month', Registro.fecha_registro) == datetime.now().month,
-        extract('year', Registro.fecha_registro) == datetime.now().year
-    ).scalar() or 0
-    
+        Registro.fecha_registro >= inicio_mes,
+        Registro.fecha_registro < inicio_mes_siguiente
+    ))).one()
+
+    total_saldo = montos.a_float(fila.total_saldo)
+    ingresos_mes = montos.a_float(fila.ingresos_mes)
+    gastos_mes = montos.a_float(fila.gastos_mes)
+
     return {
-        "total_saldo": float(total_saldo),
-        "total_movimientos": total_movimientos,
-        "ingresos_mes": float(ingresos_mes),
-        "gastos_mes": float(abs(gastos_mes)),
-        "balance_mes": float(ingresos_mes + gastos_mes),
+        "total_saldo": total_saldo,
+        "total_movimientos": fila.total_movimientos or 0,
+        "ingresos_mes": ingresos_mes,
+        "gastos_mes": abs(gastos_mes),
+        "balance_mes": ingresos_mes + gastos_mes,
         "usuario": f"{current_user.nombre} {current_user.apellidos}"
     }
 
-@router.get("/por-dias")
-def movimientos_por_dias(
-    dias: int = Query(30, description="Número de días hacia atrás", ge=1, le=365),
-    current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
-):
-    fecha_inicio = datetime.now() - timedelta(days=dias)
-    
-    movimientos_diarios = db.query(
-        func.date(Registro.fecha_registro).label('fecha'),
-        func.sum(case((func.cast(Registro.monto, Float) > 0, func.cast(Registro.monto, Float)), else_=0)).label('ingresos'),
-        func.sum(case((func.cast(Registro.monto, Float) < 0, func.abs(func.cast(Registro.monto, Float))), else_=0)).label('gastos'),
-        func.count(Registro.id).label('cantidad_movimientos')
-    ).filter(
-        Registro.usuarios_id == current_user.id,
-        Registro.fecha_registro >= fecha_inicio
-    ).group_by(func.date(Registro.fecha_registro)).order_by('fecha').all()
-    
-    registros_detallados = db.query(
+async def _movimientos_detalle(db: AsyncSession, filtros: list, limite: int, cursor: Optional[str] = None):
+    """
+    Página de movimientos individuales (con nombres de categoría, método y
+    cuenta) ordenada por (fecha_registro, id) descendente.
+    """
+    stmt = select(
         Registro.id,
-        Registro.monto,
+        Registro.monto_centavos,
         Registro.fecha_registro,
         Subcategoria.descripcion.label('categoria'),
         CategoriaMetodo.nombre.label('metodo'),
         ListaCuenta.nombre.label('cuenta')
     ).join(Subcategoria, Registro.subCategorias_id == Subcategoria.id).join(
         CategoriaMetodo, Registro.categori_metodos_id == CategoriaMetodo.id
-    ).join(ListaCuenta, Registro.lista_cuentas_id == ListaCuenta.id).filter(
-        Registro.usuarios_id == current_user.id,
-        Registro.fecha_registro >= fecha_inicio
-    ).order_by(Registro.fecha_registro.desc()).all()
+    ).join(ListaCuenta, Registro.lista_cuentas_id == ListaCuenta.id).where(*filtros)
+
+    filas, siguiente = await paginacion.paginar(db, stmt, limite, cursor)
+    return [
+        {
+            "id": r.id,
+            "monto": montos.a_float(r.monto_centavos),
+            "fecha": r.fecha_registro.strftime('%Y-%m-%d %H:%M:%S'),
+            "categoria": r.categoria,
+            "metodo": r.metodo,
+            "cuenta": r.cuenta,
+            "tipo": "ingreso" if (r.monto_centavos or 0) > 0 else "gasto"
+        } for r in filas
+    ], siguiente
+
+def _inicio_periodo(dias: int) -> datetime:
+    """
+    Medianoche de hace 'dias' días. El rollup es por día, así que el detalle
+    de movimientos arranca en el mismo límite para que ambos cuadren.
+    """
+    return datetime.combine((datetime.now() - timedelta(days=dias)).date(), datetime.min.time())
+
+@router.get("/por-dias")
+@cache.cache_por_usuario("por-dias")
+async def movimientos_por_dias(
+    dias: int = Query(30, description="Número de días hacia atrás", ge=1, le=365),
+    limite: int = Query(50, ge=1, le=paginacion.LIMITE_MAXIMO, description="Movimientos en la primera página"),
+    current_user: Usuario = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    fecha_inicio = _inicio_periodo(dias)
+    
+    movimientos_diarios = (await db.execute(select(
+        ResumenDiario.fecha.label('fecha'),
+        func.sum(ResumenDiario.ingresos).label('ingresos'),
+        func.sum(ResumenDiario.gastos).label('gastos'),
+        func.sum(ResumenDiario.cantidad_movimientos).label('cantidad_movimientos')
+    ).where(
+        ResumenDiario.usuarios_id == current_user.id,
+        ResumenDiario.fecha >= fecha_inicio.date()
+    ).group_by(ResumenDiario.fecha).having(
+        func.sum(ResumenDiario.cantidad_movimientos) > 0
+    ).order_by('fecha'))).all()
+    
+    movimientos, siguiente_cursor = await _movimientos_detalle(
+        db, paginacion.filtros_registros(current_user.id, desde=fecha_inicio), limite
+    )
     
     return {
         "periodo": f"Últimos {dias} días",
@@ -91,42 +142,60 @@ def movimientos_por_dias(
                 "ingresos": float(r.ingresos or 0),
                 "gastos": float(r.gastos or 0),
                 "balance": float((r.ingresos or 0) - (r.gastos or 0)),
-                "cantidad_movimientos": r.cantidad_movimientos
+                "cantidad_movimientos": int(r.cantidad_movimientos or 0)
             } for r in movimientos_diarios
         ],
-        "movimientos_individuales": [
-            {
-                "id": r.id,
-                "monto": float(r.monto),
-                "fecha": r.fecha_registro.strftime('%Y-%m-%d %H:%M:%S'),
-                "categoria": r.categoria,
-                "metodo": r.metodo,
-                "cuenta": r.cuenta,
-                "tipo": "ingreso" if float(r.monto) > 0 else "gasto"
-            } for r in registros_detallados
-        ]
+        # Solo la primera página; el resto vía /graficos/por-dias/movimientos
+        "movimientos_individuales": movimientos,
+        "siguiente_cursor": siguiente_cursor
+    }
+
+@router.get("/por-dias/movimientos")
+@cache.cache_por_usuario("por-dias-movimientos")
+async def movimientos_por_dias_detalle(
+    dias: int = Query(30, description="Número de días hacia atrás", ge=1, le=365),
+    limite: int = Query(50, ge=1, le=paginacion.LIMITE_MAXIMO, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="siguiente_cursor de la página anterior"),
+    lista_cuentas_id: Optional[int] = Query(None),
+    subCategorias_id: Optional[int] = Query(None),
+    categori_metodos_id: Optional[int] = Query(None),
+    tipo: Optional[str] = Query(None, pattern="^(ingreso|gasto)$"),
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    fecha_inicio = _inicio_periodo(dias)
+    filtros = paginacion.filtros_registros(
+        current_user.id, fecha_inicio, None, lista_cuentas_id, subCategorias_id, categori_metodos_id, tipo
+    )
+    movimientos, siguiente_cursor = await _movimientos_detalle(db, filtros, limite, cursor)
+    return {
+        "movimientos": movimientos,
+        "siguiente_cursor": siguiente_cursor
     }
 
 @router.get("/por-categoria")
-def gastos_por_categoria(
+@cache.cache_por_usuario("por-categoria")
+async def gastos_por_categoria(
     dias: Optional[int] = Query(30, description="Número de días hacia atrás"),
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     fecha_inicio = datetime.now() - timedelta(days=dias) if dias else None
     
-    query_filter = [Registro.usuarios_id == current_user.id]
+    query_filter = [ResumenDiario.usuarios_id == current_user.id]
     if fecha_inicio:
-        query_filter.append(Registro.fecha_registro >= fecha_inicio)
+        query_filter.append(ResumenDiario.fecha >= fecha_inicio.date())
     
-    por_categoria = db.query(
+    por_categoria = (await db.execute(select(
         Subcategoria.descripcion.label('categoria'),
-        func.sum(case((func.cast(Registro.monto, Float) > 0, func.cast(Registro.monto, Float)), else_=0)).label('ingresos'),
-        func.sum(case((func.cast(Registro.monto, Float) < 0, func.abs(func.cast(Registro.monto, Float))), else_=0)).label('gastos'),
-        func.count(Registro.id).label('cantidad')
-    ).join(Registro, Registro.subCategorias_id == Subcategoria.id).filter(
+        func.sum(ResumenDiario.ingresos).label('ingresos'),
+        func.sum(ResumenDiario.gastos).label('gastos'),
+        func.sum(ResumenDiario.cantidad_movimientos).label('cantidad')
+    ).join(ResumenDiario, ResumenDiario.subCategorias_id == Subcategoria.id).where(
         and_(*query_filter)
-    ).group_by(Subcategoria.descripcion).all()
+    ).group_by(Subcategoria.descripcion).having(
+        func.sum(ResumenDiario.cantidad_movimientos) > 0
+    ))).all()
     
     total_ingresos = sum(float(r.ingresos or 0) for r in por_categoria)
     total_gastos = sum(float(r.gastos or 0) for r in por_categoria)
@@ -141,7 +210,7 @@ def gastos_por_categoria(
                 "ingresos": float(r.ingresos or 0),
                 "gastos": float(r.gastos or 0),
                 "total": float((r.ingresos or 0) + (r.gastos or 0)),
-                "cantidad": r.cantidad,
+                "cantidad": int(r.cantidad or 0),
                 "porcentaje_ingresos": round((float(r.ingresos or 0) / total_ingresos * 100), 2) if total_ingresos > 0 else 0,
                 "porcentaje_gastos": round((float(r.gastos or 0) / total_gastos * 100), 2) if total_gastos > 0 else 0
             } for r in por_categoria
@@ -149,25 +218,28 @@ def gastos_por_categoria(
     }
 
 @router.get("/por-metodo")
-def gastos_por_metodo(
+@cache.cache_por_usuario("por-metodo")
+async def gastos_por_metodo(
     dias: Optional[int] = Query(30, description="Número de días hacia atrás"),
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     fecha_inicio = datetime.now() - timedelta(days=dias) if dias else None
     
-    query_filter = [Registro.usuarios_id == current_user.id]
+    query_filter = [ResumenDiario.usuarios_id == current_user.id]
     if fecha_inicio:
-        query_filter.append(Registro.fecha_registro >= fecha_inicio)
+        query_filter.append(ResumenDiario.fecha >= fecha_inicio.date())
     
-    por_metodo = db.query(
+    por_metodo = (await db.execute(select(
         CategoriaMetodo.nombre.label('metodo'),
-        func.sum(case((func.cast(Registro.monto, Float) > 0, func.cast(Registro.monto, Float)), else_=0)).label('ingresos'),
-        func.sum(case((func.cast(Registro.monto, Float) < 0, func.abs(func.cast(Registro.monto, Float))), else_=0)).label('gastos'),
-        func.count(Registro.id).label('cantidad')
-    ).join(Registro, Registro.categori_metodos_id == CategoriaMetodo.id).filter(
+        func.sum(ResumenDiario.ingresos).label('ingresos'),
+        func.sum(ResumenDiario.gastos).label('gastos'),
+        func.sum(ResumenDiario.cantidad_movimientos).label('cantidad')
+    ).join(ResumenDiario, ResumenDiario.categori_metodos_id == CategoriaMetodo.id).where(
         and_(*query_filter)
-    ).group_by(CategoriaMetodo.nombre).all()
+    ).group_by(CategoriaMetodo.nombre).having(
+        func.sum(ResumenDiario.cantidad_movimientos) > 0
+    ))).all()
     
     return {
         "periodo": f"Últimos {dias} días" if dias else "Todos los registros",
@@ -177,28 +249,31 @@ def gastos_por_metodo(
                 "ingresos": float(r.ingresos or 0),
                 "gastos": float(r.gastos or 0),
                 "total": float((r.ingresos or 0) + (r.gastos or 0)),
-                "cantidad": r.cantidad
+                "cantidad": int(r.cantidad or 0)
             } for r in por_metodo
         ]
     }
 
 @router.get("/tendencia-mensual")
-def tendencia_mensual(
+@cache.cache_por_usuario("tendencia-mensual")
+async def tendencia_mensual(
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    tendencia = db.query(
-        extract('year', Registro.fecha_registro).label('año'),
-        extract('month', Registro.fecha_registro).label('mes'),
-        func.sum(case((func.cast(Registro.monto, Float) > 0, func.cast(Registro.monto, Float)), else_=0)).label('ingresos'),
-        func.sum(case((func.cast(Registro.monto, Float) < 0, func.abs(func.cast(Registro.monto, Float))), else_=0)).label('gastos'),
-        func.count(Registro.id).label('cantidad')
-    ).filter(
-        Registro.usuarios_id == current_user.id
+    tendencia = (await db.execute(select(
+        extract('year', ResumenDiario.fecha).label('año'),
+        extract('month', ResumenDiario.fecha).label('mes'),
+        func.sum(ResumenDiario.ingresos).label('ingresos'),
+        func.sum(ResumenDiario.gastos).label('gastos'),
+        func.sum(ResumenDiario.cantidad_movimientos).label('cantidad')
+    ).where(
+        ResumenDiario.usuarios_id == current_user.id
     ).group_by(
-        extract('year', Registro.fecha_registro),
-        extract('month', Registro.fecha_registro)
-    ).order_by('año', 'mes').all()
+        extract('year', ResumenDiario.fecha),
+        extract('month', ResumenDiario.fecha)
+    ).having(
+        func.sum(ResumenDiario.cantidad_movimientos) > 0
+    ).order_by('año', 'mes'))).all()
     
     return {
         "tendencia_mensual": [
@@ -209,26 +284,27 @@ def tendencia_mensual(
                 "ingresos": float(r.ingresos or 0),
                 "gastos": float(r.gastos or 0),
                 "balance": float((r.ingresos or 0) - (r.gastos or 0)),
-                "cantidad": r.cantidad
+                "cantidad": int(r.cantidad or 0)
             } for r in tendencia
         ]
     }
 
 @router.get("/cuentas")
-def resumen_cuentas(
+@cache.cache_por_usuario("cuentas")
+async def resumen_cuentas(
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    cuentas = db.query(
+    cuentas = (await db.execute(select(
         ListaCuenta.id,
         ListaCuenta.nombre,
-        ListaCuenta.cantidad,
+        ListaCuenta.cantidad_centavos,
         func.count(Registro.id).label('movimientos')
-    ).outerjoin(Registro, ListaCuenta.id == Registro.lista_cuentas_id).filter(
+    ).outerjoin(Registro, ListaCuenta.id == Registro.lista_cuentas_id).where(
         ListaCuenta.usuarios_id == current_user.id
-    ).group_by(ListaCuenta.id, ListaCuenta.nombre, ListaCuenta.cantidad).all()
+    ).group_by(ListaCuenta.id, ListaCuenta.nombre, ListaCuenta.cantidad_centavos))).all()
     
-    total_saldo = sum(float(c.cantidad) for c in cuentas)
+    total_saldo = montos.a_float(sum(c.cantidad_centavos or 0 for c in cuentas))
     
     return {
         "total_saldo": total_saldo,
@@ -236,28 +312,29 @@ def resumen_cuentas(
             {
                 "id": c.id,
                 "nombre": c.nombre,
-                "saldo": float(c.cantidad),
+                "saldo": montos.a_float(c.cantidad_centavos),
                 "movimientos": c.movimientos
             } for c in cuentas
         ]
     }
 
 @router.get("/circular-gastos")
-def grafica_circular_gastos(
+@cache.cache_por_usuario("circular-gastos")
+async def grafica_circular_gastos(
     dias: int = Query(30, description="Número de días hacia atrás", ge=1, le=365),
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     fecha_inicio = datetime.now() - timedelta(days=dias)
     
-    gastos_por_categoria = db.query(
+    gastos_por_categoria = (await db.execute(select(
         Subcategoria.descripcion.label('categoria'),
-        func.sum(func.abs(func.cast(Registro.monto, Float))).label('total_gastos')
-    ).join(Registro, Registro.subCategorias_id == Subcategoria.id).filter(
-        Registro.usuarios_id == current_user.id,
-        func.cast(Registro.monto, Float) < 0,  # Solo gastos
-        Registro.fecha_registro >= fecha_inicio
-    ).group_by(Subcategoria.descripcion).all()
+        func.sum(ResumenDiario.gastos).label('total_gastos')
+    ).join(ResumenDiario, ResumenDiario.subCategorias_id == Subcategoria.id).where(
+        ResumenDiario.usuarios_id == current_user.id,
+        ResumenDiario.cantidad_gastos > 0,  # Solo gastos
+        ResumenDiario.fecha >= fecha_inicio.date()
+    ).group_by(Subcategoria.descripcion))).all()
     
     total_gastos = sum(float(r.total_gastos) for r in gastos_por_categoria)
     
@@ -274,21 +351,22 @@ def grafica_circular_gastos(
     }
 
 @router.get("/circular-ingresos")
-def grafica_circular_ingresos(
+@cache.cache_por_usuario("circular-ingresos")
+async def grafica_circular_ingresos(
     dias: int = Query(30, description="Número de días hacia atrás", ge=1, le=365),
     current_user: Usuario = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     fecha_inicio = datetime.now() - timedelta(days=dias)
     
-    ingresos_por_categoria = db.query(
+    ingresos_por_categoria = (await db.execute(select(
         Subcategoria.descripcion.label('categoria'),
-        func.sum(func.cast(Registro.monto, Float)).label('total_ingresos')
-    ).join(Registro, Registro.subCategorias_id == Subcategoria.id).filter(
-        Registro.usuarios_id == current_user.id,
-        func.cast(Registro.monto, Float) > 0,  # Solo ingresos
-        Registro.fecha_registro >= fecha_inicio
-    ).group_by(Subcategoria.descripcion).all()
+        func.sum(ResumenDiario.ingresos).label('total_ingresos')
+    ).join(ResumenDiario, ResumenDiario.subCategorias_id == Subcategoria.id).where(
+        ResumenDiario.usuarios_id == current_user.id,
+        ResumenDiario.cantidad_ingresos > 0,  # Solo ingresos
+        ResumenDiario.fecha >= fecha_inicio.date()
+    ).group_by(Subcategoria.descripcion))).all()
     
     total_ingresos = sum(float(r.total_ingresos) for r in ingresos_por_categoria)
     
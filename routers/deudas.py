@@ -1,29 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
 from datetime import datetime
 
-from models.database import get_db, Deuda, CategoriaMetodo, Usuario
+from models.database import get_db, get_async_db, Deuda, Usuario
 from models.schemas import DeudaResponse
 from auth.auth import get_current_user
+from utils import catalogo, cache, condicional
 
 router = APIRouter(prefix="/deudas", tags=["Deudas"])
 
 
 @router.get("/", response_model=List[DeudaResponse])
-def listar_deudas(
+async def listar_deudas(
+    request: Request,
+    response: Response,
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Lista SOLO las deudas del usuario autenticado.
+    Lista SOLO las deudas del usuario autenticado (304 si no cambiaron).
     """
-    return (
-        db.query(Deuda)
-        .filter(Deuda.usuarios_id == current_user.id)
+    no_modificado = await condicional.listado(request, response, current_user.id, "deudas")
+    if no_modificado is not None:
+        return no_modificado
+    resultado = await db.execute(
+        select(Deuda)
+        .where(Deuda.usuarios_id == current_user.id)
         .order_by(Deuda.fecha_inicio.desc())
-        .all()
     )
+    return resultado.scalars().all()
 
 
 @router.post("/", response_model=DeudaResponse)
@@ -40,12 +48,7 @@ def crear_deuda(
     """
     Crea deuda para el usuario autenticado.
     """
-    categoria_metodo = (
-        db.query(CategoriaMetodo)
-        .filter(CategoriaMetodo.id == categori_metodos_id)
-        .first()
-    )
-    if not categoria_metodo:
+    if not catalogo.existe_metodo(categori_metodos_id):
         raise HTTPException(status_code=404, detail="Categoría método no encontrada")
 
     db_deuda = Deuda(
@@ -59,6 +62,7 @@ def crear_deuda(
     )
     db.add(db_deuda)
     db.commit()
+    cache.invalidar(current_user.id, "deudas")
     db.refresh(db_deuda)
     return db_deuda
 
@@ -87,12 +91,7 @@ def actualizar_deuda(
         raise HTTPException(status_code=404, detail="Deuda no encontrada")
 
     if categori_metodos_id is not None:
-        categoria_metodo = (
-            db.query(CategoriaMetodo)
-            .filter(CategoriaMetodo.id == categori_metodos_id)
-            .first()
-        )
-        if not categoria_metodo:
+        if not catalogo.existe_metodo(categori_metodos_id):
             raise HTTPException(status_code=404, detail="Categoría método no encontrada")
         deuda.categori_metodos_id = categori_metodos_id
 
@@ -108,6 +107,7 @@ def actualizar_deuda(
         deuda.descripcion = descripcion
 
     db.commit()
+    cache.invalidar(current_user.id, "deudas")
     db.refresh(deuda)
     return deuda
 
@@ -131,4 +131,5 @@ def eliminar_deuda(
 
     db.delete(deuda)
     db.commit()
+    cache.invalidar(current_user.id, "deudas")
     return {"mensaje": "Deuda eliminada exitosamente"}
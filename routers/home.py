@@ -0,0 +1,64 @@
+# routers/home.py
+import asyncio
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from models.database import SessionLocal, AsyncSessionLocal, Usuario
+from models.schemas import ListaCuentaResponse
+from auth.auth import get_current_user
+from routers import dashboard, presupuestos, pagos_fijos, objetivos, lista_cuentas
+
+router = APIRouter(tags=["Home"])
+
+
+def _en_sesion(consulta):
+    """
+    Ejecuta 'consulta(db)' con su propia sesión (y por lo tanto su propia
+    conexión del pool), para poder correr varias en paralelo.
+    """
+    db = SessionLocal()
+    try:
+        return consulta(db)
+    finally:
+        db.close()
+
+
+async def _en_sesion_async(consulta):
+    """Igual que _en_sesion, para consultas de la ruta async."""
+    async with AsyncSessionLocal() as db:
+        return await consulta(db)
+
+
+@router.get("/home")
+async def pantalla_inicio(
+    current_user: Usuario = Depends(get_current_user),
+):
+    """
+    Todo lo que la app pide al abrir, en una sola llamada: autentica una vez y
+    corre las consultas independientes en paralelo, así la latencia queda
+    acotada por la más lenta y no por la suma.
+    """
+    async def objetivos_usuario(db):
+        filas = await objetivos.objetivos_de_usuario(db, current_user.id)
+        return [objetivos.ObjetivoOut.model_validate(o).model_dump() for o in filas]
+
+    async def cuentas_usuario(db):
+        filas = await lista_cuentas.cuentas_de_usuario(db, current_user.id)
+        return [ListaCuentaResponse.model_validate(c).model_dump() for c in filas]
+
+    consultas = {
+        "resumen": _en_sesion_async(
+            lambda db: dashboard.resumen_financiero(current_user=current_user, db=db)
+        ),
+        "presupuestos_activos": run_in_threadpool(
+            _en_sesion, lambda db: presupuestos.listar_presupuestos_activos(current_user=current_user, db=db)
+        ),
+        "pagos_proximos": run_in_threadpool(
+            _en_sesion, lambda db: pagos_fijos.pagos_proximos(current_user=current_user, db=db)
+        ),
+        "objetivos": _en_sesion_async(objetivos_usuario),
+        "cuentas": _en_sesion_async(cuentas_usuario),
+    }
+
+    resultados = await asyncio.gather(*consultas.values())
+    return dict(zip(consultas.keys(), resultados))
@@ -1,18 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List, Optional
+from decimal import InvalidOperation
+from datetime import date, datetime, timedelta
 # arriba del archivo:
-from models.database import get_db, ListaCuenta, Usuario, Registro, Estadistica
+from models.database import get_db, ListaCuenta, Usuario, Registro, Estadistica, SaldoDiario
 
-from models.database import get_db, ListaCuenta, Usuario
+from models.database import get_db, get_async_db, ListaCuenta, Usuario
 from models.schemas import ListaCuentaResponse
 from auth.auth import get_current_user
+from utils import rollups, gastado, montos, cache, saldos, historial, condicional
 
 router = APIRouter(prefix="/lista_cuentas", tags=["Lista Cuentas"])
 
+# Versiones que invalida una escritura de cuentas (eliminar una borra sus registros)
+RECURSOS_ESCRITURA = ("graficos", "lista_cuentas", "registros")
+
+def parse_cantidad(cantidad: str) -> int:
+    try:
+        return montos.a_centavos(cantidad)
+    except (InvalidOperation, ValueError):
+        raise HTTPException(status_code=422, detail="cantidad debe ser numérica")
+
+async def cuentas_de_usuario(db: AsyncSession, usuarios_id: int) -> List[ListaCuenta]:
+    """Consulta del listado (la usan GET /lista_cuentas y /home)."""
+    resultado = await db.execute(select(ListaCuenta).where(ListaCuenta.usuarios_id == usuarios_id))
+    return resultado.scalars().all()
+
 @router.get("/", response_model=List[ListaCuentaResponse])
-def listar_cuentas(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(ListaCuenta).filter(ListaCuenta.usuarios_id == current_user.id).all()
+async def listar_cuentas(
+    request: Request,
+    response: Response,
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    no_modificado = await condicional.listado(request, response, current_user.id, "lista_cuentas")
+    if no_modificado is not None:
+        return no_modificado
+    return await cuentas_de_usuario(db, current_user.id)
 
 @router.post("/", response_model=ListaCuentaResponse)
 def crear_cuenta(
@@ -21,13 +48,17 @@ def crear_cuenta(
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    centavos = parse_cantidad(cantidad)
     db_cuenta = ListaCuenta(
         usuarios_id=current_user.id,
         nombre=nombre,
-        cantidad=cantidad
+        cantidad=montos.a_texto(centavos),
+        cantidad_centavos=centavos,
+        saldo_inicial_centavos=centavos,
     )
     db.add(db_cuenta)
     db.commit()
+    cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
     db.refresh(db_cuenta)
     return db_cuenta
 
@@ -49,9 +80,10 @@ def actualizar_cuenta(
     if nombre is not None:
         cuenta.nombre = nombre
     if cantidad is not None:
-        cuenta.cantidad = cantidad
+        saldos.fijar(db, cuenta.id, parse_cantidad(cantidad))
     
     db.commit()
+    cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
     db.refresh(cuenta)
     return cuenta
 
@@ -88,8 +120,13 @@ def eliminar_cuenta(
             Registro.usuarios_id == current_user.id,
         ).delete(synchronize_session=False)
 
+        db.query(SaldoDiario).filter(SaldoDiario.lista_cuentas_id == cuenta_id).delete(synchronize_session=False)
         db.delete(cuenta)
+        if deleted_regs:
+            rollups.reconstruir(db, current_user.id)
+            gastado.recalcular(db, current_user.id)
         db.commit()
+        cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
 
         return {
             "mensaje": "Cuenta y datos relacionados eliminados exitosamente",
@@ -98,3 +135,49 @@ def eliminar_cuenta(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al eliminar la cuenta: {e}")
+
+
+# Rango máximo de una serie (~10 años de puntos diarios)
+MAX_DIAS_HISTORIAL = 3660
+
+
+@router.get("/{cuenta_id}/historial")
+def historial_cuenta(
+    cuenta_id: int,
+    fecha: Optional[datetime] = Query(None, description="Saldo en este momento"),
+    desde: Optional[date] = Query(None, description="Inicio de la serie (inclusive)"),
+    hasta: Optional[date] = Query(None, description="Fin de la serie (inclusive, por defecto hoy)"),
+    intervalo: str = Query("dia", pattern="^(dia|mes)$", description="dia | mes"),
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Saldo de la cuenta en una fecha ('fecha') o serie de saldos al cierre de
+    cada día/mes ('desde'..'hasta'). Se calcula desde el corte diario más
+    cercano (utils/historial), no recorriendo todos los registros.
+    """
+    cuenta = (
+        db.query(ListaCuenta)
+        .filter(ListaCuenta.id == cuenta_id, ListaCuenta.usuarios_id == current_user.id)
+        .first()
+    )
+    if not cuenta:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+
+    if fecha is not None:
+        centavos = historial.saldo_en(db, cuenta, fecha)
+        return {"cuenta_id": cuenta.id, "fecha": fecha, "saldo": montos.a_float(centavos)}
+
+    hasta = hasta or datetime.utcnow().date()
+    desde = desde or (hasta - timedelta(days=30))
+    if desde > hasta:
+        raise HTTPException(status_code=422, detail="desde debe ser anterior a hasta")
+    if (hasta - desde).days > MAX_DIAS_HISTORIAL:
+        raise HTTPException(status_code=422, detail=f"El rango no puede exceder {MAX_DIAS_HISTORIAL} días")
+
+    puntos = historial.serie(db, cuenta, desde, hasta, intervalo)
+    return {
+        "cuenta_id": cuenta.id,
+        "intervalo": intervalo,
+        "saldos": [{"fecha": d, "saldo": montos.a_float(c)} for d, c in puntos],
+    }
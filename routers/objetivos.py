@@ -1,14 +1,16 @@
 # routers/objetivos.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, select
 from sqlalchemy.orm import relationship, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field, confloat
 from typing import List, Optional
 from datetime import datetime
 
 # Imports de tu proyecto
-from models.database import get_db, engine, Base, Usuario
+from models.database import get_db, get_async_db, engine, Base, Usuario
 from auth.auth import get_current_user
+from utils import cache, condicional
 
 # =========================
 #  MODELOS SQLALCHEMY
@@ -114,17 +116,27 @@ def get_objetivo_propietario(db: Session, objetivo_id: int, user_id: int) -> Obj
         raise HTTPException(status_code=404, detail="Objetivo no encontrado")
     return obj
 
+# Consulta del listado (la usan GET /objetivos y /home)
+async def objetivos_de_usuario(db: AsyncSession, usuarios_id: int, estado: Optional[str] = None) -> List[Objetivo]:
+    q = select(Objetivo).where(Objetivo.usuarios_id == usuarios_id)
+    if estado:
+        q = q.where(Objetivo.estado == estado)
+    resultado = await db.execute(q.order_by(Objetivo.fecha_creacion.desc()))
+    return resultado.scalars().all()
+
 # Listar objetivos SOLO del usuario logueado (opcional filtrar por estado)
 @router.get("/", response_model=List[ObjetivoOut])
-def listar_objetivos(
+async def listar_objetivos(
+    request: Request,
+    response: Response,
     estado: Optional[str] = Query(None, pattern="^(activo|pausado|completado)$"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    q = db.query(Objetivo).filter(Objetivo.usuarios_id == current_user.id)
-    if estado:
-        q = q.filter(Objetivo.estado == estado)
-    return q.order_by(Objetivo.fecha_creacion.desc()).all()
+    no_modificado = await condicional.listado(request, response, current_user.id, "objetivos")
+    if no_modificado is not None:
+        return no_modificado
+    return await objetivos_de_usuario(db, current_user.id, estado)
 
 # Detalle (propiedad verificada)
 @router.get("/{objetivo_id}", response_model=ObjetivoOut)
@@ -156,6 +168,7 @@ def crear_objetivo(
     )
     db.add(obj)
     db.commit()
+    cache.invalidar(current_user.id, "objetivos")
     db.refresh(obj)
     return obj
 
@@ -172,6 +185,7 @@ def actualizar_objetivo(
         setattr(obj, k, v)
     obj.fecha_actualizacion = datetime.utcnow()
     db.commit()
+    cache.invalidar(current_user.id, "objetivos")
     db.refresh(obj)
     return obj
 
@@ -185,6 +199,7 @@ def eliminar_objetivo(
     obj = get_objetivo_propietario(db, objetivo_id, current_user.id)
     db.delete(obj)
     db.commit()
+    cache.invalidar(current_user.id, "objetivos")
     return None
 
 # PATCH = actualización parcial (solo cambia 'estado')
@@ -199,6 +214,7 @@ def cambiar_estado(
     obj.estado = body.estado
     obj.fecha_actualizacion = datetime.utcnow()
     db.commit()
+    cache.invalidar(current_user.id, "objetivos")
     db.refresh(obj)
     return obj
 
@@ -224,6 +240,7 @@ def crear_aporte(
     db.add(ap)
     db.add(obj)
     db.commit()
+    cache.invalidar(current_user.id, "objetivos")
     db.refresh(ap)
     return ap
 
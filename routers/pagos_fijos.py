@@ -1,17 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Request, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List
 from datetime import datetime
 
-from models.database import get_db, PagoFijo, Usuario
+from models.database import get_db, get_async_db, PagoFijo, Usuario
 from models.schemas import PagoFijoResponse
 from auth.auth import get_current_user
+from utils import cache, condicional
 
 router = APIRouter(prefix="/pagos-fijos", tags=["Pagos Fijos"])
 
 @router.get("/", response_model=List[PagoFijoResponse])
-def listar_pagos_fijos(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(PagoFijo).filter(PagoFijo.usuarios_id == current_user.id).all()
+async def listar_pagos_fijos(
+    request: Request,
+    response: Response,
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    no_modificado = await condicional.listado(request, response, current_user.id, "pagos_fijos")
+    if no_modificado is not None:
+        return no_modificado
+    resultado = await db.execute(select(PagoFijo).where(PagoFijo.usuarios_id == current_user.id))
+    return resultado.scalars().all()
 
 @router.post("/", response_model=PagoFijoResponse)
 def crear_pago_fijo(
@@ -31,6 +43,7 @@ def crear_pago_fijo(
     
     db.add(pago_fijo)
     db.commit()
+    cache.invalidar(current_user.id, "pagos_fijos")
     db.refresh(pago_fijo)
     return pago_fijo
 
@@ -62,6 +75,7 @@ def actualizar_pago_fijo(
         pago_fijo.activo = activo
     
     db.commit()
+    cache.invalidar(current_user.id, "pagos_fijos")
     db.refresh(pago_fijo)
     return pago_fijo
 
@@ -81,6 +95,7 @@ def eliminar_pago_fijo(
     
     db.delete(pago_fijo)
     db.commit()
+    cache.invalidar(current_user.id, "pagos_fijos")
     return {"mensaje": "Pago fijo eliminado exitosamente"}
 
 @router.get("/proximos")
@@ -1,111 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Form
 from sqlalchemy.orm import Session
-from sqlalchemy import func, Float, cast
 from typing import List, Optional
-from datetime import datetime, date
-import os
+from datetime import datetime
 
-from models.database import get_db, Presupuesto, Categoria, Usuario, Registro, Subcategoria
+from models.database import get_db, Presupuesto, PresupuestoPeriodo, PresupuestoAlerta, Categoria, Usuario
 from auth.auth import get_current_user
-
-# --- NUEVO: Resend SDK ---
-import resend
+from utils import montos, alertas, outbox, catalogo
+from utils import gastado as gastado_mod
+from utils.correo import get_user_email
 
 router = APIRouter(prefix="/presupuestos", tags=["Presupuestos"])
 
-# ===============================
-# Config & thresholds
-# ===============================
-
-# Enviar 1 correo al llegar a 90% y otro al llegar/exceder 100%
-NEAR_THRESHOLD_PCT = 90.0
-EXCEEDED_THRESHOLD_PCT = 100.0
-
-# Evitar spam: cache en memoria por proceso (marca si ya notificamos HOY por nivel)
-# NOTA: si corres varios workers, conviene persistir esto en BD.
-_NOTIFY_CACHE: dict[int, dict[str, str]] = {}  # {presupuesto_id: {'near':'YYYY-MM-DD','exceeded':'YYYY-MM-DD'}}
-
-# ===============================
-# Email helpers (Resend)
-# ===============================
-
-def _resend_from() -> str:
-    # Usa RESEND_FROM si existe; si no, cae a FROM_EMAIL; si no, usa onboarding@resend.dev
-    return os.getenv("RESEND_FROM") or os.getenv("FROM_EMAIL") or "onboarding@resend.dev"
-
-def send_email(to: str, subject: str, body: str) -> None:
-    """
-    Envío de email usando Resend (SDK oficial).
-    - Requiere: RESEND_API_KEY
-    - Remitente: RESEND_FROM (o FROM_EMAIL) o 'onboarding@resend.dev' como fallback
-    """
-    if not to:
-        print("[EMAIL] Sin destinatario, se omite envío")
-        return
-
-    api_key = os.getenv("RESEND_API_KEY")
-    if not api_key:
-        # No rompemos el endpoint si falta config: modo DRYRUN
-        print(f"[EMAIL:DRYRUN] Falta RESEND_API_KEY. to={to}\nsubject={subject}\nbody=\n{body}\n")
-        return
-
-    try:
-        resend.api_key = api_key
-        resend.Emails.send({
-            "from": _resend_from(),
-            "to": [to],
-            "subject": subject,
-            "text": body,  # texto plano (puedes cambiar a 'html' si quieres)
-        })
-        print(f"[EMAIL] Enviado via Resend a {to}")
-    except Exception as e:
-        # Log y seguimos (no lanzamos excepción para no romper la respuesta del endpoint)
-        print(f"[EMAIL] Resend falló: {e}. to={to} subject={subject}")
-
-def _get_user_email(user: Usuario) -> Optional[str]:
-    # Intenta varias convenciones de campo en tu modelo Usuario
-    for attr in ("correo", "email", "mail", "correo_electronico"):
-        val = getattr(user, attr, None)
-        if val:
-            return str(val)
-    return None
-
 # ===============================
 # Cálculo de métricas
 # ===============================
 
-def _sum_gastos_desde(db: Session, usuarios_id: int, categorias_id: int, desde: datetime) -> float:
+def _consulta_hidratada(db: Session, usuarios_id: int):
     """
-    Suma de GASTOS (registros negativos) para una categoría (por subcategorías),
-    desde 'desde' hasta ahora. Registro.monto es varchar; se castea a Float.
+    Presupuestos del usuario con el nombre de su categoría en un solo SELECT.
+    El gastado es el acumulado persistido (utils/gastado.py): leerlo es O(1)
+    sin importar el tamaño del historial.
     """
-    total = (
-        db.query(func.sum(func.abs(cast(Registro.monto, Float))))
-        .join(Subcategoria, Registro.subCategorias_id == Subcategoria.id)
-        .filter(
-            Registro.usuarios_id == usuarios_id,
-            Subcategoria.categorias_id == categorias_id,
-            cast(Registro.monto, Float) < 0,
-            Registro.fecha_registro >= (desde or datetime.min),
-        )
-        .scalar()
-        or 0.0
+    return (
+        db.query(Presupuesto, Categoria.descripcion, Presupuesto.gastado_centavos)
+        .outerjoin(Categoria, Categoria.id == Presupuesto.categorias_id)
+        .filter(Presupuesto.usuarios_id == usuarios_id)
     )
-    return float(total)
 
-def _hydrate_presupuesto(db: Session, p: Presupuesto) -> dict:
-    gastado = _sum_gastos_desde(db, p.usuarios_id, p.categorias_id, p.fecha_creacion)
+def _payload(p: Presupuesto, categoria_nombre: Optional[str], gastado_centavos: int) -> dict:
+    """Métricas del presupuesto; en los recurrentes, las del periodo abierto."""
+    gastado = montos.a_float(gastado_centavos)
     limite = float(p.monto_limite or 0)
     restante = limite - gastado
     pct = round((gastado / limite * 100), 2) if limite > 0 else 0.0
     excedido = gastado >= limite and limite > 0
 
-    categoria_nombre = (
-        db.query(Categoria.descripcion)
-        .filter(Categoria.id == p.categorias_id)
-        .scalar()
-    )
-
     return {
         "id": p.id,
         "usuarios_id": p.usuarios_id,
@@ -113,6 +42,9 @@ def _hydrate_presupuesto(db: Session, p: Presupuesto) -> dict:
         "monto_limite": limite,
         "estado": p.estado,
         "fecha_creacion": p.fecha_creacion,
+        "periodo": p.periodo,
+        "periodo_inicio": p.periodo_inicio,
+        "periodo_fin": gastado_mod.fin_periodo(p.periodo, p.periodo_inicio) if p.periodo_inicio else None,
         "categoria_nombre": categoria_nombre,
         "gastado": gastado,
         "restante": restante,
@@ -120,124 +52,108 @@ def _hydrate_presupuesto(db: Session, p: Presupuesto) -> dict:
         "excedido": excedido,
     }
 
-# ===============================
-# Notificaciones
-# ===============================
+def _cerrar_periodos_vencidos(db: Session, usuarios_id: int) -> None:
+    # Rollover perezoso: solo escribe cuando algún periodo venció
+    if gastado_mod.cerrar_periodos(db, usuarios_id):
+        db.commit()
 
-def _should_notify_once_per_day(presupuesto_id: int, level: str) -> bool:
-    """
-    level: 'near' | 'exceeded'
-    Marca y devuelve True si aún no se notificó HOY por ese nivel.
-    """
-    today = date.today().isoformat()
-    levels = _NOTIFY_CACHE.get(presupuesto_id) or {}
-    last = levels.get(level)
-    if last == today:
-        return False
-    # marcar
-    levels[level] = today
-    _NOTIFY_CACHE[presupuesto_id] = levels
-    return True
-
-def _maybe_notify(background_tasks: BackgroundTasks, user_email: Optional[str], payload: dict) -> None:
-    """
-    Dispara notificación si el presupuesto ACTIVO está cerca (>= 90%) o excedido (>=100%).
-    Se envía uno por día por nivel para evitar spam en cada GET.
-    """
-    if not user_email:
-        return
-    if payload.get("estado") != "activo":
-        return
-
-    pct = float(payload.get("porcentaje_usado") or 0.0)
-    limite = float(payload.get("monto_limite") or 0.0)
-    gastado = float(payload.get("gastado") or 0.0)
-    categoria_nombre = payload.get("categoria_nombre") or f"Categoría {payload.get('categorias_id')}"
-    presupuesto_id = int(payload.get("id"))
-
-    # EXCEDIDO (>=100%)
-    if pct >= EXCEEDED_THRESHOLD_PCT and _should_notify_once_per_day(presupuesto_id, "exceeded"):
-        subject = f"Presupuesto EXCEDIDO: {categoria_nombre}"
-        body = (
-            f"Has excedido tu presupuesto activo para '{categoria_nombre}'.\n\n"
-            f"Límite: MXN {limite:,.2f}\n"
-            f"Gastado: MXN {gastado:,.2f}\n"
-            f"Uso: {pct:.1f}%\n\n"
-            f"Revisa tus gastos y ajusta tu consumo."
-        )
-        background_tasks.add_task(send_email, user_email, subject, body)
-        return  # prioridad al mensaje de excedido
-
-    # CERCA (>=90%)
-    if pct >= NEAR_THRESHOLD_PCT and _should_notify_once_per_day(presupuesto_id, "near"):
-        subject = f"Tu presupuesto está por alcanzarse: {categoria_nombre}"
-        body = (
-            f"Tu presupuesto activo para '{categoria_nombre}' está por alcanzarse.\n\n"
-            f"Límite: MXN {limite:,.2f}\n"
-            f"Gastado: MXN {gastado:,.2f}\n"
-            f"Uso: {pct:.1f}%\n\n"
-            f"Considera moderar tus gastos para evitar exceder el límite."
-        )
-        background_tasks.add_task(send_email, user_email, subject, body)
+def _hydrate_presupuestos(db: Session, usuarios_id: int, solo_activos: bool = False) -> List[dict]:
+    _cerrar_periodos_vencidos(db, usuarios_id)
+    q = _consulta_hidratada(db, usuarios_id)
+    if solo_activos:
+        q = q.filter(Presupuesto.estado == "activo")
+    filas = q.order_by(Presupuesto.fecha_creacion.desc()).all()
+    return [_payload(p, nombre, centavos) for p, nombre, centavos in filas]
 
-def _hydrate_and_notify(db: Session, user: Usuario, p: Presupuesto, background_tasks: BackgroundTasks) -> dict:
-    payload = _hydrate_presupuesto(db, p)
-    _maybe_notify(background_tasks, _get_user_email(user), payload)
-    return payload
+def _hydrate_presupuesto(db: Session, p: Presupuesto) -> dict:
+    _cerrar_periodos_vencidos(db, p.usuarios_id)
+    _, nombre, centavos = (
+        _consulta_hidratada(db, p.usuarios_id)
+        .filter(Presupuesto.id == p.id)
+        .one()
+    )
+    return _payload(p, nombre, centavos)
 
 # ===============================
-# Endpoints (sin cambiar lógica)
+# Endpoints
 # ===============================
 
 @router.get("/")
 def listar_presupuestos(
-    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     Lista todos los presupuestos del usuario (activos e inactivos),
-    con métricas calculadas y notificación si corresponde (>=90% o >=100%).
+    con métricas calculadas. Las alertas se evalúan al escribir, no aquí.
     """
-    rows: List[Presupuesto] = (
-        db.query(Presupuesto)
-        .filter(Presupuesto.usuarios_id == current_user.id)
-        .order_by(Presupuesto.fecha_creacion.desc())
-        .all()
-    )
-    return [_hydrate_and_notify(db, current_user, p, background_tasks) for p in rows]
+    return _hydrate_presupuestos(db, current_user.id)
 
 @router.get("/activos")
 def listar_presupuestos_activos(
-    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Lista solo presupuestos activos. También notifica si se cruza un umbral (>=90% o >=100%).
+    Lista solo presupuestos activos.
     """
-    rows: List[Presupuesto] = (
+    return _hydrate_presupuestos(db, current_user.id, solo_activos=True)
+
+@router.get("/{presupuesto_id}/periodos")
+def historial_periodos(
+    presupuesto_id: int,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Historial de un presupuesto recurrente: los periodos cerrados salen tal
+    cual de presupuesto_periodos (nunca se recalculan) y solo el periodo
+    abierto se calcula en vivo (del acumulado).
+    """
+    p: Optional[Presupuesto] = (
         db.query(Presupuesto)
-        .filter(Presupuesto.usuarios_id == current_user.id, Presupuesto.estado == "activo")
-        .order_by(Presupuesto.fecha_creacion.desc())
+        .filter(Presupuesto.id == presupuesto_id, Presupuesto.usuarios_id == current_user.id)
+        .first()
+    )
+    if not p:
+        raise HTTPException(status_code=404, detail="Presupuesto no encontrado")
+
+    actual = _hydrate_presupuesto(db, p)
+    cerrados = (
+        db.query(PresupuestoPeriodo)
+        .filter(PresupuestoPeriodo.presupuestos_id == p.id)
+        .order_by(PresupuestoPeriodo.inicio.desc())
         .all()
     )
-    return [_hydrate_and_notify(db, current_user, p, background_tasks) for p in rows]
+    return {
+        "actual": actual,
+        "cerrados": [
+            {
+                "inicio": c.inicio,
+                "fin": c.fin,
+                "monto_limite": c.monto_limite,
+                "gastado": montos.a_float(c.gastado_centavos),
+                "porcentaje_usado": float(c.porcentaje_usado),
+            }
+            for c in cerrados
+        ],
+    }
 
 @router.post("/")
 def crear_presupuesto(
-    background_tasks: BackgroundTasks,
     categorias_id: int = Form(..., description="ID de la categoría"),
     monto_limite: float = Form(..., description="Monto límite del presupuesto"),
     estado: str = Form("activo", description="Estado inicial ('activo'|'inactivo')"),
+    periodo: str = Form("unico", description="Periodo ('unico'|'semanal'|'mensual')"),
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     if estado not in ("activo", "inactivo"):
         raise HTTPException(status_code=422, detail="Estado inválido")
+    if periodo not in gastado_mod.PERIODOS:
+        raise HTTPException(status_code=422, detail="Periodo inválido")
 
-    categoria = db.query(Categoria).filter(Categoria.id == categorias_id).first()
-    if not categoria:
+    if not catalogo.existe_categoria(categorias_id):
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
 
     # Un presupuesto ACTIVO por categoría y usuario
@@ -254,29 +170,41 @@ def crear_presupuesto(
         if dup:
             raise HTTPException(status_code=400, detail="Ya existe un presupuesto activo para esta categoría")
 
+    ahora = datetime.utcnow()
     p = Presupuesto(
         usuarios_id=current_user.id,
         categorias_id=categorias_id,
         monto_limite=float(monto_limite),
         estado=estado,
-        fecha_creacion=datetime.utcnow(),
+        periodo=periodo,
+        periodo_inicio=gastado_mod.inicio_periodo(periodo, ahora),
+        fecha_creacion=ahora,
     )
     db.add(p)
+    if p.periodo_inicio is not None:
+        # El periodo actual empezó antes de crear el presupuesto
+        db.flush()
+        gastado_mod.recalcular(db, presupuesto_id=p.id)
+    db.flush()
+    alertas.evaluar(db, current_user, presupuesto_id=p.id)
     db.commit()
     db.refresh(p)
 
-    return _hydrate_and_notify(db, current_user, p, background_tasks)
+    return _hydrate_presupuesto(db, p)
 
 @router.put("/{presupuesto_id}")
 def actualizar_presupuesto(
-    background_tasks: BackgroundTasks,
     presupuesto_id: int,
     categorias_id: Optional[int] = Form(None, description="Nueva categoría ID"),
     monto_limite: Optional[float] = Form(None, description="Nuevo monto límite"),
     estado: Optional[str] = Form(None, description="Nuevo estado ('activo'|'inactivo')"),
+    periodo: Optional[str] = Form(None, description="Nuevo periodo ('unico'|'semanal'|'mensual')"),
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    if periodo is not None and periodo not in gastado_mod.PERIODOS:
+        raise HTTPException(status_code=422, detail="Periodo inválido")
+
     p: Optional[Presupuesto] = (
         db.query(Presupuesto)
         .filter(Presupuesto.id == presupuesto_id, Presupuesto.usuarios_id == current_user.id)
@@ -286,8 +214,7 @@ def actualizar_presupuesto(
         raise HTTPException(status_code=404, detail="Presupuesto no encontrado")
 
     if categorias_id is not None:
-        cat = db.query(Categoria).filter(Categoria.id == categorias_id).first()
-        if not cat:
+        if not catalogo.existe_categoria(categorias_id):
             raise HTTPException(status_code=404, detail="Categoría no encontrada")
 
     new_estado = estado if estado is not None else p.estado
@@ -312,21 +239,32 @@ def actualizar_presupuesto(
             raise HTTPException(status_code=400, detail="Ya existe un presupuesto activo para esta categoría")
 
     # Actualizar campos
+    cambia_categoria = categorias_id is not None and categorias_id != p.categorias_id
+    cambia_periodo = periodo is not None and periodo != p.periodo
     if categorias_id is not None:
         p.categorias_id = categorias_id
     if monto_limite is not None:
         p.monto_limite = float(monto_limite)
     if estado is not None:
         p.estado = estado
+    if cambia_periodo:
+        p.periodo = periodo
+        p.periodo_inicio = gastado_mod.inicio_periodo(periodo, datetime.utcnow())
 
+    if cambia_categoria or cambia_periodo:
+        # El acumulado era de la categoría/periodo anterior
+        db.flush()
+        gastado_mod.recalcular(db, presupuesto_id=p.id)
+
+    db.flush()
+    alertas.evaluar(db, current_user, presupuesto_id=p.id)
     db.commit()
     db.refresh(p)
 
-    return _hydrate_and_notify(db, current_user, p, background_tasks)
+    return _hydrate_presupuesto(db, p)
 
 @router.patch("/{presupuesto_id}/estado")
 def cambiar_estado_presupuesto(
-    background_tasks: BackgroundTasks,
     presupuesto_id: int,
     estado: str = Form(..., description="Nuevo estado ('activo'|'inactivo')"),
     current_user: Usuario = Depends(get_current_user),
@@ -359,10 +297,12 @@ def cambiar_estado_presupuesto(
             raise HTTPException(status_code=400, detail="Ya existe un presupuesto activo para esta categoría")
 
     p.estado = estado
+    db.flush()
+    alertas.evaluar(db, current_user, presupuesto_id=p.id)
     db.commit()
     db.refresh(p)
 
-    return _hydrate_and_notify(db, current_user, p, background_tasks)
+    return _hydrate_presupuesto(db, p)
 
 @router.delete("/{presupuesto_id}")
 def eliminar_presupuesto(
@@ -378,6 +318,8 @@ def eliminar_presupuesto(
     if not p:
         raise HTTPException(status_code=404, detail="Presupuesto no encontrado")
 
+    for modelo in (PresupuestoPeriodo, PresupuestoAlerta):
+        db.query(modelo).filter(modelo.presupuestos_id == p.id).delete(synchronize_session=False)
     db.delete(p)
     db.commit()
     return {"mensaje": "Presupuesto eliminado exitosamente"}
@@ -385,13 +327,14 @@ def eliminar_presupuesto(
 # Endpoint para enviar un correo de prueba al usuario del token
 @router.post("/_test_email")
 def test_email(
-    background_tasks: BackgroundTasks,
     current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    to = _get_user_email(current_user)
+    to = get_user_email(current_user)
     if not to:
         raise HTTPException(status_code=400, detail="El usuario no tiene correo configurado")
     subject = "Prueba de correo - Presupuestos (Lana App)"
     body = "Hola, este es un correo de prueba enviado por la API de Presupuestos de Lana App."
-    background_tasks.add_task(send_email, to, subject, body)
+    outbox.encolar(db, "email", to, body, asunto=subject, usuarios_id=current_user.id)
+    db.commit()
     return {"ok": True, "to": to}
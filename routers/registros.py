@@ -1,16 +1,30 @@
 # routers/registros.py
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from datetime import datetime, timezone
+from decimal import InvalidOperation
+from types import SimpleNamespace
+import csv
+import hashlib
+import io
+import json
+import os
 
-from models.database import get_db, Registro, ListaCuenta, Subcategoria, CategoriaMetodo, Usuario
-from models.schemas import RegistroResponse
+from models.database import get_db, get_async_db, SessionLocal, Registro, ListaCuenta, Categoria, Subcategoria, CategoriaMetodo, Usuario
+from models.schemas import RegistroResponse, RegistroBatchRequest, RegistroBatchOperacion
 from auth.auth import get_current_user
+from utils import rollups, gastado, alertas, montos, paginacion, cache, saldos, importacion, movimientos, catalogo, condicional
 
 router = APIRouter(prefix="/registros", tags=["Registros"])
 
+# Versiones que invalida una escritura de registros (los saldos de las cuentas cambian)
+RECURSOS_ESCRITURA = ("graficos", "registros", "lista_cuentas")
+
 def parse_optional_int(raw: Optional[str], field_name: str) -> Optional[int]:
     """
     Convierte '', None -> None; ints válidos -> int; si no, 422.
@@ -25,27 +39,359 @@ def parse_optional_int(raw: Optional[str], field_name: str) -> Optional[int]:
     except ValueError:
         raise HTTPException(status_code=422, detail=f"{field_name} debe ser entero o vacío")
 
-def parse_decimal(value: str, field_name: str) -> Decimal:
+def parse_centavos(value: str, field_name: str) -> int:
     """
-    Convierte string a Decimal con validación amable.
+    Convierte string a centavos enteros con validación amable.
     """
     try:
-        return Decimal(value)
+        return montos.a_centavos(value)
     except (InvalidOperation, ValueError):
         raise HTTPException(status_code=422, detail=f"{field_name} debe ser numérico")
 
+def snapshot_registro(registro: Registro) -> SimpleNamespace:
+    """
+    Copia de los campos que afectan agregados, para revertir el estado previo
+    después de modificar el registro.
+    """
+    return SimpleNamespace(
+        usuarios_id=registro.usuarios_id,
+        lista_cuentas_id=registro.lista_cuentas_id,
+        subCategorias_id=registro.subCategorias_id,
+        categori_metodos_id=registro.categori_metodos_id,
+        monto=registro.monto,
+        monto_centavos=montos.centavos_registro(registro),
+        fecha_registro=registro.fecha_registro,
+    )
+
 @router.get("/", response_model=List[RegistroResponse])
-def listar_registros(
+async def listar_registros(
+    request: Request,
+    response: Response,
+    limite: Optional[int] = Query(None, ge=1, le=paginacion.LIMITE_MAXIMO, description="Tamaño de página (sin valor: todos)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en el header X-Next-Cursor"),
+    desde: Optional[datetime] = Query(None, description="Fecha inicial (inclusive)"),
+    hasta: Optional[datetime] = Query(None, description="Fecha final (exclusiva)"),
+    lista_cuentas_id: Optional[int] = Query(None),
+    subCategorias_id: Optional[int] = Query(None),
+    categori_metodos_id: Optional[int] = Query(None),
+    tipo: Optional[str] = Query(None, pattern="^(ingreso|gasto)$"),
+    current_user: Usuario = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Registros del usuario, más recientes primero. Con 'limite' pagina por
+    cursor (fecha_registro, id); el cursor de la siguiente página viene en el
+    header X-Next-Cursor (ausente en la última página).
+    """
+    no_modificado = await condicional.listado(request, response, current_user.id, "registros")
+    if no_modificado is not None:
+        return no_modificado
+    stmt = select(Registro).where(*paginacion.filtros_registros(
+        current_user.id, desde, hasta, lista_cuentas_id, subCategorias_id, categori_metodos_id, tipo
+    ))
+    if limite is None:
+        if cursor:
+            stmt = stmt.where(paginacion.condicion_cursor(cursor))
+        resultado = await db.execute(stmt.order_by(Registro.fecha_registro.desc(), Registro.id.desc()))
+        return resultado.scalars().all()
+
+    filas, siguiente = await paginacion.paginar(db, stmt, limite, cursor, escalares=True)
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
+    return filas
+
+# ===============================
+# Exportación (streaming)
+# ===============================
+
+EXPORT_LOTE = 1000
+_EXPORT_COLUMNAS = ["id", "fecha_registro", "monto", "cuenta", "categoria", "subcategoria", "metodo"]
+
+def _filas_export(usuarios_id: int):
+    """
+    Recorre el historial con cursor del lado del servidor (stream_results +
+    yield_per): en memoria solo vive un lote a la vez.
+    Usa su propia sesión porque el generador sigue corriendo después de que
+    el endpoint devolvió la respuesta.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(
+                Registro.id,
+                Registro.fecha_registro,
+                Registro.monto_centavos,
+                ListaCuenta.nombre.label("cuenta"),
+                Categoria.descripcion.label("categoria"),
+                Subcategoria.descripcion.label("subcategoria"),
+                CategoriaMetodo.nombre.label("metodo"),
+            )
+            .join(ListaCuenta, Registro.lista_cuentas_id == ListaCuenta.id)
+            .join(Subcategoria, Registro.subCategorias_id == Subcategoria.id)
+            .join(Categoria, Subcategoria.categorias_id == Categoria.id)
+            .outerjoin(CategoriaMetodo, Registro.categori_metodos_id == CategoriaMetodo.id)
+            .filter(Registro.usuarios_id == usuarios_id)
+            .order_by(Registro.fecha_registro, Registro.id)
+            .execution_options(stream_results=True, yield_per=EXPORT_LOTE)
+        )
+        for r in query:
+            yield {
+                "id": r.id,
+                "fecha_registro": r.fecha_registro.isoformat(),
+                "monto": montos.a_texto(r.monto_centavos),
+                "cuenta": r.cuenta,
+                "categoria": r.categoria,
+                "subcategoria": r.subcategoria,
+                "metodo": r.metodo,
+            }
+    finally:
+        db.close()
+
+def _export_csv(usuarios_id: int):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=_EXPORT_COLUMNAS)
+    writer.writeheader()
+    for i, fila in enumerate(_filas_export(usuarios_id), start=1):
+        writer.writerow(fila)
+        if i % EXPORT_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def _export_ndjson(usuarios_id: int):
+    lineas = []
+    for fila in _filas_export(usuarios_id):
+        lineas.append(json.dumps(fila, ensure_ascii=False))
+        if len(lineas) >= EXPORT_LOTE:
+            yield "\n".join(lineas) + "\n"
+            lineas = []
+    if lineas:
+        yield "\n".join(lineas) + "\n"
+
+@router.get("/export")
+def exportar_registros(
+    formato: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv | ndjson"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
 ):
-    return (
-        db.query(Registro)
-        .filter(Registro.usuarios_id == current_user.id)
-        .order_by(Registro.fecha_registro.desc())
-        .all()
+    """
+    Exporta todo el historial del usuario en streaming (memoria constante sin
+    importar el tamaño del historial).
+    """
+    fecha = datetime.utcnow().strftime("%Y%m%d")
+    if formato == "csv":
+        contenido, media_type, ext = _export_csv(current_user.id), "text/csv", "csv"
+    else:
+        contenido, media_type, ext = _export_ndjson(current_user.id), "application/x-ndjson", "ndjson"
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="registros_{fecha}.{ext}"'},
     )
 
+@router.post("/import")
+def importar_registros(
+    archivo: UploadFile = File(..., description="Estado de cuenta CSV u OFX/QFX"),
+    formato: Optional[str] = Form(None, description="csv | ofx (por defecto, según la extensión)"),
+    lista_cuentas_id: Optional[str] = Form(None, description="Cuenta (id o nombre) para filas sin cuenta"),
+    subCategorias_id: Optional[str] = Form(None, description="Subcategoría (id o nombre) para filas sin subcategoría"),
+    categori_metodos_id: Optional[str] = Form(None, description="Método (id o nombre) para filas sin método"),
+    encoding: str = Form("utf-8-sig", description="Codificación del archivo (p. ej. latin-1)"),
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Importa un estado de cuenta en lotes (ver utils/importacion.py): filas
+    duplicadas de importaciones previas se omiten y las inválidas se
+    reportan sin detener el resto.
+    """
+    if formato is None:
+        nombre = (archivo.filename or "").lower()
+        formato = "ofx" if nombre.endswith((".ofx", ".qfx")) else "csv"
+    if formato not in ("csv", "ofx"):
+        raise HTTPException(status_code=422, detail="formato debe ser csv u ofx")
+
+    try:
+        lineas = io.TextIOWrapper(archivo.file, encoding=encoding, newline="")
+    except LookupError:
+        raise HTTPException(status_code=422, detail=f"Codificación desconocida: {encoding}")
+
+    try:
+        return importacion.importar(
+            db, current_user, lineas, formato,
+            cuenta_default=lista_cuentas_id,
+            subcategoria_default=subCategorias_id,
+            metodo_default=categori_metodos_id,
+        )
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=422, detail=f"El archivo no está en {encoding}; los lotes previos ya se importaron")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
+
+BATCH_MAX_OPERACIONES = int(os.getenv("BATCH_MAX_OPERACIONES", "500"))
+
+def _hash_ref(ref: str) -> str:
+    """hash_contenido de un registro creado por batch: el reintento con el mismo ref no duplica."""
+    return hashlib.sha256(f"batch|{ref}".encode()).hexdigest()
+
+def _campos_batch(op: RegistroBatchOperacion, resolvedor: importacion.Resolvedor, parcial: bool) -> dict:
+    """
+    Valores de Registro de una operación, validados contra los catálogos ya
+    cargados (sin consultas). Con parcial=True solo los campos enviados.
+    ValueError si algo no es válido.
+    """
+    enviados = op.model_fields_set
+    valores = {}
+    if not parcial or "lista_cuentas_id" in enviados:
+        valores["lista_cuentas_id"] = resolvedor.resolver("cuenta", op.lista_cuentas_id)
+        if valores["lista_cuentas_id"] is None:
+            raise ValueError("lista_cuentas_id es obligatorio")
+    if not parcial or "subCategorias_id" in enviados:
+        valores["subCategorias_id"] = resolvedor.resolver("subcategoria", op.subCategorias_id)
+        if valores["subCategorias_id"] is None:
+            raise ValueError("subCategorias_id es obligatorio")
+    if not parcial or "categori_metodos_id" in enviados:
+        valores["categori_metodos_id"] = resolvedor.resolver("metodo", op.categori_metodos_id)
+    if not parcial or "monto" in enviados:
+        if op.monto is None:
+            raise ValueError("monto es obligatorio")
+        try:
+            centavos = montos.a_centavos(op.monto)
+        except (InvalidOperation, ValueError):
+            raise ValueError("monto debe ser numérico")
+        valores["monto"] = montos.a_texto(centavos)
+        valores["monto_centavos"] = centavos
+    return valores
+
+@router.post("/batch")
+def batch_registros(
+    payload: RegistroBatchRequest,
+    current_user: Usuario = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Aplica una lista de operaciones (crear / actualizar / eliminar) en una
+    sola transacción y devuelve un resultado por operación.
+
+    Los efectos se suman primero y se aplican una vez (utils/movimientos.py):
+    un ajuste de saldo por cuenta, no uno por operación. Una operación
+    inválida se reporta y se omite; con atomico=true no se aplica ninguna.
+    """
+    if len(payload.operaciones) > BATCH_MAX_OPERACIONES:
+        raise HTTPException(status_code=422, detail=f"Máximo {BATCH_MAX_OPERACIONES} operaciones por batch")
+    try:
+        return _aplicar_batch(payload, current_user, db)
+    except IntegrityError:
+        # Otro batch con el mismo ref hizo commit entre la búsqueda de
+        # 'previos' y el insert (uq_registros_usuario_hash). Se repite una
+        # vez: ahora lo encuentra y esas creaciones salen como duplicado
+        db.rollback()
+        return _aplicar_batch(payload, current_user, db)
+
+def _aplicar_batch(payload: RegistroBatchRequest, current_user: Usuario, db: Session) -> dict:
+    operaciones = payload.operaciones
+    uid = current_user.id
+    resolvedor = importacion.Resolvedor(db, uid)
+
+    # Registros a modificar: una consulta, locks en orden de id
+    ids = sorted({op.id for op in operaciones if op.op != "crear" and op.id is not None})
+    existentes = {}
+    if ids:
+        existentes = {
+            r.id: r for r in db.query(Registro)
+            .filter(Registro.id.in_(ids), Registro.usuarios_id == uid)
+            .order_by(Registro.id)
+            .with_for_update()
+            .all()
+        }
+
+    # Creaciones ya aplicadas en un envío anterior (reintento del cliente)
+    refs = {_hash_ref(op.ref) for op in operaciones if op.op == "crear" and op.ref}
+    previos = {}
+    if refs:
+        previos = dict(db.query(Registro.hash_contenido, Registro.id).filter(
+            Registro.usuarios_id == uid,
+            Registro.hash_contenido.in_(refs),
+        ).all())
+
+    ahora = datetime.utcnow()
+    anteriores = {}  # id -> estado antes del batch
+    eliminados = set()
+    nuevos = []
+    creados = {}  # hash_ref -> Registro creado en este batch
+    repetidos = []  # mismo ref repetido en el batch: el id se conoce tras el flush
+    resultados = []
+    for indice, op in enumerate(operaciones):
+        resultado = {"indice": indice, "op": op.op, "ref": op.ref, "estado": "ok"}
+        resultados.append(resultado)
+        try:
+            if op.op == "crear":
+                hash_ref = _hash_ref(op.ref) if op.ref else None
+                if hash_ref in previos:
+                    resultado.update(estado="duplicado", id=previos[hash_ref])
+                    continue
+                if hash_ref in creados:
+                    resultado["estado"] = "duplicado"
+                    repetidos.append((resultado, creados[hash_ref]))
+                    continue
+                fecha = ahora
+                if op.fecha_registro is not None:
+                    fecha = op.fecha_registro
+                    if fecha.tzinfo:
+                        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+                    fecha = min(fecha, ahora)
+                registro = Registro(
+                    usuarios_id=uid,
+                    fecha_registro=fecha,
+                    hash_contenido=hash_ref,
+                    **_campos_batch(op, resolvedor, parcial=False),
+                )
+                db.add(registro)
+                nuevos.append((resultado, registro))
+                if hash_ref:
+                    creados[hash_ref] = registro
+                continue
+
+            registro = existentes.get(op.id)
+            if registro is None or op.id in eliminados:
+                raise ValueError("Registro no encontrado")
+            resultado["id"] = registro.id
+            anteriores.setdefault(registro.id, snapshot_registro(registro))
+            if op.op == "actualizar":
+                for campo, valor in _campos_batch(op, resolvedor, parcial=True).items():
+                    setattr(registro, campo, valor)
+            else:
+                eliminados.add(registro.id)
+                db.delete(registro)
+        except ValueError as e:
+            resultado.update(estado="error", error=str(e))
+
+    errores = sum(1 for r in resultados if r["estado"] == "error")
+    if payload.atomico and errores:
+        db.rollback()
+        raise HTTPException(status_code=422, detail={"mensaje": "Ninguna operación aplicada", "resultados": resultados})
+
+    db.flush()
+    for resultado, registro in nuevos + repetidos:
+        resultado["id"] = registro.id
+
+    # Estado previo revertido + estado final aplicado, coalescidos
+    finales = [existentes[i] for i in anteriores if i not in eliminados] + [r for _, r in nuevos]
+    movimientos.aplicar(db, uid, [(a, -1) for a in anteriores.values()] + [(r, 1) for r in finales])
+    if any(montos.centavos_registro(r) < 0 for r in finales):
+        alertas.evaluar(db, current_user)
+
+    db.commit()
+    cache.invalidar(uid, *RECURSOS_ESCRITURA)
+    return {
+        "aplicadas": sum(1 for r in resultados if r["estado"] == "ok"),
+        "duplicadas": sum(1 for r in resultados if r["estado"] == "duplicado"),
+        "errores": errores,
+        "resultados": resultados,
+    }
+
 @router.post("/", response_model=RegistroResponse)
 def crear_registro(
     lista_cuentas_id: int = Form(..., description="ID de la cuenta"),
@@ -66,30 +412,35 @@ def crear_registro(
     if not cuenta:
         raise HTTPException(status_code=404, detail="Cuenta no encontrada")
     
-    subcategoria = db.query(Subcategoria).filter(Subcategoria.id == subCategorias_id).first()
-    if not subcategoria:
+    if not catalogo.existe_subcategoria(subCategorias_id):
         raise HTTPException(status_code=404, detail="Subcategoría no encontrada")
 
     cm_id = parse_optional_int(categori_metodos_id, "categori_metodos_id")
     if cm_id is not None:
-        cm = db.query(CategoriaMetodo).filter(CategoriaMetodo.id == cm_id).first()
-        if not cm:
+        if not catalogo.existe_metodo(cm_id):
             raise HTTPException(status_code=404, detail="Categoría método no encontrada")
 
     # Validar monto
-    _ = parse_decimal(monto, "monto")
+    monto_centavos = parse_centavos(monto, "monto")
 
-    # Crear registro (si tienes trigger AFTER INSERT, él ajusta la cuenta)
+    # Crear registro; el saldo lo ajusta la API (ya no hay trigger)
     db_registro = Registro(
         usuarios_id=current_user.id,
         lista_cuentas_id=lista_cuentas_id,
         subCategorias_id=subCategorias_id,
-        monto=monto,
+        monto=montos.a_texto(monto_centavos),
+        monto_centavos=monto_centavos,
         fecha_registro=datetime.utcnow(),
         categori_metodos_id=cm_id  # puede ser None
     )
     db.add(db_registro)
+    saldos.ajustar(db, cuenta.id, monto_centavos, db_registro.fecha_registro)
+    rollups.aplicar_registro(db, db_registro)
+    gastado.aplicar_registro(db, db_registro)
+    if monto_centavos < 0:
+        alertas.evaluar(db, current_user, subCategorias_id)
     db.commit()
+    cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
     db.refresh(db_registro)
     return db_registro
 
@@ -106,25 +457,26 @@ def actualizar_registro(
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # FOR UPDATE: dos ediciones simultáneas del mismo registro se serializan
+    # y cada una calcula su delta sobre el monto que dejó la anterior
     registro = db.query(Registro).filter(
         Registro.id == registro_id,
         Registro.usuarios_id == current_user.id
-    ).first()
+    ).with_for_update().first()
     if not registro:
         raise HTTPException(status_code=404, detail="Registro no encontrado")
 
     # Estado previo
-    old_cuenta = registro.lista_cuenta  # relación en tu modelo
-    if not old_cuenta:
-        raise HTTPException(status_code=500, detail="Relación lista_cuenta no disponible en el modelo Registro")
+    anterior = snapshot_registro(registro)
+    old_cuenta_id = registro.lista_cuentas_id
     try:
-        old_monto = Decimal(registro.monto)
+        old_monto = montos.centavos_registro(registro)
     except (InvalidOperation, ValueError):
         raise HTTPException(status_code=500, detail="Monto almacenado inválido en el registro")
 
     # Determinar nueva cuenta (si se solicitó cambio)
     new_cuenta = None
-    if lista_cuentas_id is not None and lista_cuentas_id != old_cuenta.id:
+    if lista_cuentas_id is not None and lista_cuentas_id != old_cuenta_id:
         new_cuenta = db.query(ListaCuenta).filter(
             ListaCuenta.id == lista_cuentas_id,
             ListaCuenta.usuarios_id == current_user.id
@@ -132,13 +484,16 @@ def actualizar_registro(
         if not new_cuenta:
             raise HTTPException(status_code=404, detail="Cuenta no encontrada")
 
+    if subCategorias_id is not None and not catalogo.existe_subcategoria(subCategorias_id):
+        raise HTTPException(status_code=404, detail="Subcategoría no encontrada")
+
     # Determinar nuevo monto (si viene), si no, usar el viejo
     if monto is not None:
-        new_monto = parse_decimal(monto, "monto")
+        new_monto = parse_centavos(monto, "monto")
     else:
         new_monto = old_monto
 
-    # Reglas de ajuste de saldos en cuentas:
+    # Reglas de ajuste de saldos en cuentas (UPDATE relativo en SQL):
     # 1) Si cambia la cuenta:
     #    - Restar old_monto de la cuenta vieja
     #    - Sumar new_monto a la cuenta nueva
@@ -146,18 +501,16 @@ def actualizar_registro(
     #    - Sumar diff a la cuenta actual
     if new_cuenta is not None:
         # Mover saldo de una cuenta a otra
-        old_cuenta.cantidad = str(Decimal(old_cuenta.cantidad) - old_monto)
-        new_cuenta.cantidad = str(Decimal(new_cuenta.cantidad) + new_monto)
+        saldos.ajustar_varios(db, {old_cuenta_id: -old_monto, new_cuenta.id: new_monto}, registro.fecha_registro)
         registro.lista_cuentas_id = new_cuenta.id
     else:
         # Misma cuenta; si llegó un nuevo monto, ajustar la diferencia
-        if monto is not None:
-            diff = new_monto - old_monto
-            old_cuenta.cantidad = str(Decimal(old_cuenta.cantidad) + diff)
+        saldos.ajustar(db, old_cuenta_id, new_monto - old_monto, registro.fecha_registro)
 
     # Actualizar campos del registro
     if monto is not None:
-        registro.monto = str(new_monto)
+        registro.monto = montos.a_texto(new_monto)
+        registro.monto_centavos = new_monto
     if subCategorias_id is not None:
         registro.subCategorias_id = subCategorias_id
 
@@ -167,12 +520,20 @@ def actualizar_registro(
         if cm_id is None:
             registro.categori_metodos_id = None
         else:
-            cm = db.query(CategoriaMetodo).filter(CategoriaMetodo.id == cm_id).first()
-            if not cm:
+            if not catalogo.existe_metodo(cm_id):
                 raise HTTPException(status_code=404, detail="Categoría método no encontrada")
             registro.categori_metodos_id = cm_id
 
+    # Rollup y presupuestos: revertir el estado previo y aplicar el nuevo
+    rollups.aplicar_registro(db, anterior, signo=-1)
+    rollups.aplicar_registro(db, registro)
+    gastado.aplicar_registro(db, anterior, signo=-1)
+    gastado.aplicar_registro(db, registro)
+    if new_monto < 0:
+        alertas.evaluar(db, current_user, registro.subCategorias_id)
+
     db.commit()
+    cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
     db.refresh(registro)
     return registro
 
@@ -185,10 +546,15 @@ def eliminar_registro(
     registro = db.query(Registro).filter(
         Registro.id == registro_id,
         Registro.usuarios_id == current_user.id
-    ).first()
+    ).with_for_update().first()
     if not registro:
         raise HTTPException(status_code=404, detail="Registro no encontrado")
-    
+
+    # Antes el saldo no se corregía al borrar: quedaba con el monto fantasma
+    saldos.ajustar(db, registro.lista_cuentas_id, -montos.centavos_registro(registro), registro.fecha_registro)
+    rollups.aplicar_registro(db, registro, signo=-1)
+    gastado.aplicar_registro(db, registro, signo=-1)
     db.delete(registro)
     db.commit()
+    cache.invalidar(current_user.id, *RECURSOS_ESCRITURA)
     return {"mensaje": "Registro eliminado exitosamente"}
@@ -2,15 +2,16 @@ from fastapi import APIRouter, Depends, HTTPException, Form
 from sqlalchemy.orm import Session
 from typing import List
 
-from models.database import get_db, Subcategoria, Categoria, Usuario
+from models.database import get_db, Subcategoria, Usuario
 from models.schemas import SubcategoriaResponse
 from auth.auth import get_current_user
+from utils import catalogo
 
 router = APIRouter(prefix="/subcategorias", tags=["Subcategorias"])
 
 @router.get("/", response_model=List[SubcategoriaResponse])
-def listar_subcategorias(current_user: Usuario = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(Subcategoria).all()
+def listar_subcategorias(current_user: Usuario = Depends(get_current_user)):
+    return catalogo.subcategorias()
 
 @router.post("/", response_model=SubcategoriaResponse)
 def crear_subcategoria(
@@ -19,8 +20,7 @@ def crear_subcategoria(
     current_user: Usuario = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    categoria = db.query(Categoria).filter(Categoria.id == categorias_id).first()
-    if not categoria:
+    if not catalogo.existe_categoria(categorias_id):
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
     
     db_subcategoria = Subcategoria(
@@ -29,6 +29,7 @@ def crear_subcategoria(
     )
     db.add(db_subcategoria)
     db.commit()
+    catalogo.invalidar()
     db.refresh(db_subcategoria)
     return db_subcategoria
 
@@ -45,6 +46,7 @@ def actualizar_subcategoria(
     
     subcategoria.descripcion = descripcion
     db.commit()
+    catalogo.invalidar()
     db.refresh(subcategoria)
     return subcategoria
 
@@ -60,4 +62,5 @@ def eliminar_subcategoria(
     
     db.delete(subcategoria)
     db.commit()
+    catalogo.invalidar()
     return {"mensaje": "Subcategoría eliminada exitosamente"}
\ No newline at end of file
@@ -1,12 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 from typing import List, Optional
 from datetime import datetime
 
-from models.database import get_db, Usuario, ListaCuenta, Presupuesto, PagoFijo, Registro
+from models.database import get_db, get_async_db, Usuario, ListaCuenta, Presupuesto, PresupuestoPeriodo, PresupuestoAlerta, Notificacion, PagoFijo, Registro, ResumenDiario, SaldoDiario
 from models.schemas import UsuarioResponse, Token
-from auth.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from auth.auth import create_access_token, get_current_user, invalidar_usuario
+from auth.hashing import hash_password_async, verificar_password_async
 from utils.sms import enviar_sms
+from utils import cache
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
@@ -15,18 +19,25 @@ router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     correo: str = Form(..., description="Correo electrónico"),
     contrasena: str = Form(..., description="Contraseña"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(Usuario).filter(Usuario.correo == correo).first()
-    if not user or not verify_password(contrasena, user.contrasena):
+    user = (await db.execute(select(Usuario).where(Usuario.correo == correo))).scalars().first()
+    valida, nuevo_hash = (False, None)
+    if user:
+        valida, nuevo_hash = await verificar_password_async(contrasena, user.contrasena)
+    if not valida:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Correo o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Rehash transparente si cambió el costo de bcrypt
+    if nuevo_hash:
+        await db.execute(update(Usuario).where(Usuario.id == user.id).values(contrasena=nuevo_hash))
+        await db.commit()
     access_token = create_access_token(data={"sub": str(user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -40,19 +51,19 @@ def login(
 
 
 @router.post("/", response_model=UsuarioResponse)
-def crear_usuario(
+async def crear_usuario(
     nombre: str = Form(..., description="Nombre del usuario"),
     apellidos: str = Form(..., description="Apellidos del usuario"),
     telefono: int = Form(..., description="Número de teléfono"),
     correo: str = Form(..., description="Correo electrónico"),
     contrasena: str = Form(..., description="Contraseña"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_user = db.query(Usuario).filter(Usuario.correo == correo).first()
+    db_user = (await db.execute(select(Usuario).where(Usuario.correo == correo))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Este correo ya está registrado")
     
-    hashed_password = get_password_hash(contrasena)
+    hashed_password = await hash_password_async(contrasena)
     db_user = Usuario(
         nombre=nombre,
         apellidos=apellidos,
@@ -62,8 +73,8 @@ def crear_usuario(
         fecha_creacion=datetime.utcnow()
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
@@ -102,7 +113,7 @@ def obtener_usuario_por_id(
 
 
 @router.put("/{usuario_id}", response_model=UsuarioResponse)
-def actualizar_usuario(
+async def actualizar_usuario(
     usuario_id: int,
     nombre: Optional[str] = Form(None, description="Nuevo nombre"),
     apellidos: Optional[str] = Form(None, description="Nuevos apellidos"),
@@ -110,9 +121,9 @@ def actualizar_usuario(
     correo: Optional[str] = Form(None, description="Nuevo correo electrónico"),
     contrasena: Optional[str] = Form(None, description="Nueva contraseña"),
     current_user: Usuario = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await db.get(Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
@@ -123,18 +134,21 @@ def actualizar_usuario(
     if telefono is not None:
         usuario.telefono = telefono
     if correo is not None:
-        existente = db.query(Usuario).filter(
+        existente = (await db.execute(select(Usuario).where(
             Usuario.correo == correo,
             Usuario.id != usuario_id
-        ).first()
+        ))).scalars().first()
         if existente:
             raise HTTPException(status_code=400, detail="El correo ya está en uso")
         usuario.correo = correo
     if contrasena is not None:
-        usuario.contrasena = get_password_hash(contrasena)
+        usuario.contrasena = await hash_password_async(contrasena)
 
-    db.commit()
-    db.refresh(usuario)
+    await db.commit()
+    invalidar_usuario(usuario_id)
+    # /graficos/resumen lleva el nombre del usuario
+    cache.invalidar(usuario_id)
+    await db.refresh(usuario)
     return usuario
 
 @router.delete("/{usuario_id}")
@@ -154,21 +168,29 @@ def eliminar_usuario(
     if registros_ids:
         db.query(Estadistica).filter(Estadistica.registros_id.in_(registros_ids)).delete(synchronize_session=False)
 
-    # 2. Eliminar registros del usuario
+    # 2. Eliminar registros del usuario (y su rollup diario)
     db.query(Registro).filter(Registro.usuarios_id == usuario_id).delete(synchronize_session=False)
+    db.query(ResumenDiario).filter(ResumenDiario.usuarios_id == usuario_id).delete(synchronize_session=False)
 
     # 3. Eliminar presupuestos del usuario
+    db.query(PresupuestoPeriodo).filter(PresupuestoPeriodo.usuarios_id == usuario_id).delete(synchronize_session=False)
+    db.query(PresupuestoAlerta).filter(PresupuestoAlerta.usuarios_id == usuario_id).delete(synchronize_session=False)
+    db.query(Notificacion).filter(Notificacion.usuarios_id == usuario_id).delete(synchronize_session=False)
     db.query(Presupuesto).filter(Presupuesto.usuarios_id == usuario_id).delete(synchronize_session=False)
 
     # 4. Eliminar pagos fijos del usuario
     db.query(PagoFijo).filter(PagoFijo.usuarios_id == usuario_id).delete(synchronize_session=False)
 
-    # 5. Eliminar lista_cuentas del usuario
+    # 5. Eliminar lista_cuentas del usuario (y sus cortes de historial)
+    cuentas_usuario = select(ListaCuenta.id).where(ListaCuenta.usuarios_id == usuario_id)
+    db.query(SaldoDiario).filter(SaldoDiario.lista_cuentas_id.in_(cuentas_usuario)).delete(synchronize_session=False)
     db.query(ListaCuenta).filter(ListaCuenta.usuarios_id == usuario_id).delete(synchronize_session=False)
 
     # 6. Finalmente, eliminar el usuario
     db.delete(usuario)
     db.commit()
+    cache.invalidar(usuario_id)
+    invalidar_usuario(usuario_id)
     return {"mensaje": "Usuario eliminado exitosamente"}
 
 @router.post("/sms")
@@ -1,4 +1,12 @@
 #!/bin/bash
 PORT="${PORT:-8000}"
 echo "Starting server on port: $PORT"
+# Worker del outbox de notificaciones (OUTBOX_WORKER=0 si corre como servicio aparte)
+if [ "${OUTBOX_WORKER:-1}" != "0" ]; then
+  python -m utils.outbox &
+fi
+# Cortes diarios de saldo pendientes (idempotente; correrlo también a diario por cron)
+if [ "${HISTORIAL_CORTES:-1}" != "0" ]; then
+  python -m utils.historial &
+fi
 uvicorn main:app --host "0.0.0.0" --port "$PORT" --timeout-keep-alive 75 --workers 1 --log-level debug
\ No newline at end of file
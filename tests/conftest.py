@@ -0,0 +1,198 @@
+# tests/conftest.py
+"""
+Pruebas contra SQLite (sync) + aiosqlite (ruta async), sin MySQL ni Redis.
+
+DATABASE_URL se fija antes de importar la app: models/database.py crea los
+engines al importarse. Cada prueba arranca con las tablas vacías.
+"""
+import asyncio
+import inspect
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional
+
+_DIR = tempfile.mkdtemp(prefix="lana-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIR, 'lana.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["CACHE_BACKEND"] = "memoria"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import httpx
+import pytest
+from sqlalchemy import event
+
+import main
+from auth import auth
+from auth.auth import UsuarioPrincipal, create_access_token, get_current_user
+from models.database import (
+    Base, SessionLocal, engine, async_engine, Usuario, Categoria, Subcategoria, CategoriaMetodo, ListaCuenta,
+)
+from utils import cache, catalogo
+
+Base.metadata.create_all(engine)
+
+
+class Cliente:
+    """
+    Cliente HTTP sync sobre la app ASGI (httpx.ASGITransport). Todas las
+    llamadas corren en el mismo event loop, como en uvicorn, para que el
+    pool de aiosqlite no mezcle loops.
+    """
+
+    def __init__(self, app, loop, headers: Optional[dict] = None):
+        self.app = app
+        self.loop = loop
+        self.headers = headers or {}
+
+    def request(self, metodo: str, url: str, **kwargs) -> httpx.Response:
+        async def _llamar():
+            transporte = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transporte, base_url="http://test", headers=self.headers) as c:
+                return await c.request(metodo, url, **kwargs)
+        return self.loop.run_until_complete(_llamar())
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(autouse=True)
+def tablas_vacias():
+    with engine.begin() as conn:
+        for tabla in reversed(Base.metadata.sorted_tables):
+            conn.execute(tabla.delete())
+    # Los ids se repiten entre pruebas: nada de versiones ni resultados previos
+    cache.backend = cache.MemoriaBackend()
+    auth._principales = cache.MemoriaBackend()
+    catalogo.invalidar()
+    yield
+    main.app.dependency_overrides.clear()
+
+
+class Sentencias(list):
+    """SQL ejecutado en ambos engines mientras la prueba escucha."""
+
+    def de_tabla(self, tabla: str) -> list[str]:
+        return [s for s in self if tabla in s]
+
+
+@pytest.fixture
+def sentencias():
+    capturadas = Sentencias()
+
+    def registrar(conn, cursor, sql, parametros, contexto, executemany):
+        capturadas.append(sql)
+
+    motores = (engine, async_engine.sync_engine)
+    for motor in motores:
+        event.listen(motor, "before_cursor_execute", registrar)
+    yield capturadas
+    for motor in motores:
+        event.remove(motor, "before_cursor_execute", registrar)
+
+
+@pytest.fixture
+def db():
+    sesion = SessionLocal()
+    yield sesion
+    sesion.close()
+
+
+@pytest.fixture
+def catalogo_base(db):
+    """Una categoría con dos subcategorías y un método de pago."""
+    db.add_all([
+        Categoria(id=1, descripcion="Hogar"),
+        Categoria(id=2, descripcion="Ocio"),
+        Subcategoria(id=1, categorias_id=1, descripcion="Renta"),
+        Subcategoria(id=2, categorias_id=2, descripcion="Cine"),
+        CategoriaMetodo(id=1, nombre="Efectivo"),
+    ])
+    db.commit()
+    catalogo.invalidar()
+    return {"categorias": (1, 2), "subcategorias": (1, 2), "metodo": 1}
+
+
+def crear_usuario(db, correo="ana@example.com") -> UsuarioPrincipal:
+    u = Usuario(
+        nombre="Ana", apellidos="Prueba", telefono=5550000, correo=correo,
+        contrasena="x", fecha_creacion=datetime(2024, 1, 1),
+    )
+    db.add(u)
+    db.commit()
+    return UsuarioPrincipal(
+        id=u.id, nombre=u.nombre, apellidos=u.apellidos, telefono=u.telefono,
+        correo=u.correo, fecha_creacion=u.fecha_creacion,
+    )
+
+
+@pytest.fixture
+def usuario(db) -> UsuarioPrincipal:
+    return crear_usuario(db)
+
+
+@pytest.fixture
+def cuenta(db, usuario) -> int:
+    c = ListaCuenta(
+        usuarios_id=usuario.id, nombre="Débito", cantidad="1000.00",
+        cantidad_centavos=100000, saldo_inicial_centavos=100000,
+    )
+    db.add(c)
+    db.commit()
+    return c.id
+
+
+@pytest.fixture
+def cliente(loop, usuario) -> Cliente:
+    async def principal():
+        # async como el get_current_user real: no ocupa el threadpool
+        return usuario
+
+    main.app.dependency_overrides[get_current_user] = principal
+    return Cliente(main.app, loop)
+
+
+@pytest.fixture
+def cliente_jwt(loop, usuario) -> Cliente:
+    """Cliente con el get_current_user real: JWT en el header Authorization."""
+    token = create_access_token({"sub": str(usuario.id)})
+    return Cliente(main.app, loop, headers={"Authorization": f"Bearer {token}"})
+
+
+@pytest.fixture
+def medir(loop):
+    """
+    Benchmark simple: corre fn() 'veces' veces (si devuelve una corrutina, en
+    el loop de las pruebas) y devuelve p50/p95 en milisegundos.
+    """
+    def _medir(fn, veces: int = 50) -> dict:
+        tiempos = []
+        for _ in range(veces):
+            inicio = time.perf_counter()
+            resultado = fn()
+            if inspect.isawaitable(resultado):
+                loop.run_until_complete(resultado)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        return {
+            "p50": round(tiempos[len(tiempos) // 2], 3),
+            "p95": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+        }
+    return _medir
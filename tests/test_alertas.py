@@ -0,0 +1,35 @@
+# tests/test_alertas.py
+from models.database import Notificacion, PresupuestoAlerta
+
+
+def _gasto(cliente, cuenta, subcategoria, monto):
+    r = cliente.post("/registros/", data={
+        "lista_cuentas_id": cuenta, "subCategorias_id": subcategoria, "monto": monto, "categori_metodos_id": "1",
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_gasto_que_excede_encola_una_alerta(cliente, db, catalogo_base, cuenta):
+    r = cliente.post("/presupuestos/", data={"categorias_id": 1, "monto_limite": 100})
+    assert r.status_code == 200, r.text
+    _gasto(cliente, cuenta, 1, "-150")
+    _gasto(cliente, cuenta, 1, "-10")
+
+    asuntos = [n.asunto for n in db.query(Notificacion).all()]
+    assert asuntos == ["Presupuesto EXCEDIDO: Hogar"]
+
+
+def test_cambio_de_categoria_no_alerta_con_el_gastado_anterior(cliente, db, catalogo_base, cuenta):
+    r = cliente.post("/presupuestos/", data={"categorias_id": 1, "monto_limite": 1000})
+    presupuesto_id = r.json()["id"]
+    _gasto(cliente, cuenta, 1, "-500")  # 50% de Hogar: sin alerta
+
+    # La categoría nueva no tiene gastos; con el gastado viejo (500) el
+    # límite nuevo (400) se vería excedido
+    r = cliente.put(f"/presupuestos/{presupuesto_id}", data={"categorias_id": 2, "monto_limite": 400})
+    assert r.status_code == 200, r.text
+    assert r.json()["gastado"] == 0
+
+    assert db.query(Notificacion).count() == 0
+    assert db.query(PresupuestoAlerta).count() == 0
@@ -0,0 +1,139 @@
+# tests/test_async.py
+import asyncio
+import os
+import time
+from typing import List
+
+import anyio
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+import main
+from auth.auth import get_current_user
+from models.database import ASYNC_DATABASE_URL, DATABASE_URL, THREADPOOL_LIMIT, ListaCuenta, get_async_db, get_db
+from models.schemas import ListaCuentaResponse
+from routers import lista_cuentas
+
+CLIENTES = 200
+PETICIONES_BENCH = int(os.getenv("ASYNC_BENCH_PETICIONES", "5"))  # por cliente
+RUTAS = ("/lista_cuentas/", "/registros/", "/deudas/", "/graficos/cuentas", "/graficos/por-categoria")
+
+
+def test_listados_async_con_200_clientes_sin_threadpool(cliente, loop, cuenta):
+    async def carga():
+        limitador = anyio.to_thread.current_default_thread_limiter()
+        hilos = 0
+        terminado = asyncio.Event()
+
+        async def vigilar():
+            nonlocal hilos
+            while not terminado.is_set():
+                hilos = max(hilos, limitador.borrowed_tokens)
+                await asyncio.sleep(0)
+
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://test") as c:
+            vigilante = asyncio.ensure_future(vigilar())
+            respuestas = await asyncio.gather(*(c.get(RUTAS[i % len(RUTAS)]) for i in range(CLIENTES)))
+            terminado.set()
+            await vigilante
+        return respuestas, hilos
+
+    respuestas, hilos = loop.run_until_complete(carga())
+
+    assert [r.status_code for r in respuestas] == [200] * CLIENTES
+    cuentas = [r.json() for r in respuestas if r.request.url.path == "/lista_cuentas/"]
+    assert all(c == cuentas[0] for c in cuentas) and cuentas[0][0]["id"] == cuenta
+    # Ruta async de punta a punta: ninguna petición tomó un hilo del threadpool
+    assert hilos == 0
+
+
+def _app_bench(principal) -> tuple[FastAPI, tuple]:
+    """
+    El listado de cuentas como era antes del port (def + Session) y como es
+    ahora (async def + AsyncSession), en una app sin middlewares.
+    """
+    app = FastAPI()
+
+    @app.get("/sync", response_model=List[ListaCuentaResponse])
+    def listar_sync(current_user=Depends(get_current_user), db: Session = Depends(get_db)):
+        return db.query(ListaCuenta).filter(ListaCuenta.usuarios_id == current_user.id).all()
+
+    @app.get("/async", response_model=List[ListaCuentaResponse])
+    async def listar_async(current_user=Depends(get_current_user), db=Depends(get_async_db)):
+        return await lista_cuentas.cuentas_de_usuario(db, current_user.id)
+
+    # Una conexión por cliente en ambas rutas. Con el pool de 5+10 de SQLite,
+    # 200 handlers sync se quedan esperando conexiones que retienen sesiones
+    # que a su vez esperan un hilo para serializar y cerrarse. aiosqlite usa
+    # NullPool por defecto (una conexión nueva por request): pool explícito
+    motor = create_engine(DATABASE_URL, pool_size=CLIENTES, max_overflow=0)
+    motor_async = create_async_engine(
+        ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=CLIENTES, max_overflow=0,
+    )
+    sesiones = sessionmaker(bind=motor)
+    sesiones_async = async_sessionmaker(motor_async, expire_on_commit=False)
+
+    def db_sync():
+        db = sesiones()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def db_async():
+        async with sesiones_async() as db:
+            yield db
+
+    app.dependency_overrides[get_current_user] = principal
+    app.dependency_overrides[get_db] = db_sync
+    app.dependency_overrides[get_async_db] = db_async
+    return app, (motor, motor_async)
+
+
+async def _limitador():
+    return anyio.to_thread.current_default_thread_limiter()
+
+
+def test_benchmark_sync_vs_async_con_200_clientes(cliente, loop, cuenta, monkeypatch):
+    app, (motor, motor_async) = _app_bench(main.app.dependency_overrides[get_current_user])
+
+    async def carga(ruta: str) -> dict:
+        latencias = []
+
+        async def cliente_http(c):
+            for _ in range(PETICIONES_BENCH):
+                inicio = time.perf_counter()
+                r = await c.get(ruta)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                assert r.status_code == 200 and r.json()[0]["id"] == cuenta
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as c:
+            await c.get(ruta)  # calentar pools
+            inicio = time.perf_counter()
+            await asyncio.gather(*(cliente_http(c) for _ in range(CLIENTES)))
+            segundos = time.perf_counter() - inicio
+        latencias.sort()
+        return {
+            "req_s": len(latencias) / segundos,
+            "p50": latencias[len(latencias) // 2],
+            "p95": latencias[int(len(latencias) * 0.95)],
+        }
+
+    # El mismo límite de hilos que fija main.py al arrancar
+    limitador = loop.run_until_complete(_limitador())
+    monkeypatch.setattr(limitador, "total_tokens", THREADPOOL_LIMIT)
+    try:
+        sync = loop.run_until_complete(carga("/sync"))
+        asincrono = loop.run_until_complete(carga("/async"))
+    finally:
+        motor.dispose()
+        loop.run_until_complete(motor_async.dispose())
+
+    for nombre, r in (("sync ", sync), ("async", asincrono)):
+        print(f"[BENCH] listado {nombre} x{CLIENTES} clientes: {r['req_s']:.0f} req/s, "
+              f"p50 {r['p50']:.1f}ms, p95 {r['p95']:.1f}ms")
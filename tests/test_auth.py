@@ -0,0 +1,40 @@
+# tests/test_auth.py
+from auth import auth
+
+
+def _selects_usuario(sentencias) -> list[str]:
+    return [s for s in sentencias if "FROM usuarios" in s]
+
+
+def _principal(cliente_jwt):
+    token = cliente_jwt.headers["Authorization"].removeprefix("Bearer ")
+    return auth._principales.get(auth._llave_token(token))[0]
+
+
+def test_segunda_peticion_no_consulta_usuarios(cliente_jwt, sentencias):
+    assert cliente_jwt.get("/lista_cuentas/").status_code == 200
+    assert len(_selects_usuario(sentencias)) == 1
+
+    sentencias.clear()
+    assert cliente_jwt.get("/lista_cuentas/").status_code == 200
+    assert _selects_usuario(sentencias) == []
+
+
+def test_actualizar_usuario_invalida_principal(cliente_jwt, usuario, sentencias):
+    cliente_jwt.get("/lista_cuentas/")
+    assert _principal(cliente_jwt).nombre == "Ana"
+
+    assert cliente_jwt.put(f"/usuarios/{usuario.id}", data={"nombre": "Eva"}).status_code == 200
+
+    sentencias.clear()
+    assert cliente_jwt.get("/lista_cuentas/").status_code == 200
+    assert len(_selects_usuario(sentencias)) == 1
+    assert _principal(cliente_jwt).nombre == "Eva"
+
+
+def test_eliminar_usuario_invalida_principal(cliente_jwt, usuario):
+    assert cliente_jwt.get("/lista_cuentas/").status_code == 200
+
+    assert cliente_jwt.delete(f"/usuarios/{usuario.id}").status_code == 200
+
+    assert cliente_jwt.get("/lista_cuentas/").status_code == 401
@@ -0,0 +1,104 @@
+# tests/test_batch.py
+from datetime import datetime
+
+from models.database import SessionLocal, ListaCuenta, Registro, ResumenDiario
+from routers import registros
+
+
+def _crear(ref, monto="-10", cuenta=None, **extra):
+    op = {"op": "crear", "ref": ref, "lista_cuentas_id": cuenta, "subCategorias_id": 1,
+          "categori_metodos_id": 1, "monto": monto}
+    op.update(extra)
+    return op
+
+
+def _saldo(db, cuenta):
+    db.expire_all()
+    return db.get(ListaCuenta, cuenta).cantidad_centavos
+
+
+def test_batch_crea_actualiza_y_elimina(cliente, db, catalogo_base, cuenta):
+    r = cliente.post("/registros/batch", json={"operaciones": [
+        _crear("a", "-10", cuenta), _crear("b", "-20", cuenta), _crear("c", "5", cuenta),
+    ]})
+    assert r.status_code == 200, r.text
+    datos = r.json()
+    assert datos["aplicadas"] == 3
+    ids = [res["id"] for res in datos["resultados"]]
+    assert _saldo(db, cuenta) == 100000 - 1000 - 2000 + 500
+
+    r = cliente.post("/registros/batch", json={"operaciones": [
+        {"op": "actualizar", "id": ids[0], "monto": "-15"},
+        {"op": "eliminar", "id": ids[1]},
+    ]})
+    assert r.json()["aplicadas"] == 2
+    assert _saldo(db, cuenta) == 100000 - 1500 + 500
+    assert db.query(Registro).count() == 2
+    # El rollup coincide con los registros finales
+    assert sum(f.cantidad_movimientos for f in db.query(ResumenDiario).all()) == 2
+
+
+def test_reintento_con_el_mismo_ref_no_duplica(cliente, db, catalogo_base, cuenta):
+    cuerpo = {"operaciones": [_crear("r1", "-10", cuenta)]}
+    primero = cliente.post("/registros/batch", json=cuerpo).json()
+    segundo = cliente.post("/registros/batch", json=cuerpo).json()
+
+    assert segundo["duplicadas"] == 1 and segundo["aplicadas"] == 0
+    assert segundo["resultados"][0]["id"] == primero["resultados"][0]["id"]
+    assert db.query(Registro).count() == 1
+    assert _saldo(db, cuenta) == 100000 - 1000
+
+
+def test_ref_repetido_en_el_mismo_batch_devuelve_el_id_creado(cliente, db, catalogo_base, cuenta):
+    datos = cliente.post("/registros/batch", json={"operaciones": [
+        _crear("x", "-10", cuenta), _crear("x", "-10", cuenta),
+    ]}).json()
+    creado, repetido = datos["resultados"]
+    assert creado["estado"] == "ok" and repetido["estado"] == "duplicado"
+    assert repetido["id"] is not None
+    assert repetido["id"] == creado["id"]
+    assert db.query(Registro).count() == 1
+
+
+def test_operacion_invalida_se_reporta_y_atomico_no_aplica_nada(cliente, db, catalogo_base, cuenta):
+    operaciones = [_crear("ok", "-10", cuenta), _crear("mal", "abc", cuenta), {"op": "eliminar", "id": 999}]
+    datos = cliente.post("/registros/batch", json={"operaciones": operaciones}).json()
+    assert [r["estado"] for r in datos["resultados"]] == ["ok", "error", "error"]
+    assert db.query(Registro).count() == 1
+
+    r = cliente.post("/registros/batch", json={"operaciones": [_crear("otro", "-1", cuenta), operaciones[1]],
+                                               "atomico": True})
+    assert r.status_code == 422
+    assert db.query(Registro).count() == 1
+    assert _saldo(db, cuenta) == 100000 - 1000
+
+
+def test_batch_concurrente_con_el_mismo_ref_sale_como_duplicado(cliente, db, usuario, catalogo_base, cuenta, monkeypatch):
+    original = registros._campos_batch
+    otro = {}
+
+    def con_carrera(op, resolvedor, parcial):
+        # El otro batch hace commit justo después de la búsqueda de 'previos'
+        if not otro:
+            s = SessionLocal()
+            competidor = Registro(
+                usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+                monto="-10.00", monto_centavos=-1000, fecha_registro=datetime.utcnow(),
+                hash_contenido=registros._hash_ref("r1"),
+            )
+            s.add(competidor)
+            s.commit()
+            otro["id"] = competidor.id
+            s.close()
+        return original(op, resolvedor, parcial)
+
+    monkeypatch.setattr(registros, "_campos_batch", con_carrera)
+    r = cliente.post("/registros/batch", json={"operaciones": [_crear("r1", "-10", cuenta), _crear("r2", "-5", cuenta)]})
+
+    assert r.status_code == 200, r.text
+    duplicado, creado = r.json()["resultados"]
+    assert duplicado == {"indice": 0, "op": "crear", "ref": "r1", "estado": "duplicado", "id": otro["id"]}
+    assert creado["estado"] == "ok"
+    assert db.query(Registro).count() == 2
+    # Solo el registro del propio batch movió el saldo (el competidor se insertó a mano)
+    assert _saldo(db, cuenta) == 100000 - 500
@@ -0,0 +1,20 @@
+# tests/test_catalogo.py
+def test_etag_304_y_cambio_tras_escritura(cliente, catalogo_base):
+    r = cliente.get("/catalogo/")
+    assert r.status_code == 200
+    etag = r.headers["ETag"]
+    assert r.json()["categorias"][0]["subcategorias"][0] == {"id": 1, "descripcion": "Renta"}
+
+    no_modificado = cliente.get("/catalogo/", headers={"If-None-Match": etag})
+    assert no_modificado.status_code == 304
+    assert no_modificado.content == b""
+    assert no_modificado.headers["ETag"] == etag
+    # Comparación débil: W/ también coincide
+    assert cliente.get("/catalogo/", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    # Una escritura del catálogo (invalidar) cambia el ETag
+    assert cliente.put("/subcategorias/1", data={"descripcion": "Alquiler"}).status_code == 200
+    r = cliente.get("/catalogo/", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert r.json()["categorias"][0]["subcategorias"][0]["descripcion"] == "Alquiler"
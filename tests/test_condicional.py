@@ -0,0 +1,60 @@
+# tests/test_condicional.py
+import pytest
+
+from utils import condicional
+
+# (listado, tabla que consulta, escritura que lo invalida)
+LISTADOS = [
+    ("/registros/", "registros", lambda c, cuenta: c.post("/registros/", data={
+        "lista_cuentas_id": cuenta, "subCategorias_id": 1, "monto": "-5", "categori_metodos_id": "1"})),
+    ("/lista_cuentas/", "lista_cuentas", lambda c, cuenta: c.post("/lista_cuentas/", data={
+        "nombre": "Ahorro", "cantidad": "10"})),
+    ("/objetivos/", "objetivos", lambda c, cuenta: c.post("/objetivos/", json={
+        "nombre": "Viaje", "monto_meta": 100})),
+    ("/deudas/", "deudas", lambda c, cuenta: c.post("/deudas/", data={
+        "nombre": "Tarjeta", "monto": 50, "fecha_inicio": "2024-01-01T00:00:00",
+        "fecha_vencimiento": "2024-06-01T00:00:00", "descripcion": "x", "categori_metodos_id": 1})),
+    ("/pagos-fijos/", "pagos_fijos", lambda c, cuenta: c.post("/pagos-fijos/", data={
+        "nombre": "Renta", "monto": 100, "dia_pago": 5})),
+]
+
+
+@pytest.mark.parametrize("ruta,tabla,escribir", LISTADOS, ids=[l[0] for l in LISTADOS])
+def test_304_sin_consulta_y_200_despues_de_escribir(cliente, catalogo_base, cuenta, sentencias, ruta, tabla, escribir):
+    primero = cliente.get(ruta)
+    assert primero.status_code == 200
+    etag = primero.headers["etag"]
+
+    sentencias.clear()
+    r = cliente.get(ruta, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+    # El 304 sale del contador de versión: no toca la tabla del listado
+    assert sentencias.de_tabla(tabla) == []
+
+    assert escribir(cliente, cuenta).status_code in (200, 201)
+    r = cliente.get(ruta, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_etag_depende_de_los_parametros(cliente, cuenta):
+    etag = cliente.get("/registros/").headers["etag"]
+    otra = cliente.get("/registros/?limite=10")
+    assert otra.headers["etag"] != etag
+    assert cliente.get("/registros/?limite=10", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_coincide_usa_comparacion_debil():
+    assert condicional.coincide('W/"a", "b"', '"a"')
+    assert condicional.coincide("*", '"x"')
+    assert not condicional.coincide('"a"', '"b"')
+    assert not condicional.coincide(None, '"a"')
+
+
+def test_medidor_cuenta_304(cliente, cuenta):
+    etag = cliente.get("/lista_cuentas/").headers["etag"]
+    cliente.get("/lista_cuentas/", headers={"If-None-Match": etag})
+    stats = condicional.estadisticas()["lista_cuentas"]
+    assert stats["304"] >= 1 and stats["bytes_evitados"] > 0
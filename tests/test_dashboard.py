@@ -0,0 +1,154 @@
+# tests/test_dashboard.py
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import Float, extract, func, insert, select
+
+from models.database import AsyncSessionLocal, ListaCuenta, Registro
+from routers import dashboard
+from utils import rollups
+
+# La petición pide usuarios con 10k+ registros
+REGISTROS_BENCH = int(os.getenv("RESUMEN_REGISTROS_BENCH", "10000"))
+
+
+def _registro(db, usuario, cuenta, centavos, fecha):
+    db.add(Registro(
+        usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+        monto=str(centavos / 100), monto_centavos=centavos, fecha_registro=fecha,
+    ))
+
+
+def test_resumen_en_una_sola_sentencia(cliente, db, usuario, catalogo_base, cuenta, sentencias):
+    ahora = datetime.now()
+    inicio_mes = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    _registro(db, usuario, cuenta, 50000, inicio_mes)                          # ingreso del mes
+    _registro(db, usuario, cuenta, -12000, ahora)                              # gasto del mes
+    _registro(db, usuario, cuenta, -99900, inicio_mes - timedelta(seconds=1))  # mes anterior
+    db.commit()
+
+    sentencias.clear()
+    datos = cliente.get("/graficos/resumen").json()
+
+    assert datos["total_movimientos"] == 3
+    assert datos["ingresos_mes"] == 500.0
+    assert datos["gastos_mes"] == 120.0
+    assert datos["balance_mes"] == 380.0
+    assert datos["total_saldo"] == 1000.0
+    # Una sola ida y vuelta a la BD (saldo como subconsulta escalar)
+    assert len(sentencias.de_tabla("registros")) == 1
+    # Rango sargable sobre fecha_registro, sin extract() sobre la columna
+    assert "EXTRACT" not in sentencias.de_tabla("registros")[0].upper()
+
+
+
+def test_resumen_cacheado_no_consulta(cliente, db, usuario, catalogo_base, cuenta, sentencias):
+    _registro(db, usuario, cuenta, -12000, datetime.now())
+    db.commit()
+
+    primero = cliente.get("/graficos/resumen").json()
+    sentencias.clear()
+    segundo = cliente.get("/graficos/resumen").json()
+
+    assert segundo == primero
+    assert sentencias.de_tabla("registros") == []
+
+
+def test_renombrar_subcategoria_invalida_graficos(cliente, db, usuario, catalogo_base, cuenta):
+    _registro(db, usuario, cuenta, -12000, datetime.now())
+    db.commit()
+    rollups.reconstruir(db, usuario.id)
+    db.commit()
+
+    antes = cliente.get("/graficos/por-categoria").json()
+    assert "Renta" in str(antes)
+
+    assert cliente.put("/subcategorias/1", data={"descripcion": "Alquiler"}).status_code == 200
+
+    despues = cliente.get("/graficos/por-categoria").json()
+    assert "Alquiler" in str(despues)
+    assert "Renta" not in str(despues)
+
+
+def test_renombrar_usuario_invalida_resumen(cliente_jwt, usuario):
+    assert cliente_jwt.get("/graficos/resumen").json()["usuario"] == "Ana Prueba"
+
+    assert cliente_jwt.put(f"/usuarios/{usuario.id}", data={"nombre": "Eva"}).status_code == 200
+
+    assert cliente_jwt.get("/graficos/resumen").json()["usuario"] == "Eva Prueba"
+
+
+def test_por_dias_cuadra_en_el_primer_dia(cliente, db, usuario, catalogo_base, cuenta):
+    primer_dia = datetime.combine((datetime.now() - timedelta(days=30)).date(), datetime.min.time())
+    _registro(db, usuario, cuenta, -5000, primer_dia + timedelta(seconds=1))
+    _registro(db, usuario, cuenta, -7000, primer_dia - timedelta(seconds=1))  # fuera del periodo
+    db.commit()
+    rollups.reconstruir(db, usuario.id)
+    db.commit()
+
+    datos = cliente.get("/graficos/por-dias", params={"dias": 30}).json()
+
+    assert [d["fecha"] for d in datos["resumen_diario"]] == [primer_dia.strftime("%Y-%m-%d")]
+    assert datos["resumen_diario"][0]["cantidad_movimientos"] == 1
+    assert [m["monto"] for m in datos["movimientos_individuales"]] == [-50.0]
+    detalle = cliente.get("/graficos/por-dias/movimientos", params={"dias": 30}).json()
+    assert [m["monto"] for m in detalle["movimientos"]] == [-50.0]
+
+
+async def _resumen_anterior(db, usuario):
+    """El /graficos/resumen original: cuatro consultas, extract() sobre la fecha."""
+    ahora = datetime.now()
+    mismo_mes = (
+        extract("month", Registro.fecha_registro) == ahora.month,
+        extract("year", Registro.fecha_registro) == ahora.year,
+    )
+    monto = func.cast(Registro.monto, Float)
+    saldo = (await db.execute(select(func.sum(func.cast(ListaCuenta.cantidad, Float))).where(
+        ListaCuenta.usuarios_id == usuario.id))).scalar() or 0
+    total = (await db.execute(select(func.count(Registro.id)).where(
+        Registro.usuarios_id == usuario.id))).scalar() or 0
+    ingresos = (await db.execute(select(func.sum(monto)).where(
+        Registro.usuarios_id == usuario.id, monto > 0, *mismo_mes))).scalar() or 0
+    gastos = (await db.execute(select(func.sum(monto)).where(
+        Registro.usuarios_id == usuario.id, monto < 0, *mismo_mes))).scalar() or 0
+    return {"total_saldo": saldo, "total_movimientos": total, "ingresos_mes": ingresos, "gastos_mes": abs(gastos)}
+
+
+def test_benchmark_resumen(loop, db, usuario, catalogo_base, cuenta, sentencias, medir):
+    ahora = datetime.now()
+    db.execute(insert(Registro), [
+        {
+            "usuarios_id": usuario.id, "lista_cuentas_id": cuenta, "subCategorias_id": 1,
+            "categori_metodos_id": 1, "monto": "2.50" if i % 5 == 0 else "-1.25",
+            "monto_centavos": 250 if i % 5 == 0 else -125,
+            "fecha_registro": ahora - timedelta(hours=2 * i),
+        }
+        for i in range(REGISTROS_BENCH)
+    ])
+    db.commit()
+
+    async def nuevo():
+        async with AsyncSessionLocal() as s:
+            return await dashboard.resumen_financiero.__wrapped__(current_user=usuario, db=s)
+
+    async def anterior():
+        async with AsyncSessionLocal() as s:
+            return await _resumen_anterior(s, usuario)
+
+    sentencias.clear()
+    datos = loop.run_until_complete(nuevo())
+    viajes_nuevo = len(sentencias)
+    sentencias.clear()
+    previo = loop.run_until_complete(anterior())
+    viajes_anterior = len(sentencias)
+
+    for campo in ("total_movimientos", "ingresos_mes", "gastos_mes"):
+        assert round(datos[campo], 2) == round(previo[campo], 2)
+
+    t_nuevo = medir(nuevo)
+    t_anterior = medir(anterior)
+    print(f"[BENCH] resumen {REGISTROS_BENCH} registros: "
+          f"anterior {viajes_anterior} viajes p95={t_anterior['p95']}ms, "
+          f"actual {viajes_nuevo} viaje p95={t_nuevo['p95']}ms")
+    assert (viajes_anterior, viajes_nuevo) == (4, 1)
+    assert t_nuevo["p95"] < t_anterior["p95"]
@@ -0,0 +1,70 @@
+# tests/test_export.py
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from models.database import Registro
+from routers import registros
+
+# La petición original pide 1M de filas; por defecto se usan menos para que
+# la suite corra rápido (EXPORT_FILAS_PRUEBA=1000000 para la prueba completa)
+FILAS = int(os.getenv("EXPORT_FILAS_PRUEBA", "100000"))
+TECHO_RSS_MB = 20
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith("VmRSS:"):
+                return int(linea.split()[1]) / 1024
+    raise RuntimeError("sin VmRSS")
+
+
+def _sinteticos(db, usuario, cuenta, total):
+    inicio = datetime(2020, 1, 1)
+    lote = 20000
+    for desde in range(0, total, lote):
+        db.execute(insert(Registro), [
+            {
+                "usuarios_id": usuario.id, "lista_cuentas_id": cuenta, "subCategorias_id": 1 + i % 2,
+                "categori_metodos_id": 1, "monto": "-1.25", "monto_centavos": -125,
+                "fecha_registro": inicio + timedelta(minutes=i),
+            }
+            for i in range(desde, min(desde + lote, total))
+        ])
+    db.commit()
+
+
+def test_export_resuelve_nombres(cliente, db, usuario, catalogo_base, cuenta):
+    _sinteticos(db, usuario, cuenta, 3)
+
+    csv = cliente.get("/registros/export").text.splitlines()
+    assert csv[0] == ",".join(registros._EXPORT_COLUMNAS)
+    assert len(csv) == 4
+    assert csv[1].endswith(",-1.25,Débito,Hogar,Renta,Efectivo")
+
+    lineas = cliente.get("/registros/export?format=ndjson").text.splitlines()
+    fila = json.loads(lineas[1])
+    assert (fila["categoria"], fila["subcategoria"], fila["metodo"]) == ("Ocio", "Cine", "Efectivo")
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="mide VmRSS de /proc")
+def test_export_memoria_acotada(db, usuario, catalogo_base, cuenta):
+    _sinteticos(db, usuario, cuenta, FILAS)
+
+    for exportar in (registros._export_csv, registros._export_ndjson):
+        base = _rss_mb()
+        maximo = base
+        filas = 0
+        for i, trozo in enumerate(exportar(usuario.id)):
+            filas += trozo.count("\n")
+            if i % 20 == 0:
+                maximo = max(maximo, _rss_mb())
+
+        assert filas >= FILAS
+        # Materializando el resultado (.all()) 100k filas ya suben ~50 MB
+        assert maximo - base < TECHO_RSS_MB, f"{exportar.__name__}: RSS creció {maximo - base:.1f} MB"
@@ -0,0 +1,45 @@
+# tests/test_gastado.py
+from datetime import datetime
+
+from models.database import Presupuesto, PresupuestoPeriodo, Registro
+from utils import gastado
+
+
+def _presupuesto(db, usuario, periodo="mensual", inicio=datetime(2024, 1, 1)):
+    p = Presupuesto(
+        usuarios_id=usuario.id, categorias_id=1, monto_limite=100.0, estado="activo",
+        fecha_creacion=inicio, periodo=periodo, periodo_inicio=inicio if periodo != "unico" else None,
+    )
+    db.add(p)
+    db.commit()
+    return p
+
+
+def test_cerrar_periodos_sin_vencidos_no_escribe(db, usuario, catalogo_base):
+    p = _presupuesto(db, usuario, inicio=datetime(2024, 3, 1))
+    assert gastado.cerrar_periodos(db, usuario.id, ahora=datetime(2024, 3, 20)) == 0
+    assert db.query(PresupuestoPeriodo).count() == 0
+    assert p.periodo_inicio == datetime(2024, 3, 1)
+
+
+def test_cerrar_periodos_guarda_cada_mes_vencido(db, usuario, catalogo_base, cuenta):
+    p = _presupuesto(db, usuario, inicio=datetime(2024, 1, 1))
+    _presupuesto(db, usuario, periodo="unico")
+    for fecha, monto in ((datetime(2024, 1, 10), -4000), (datetime(2024, 3, 5), -1500)):
+        db.add(Registro(
+            usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+            monto=str(monto / 100), monto_centavos=monto, fecha_registro=fecha,
+        ))
+    db.commit()
+
+    assert gastado.cerrar_periodos(db, usuario.id, ahora=datetime(2024, 3, 20)) == 2
+    db.commit()
+
+    fotos = db.query(PresupuestoPeriodo).order_by(PresupuestoPeriodo.inicio).all()
+    assert [(f.inicio.month, f.gastado_centavos) for f in fotos] == [(1, 4000), (2, 0)]
+    db.refresh(p)
+    assert p.periodo_inicio == datetime(2024, 3, 1)
+    assert p.gastado_centavos == 1500
+
+    # Ya cerrado: la siguiente llamada no hace nada
+    assert gastado.cerrar_periodos(db, usuario.id, ahora=datetime(2024, 3, 21)) == 0
@@ -0,0 +1,34 @@
+# tests/test_hashing.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from auth import hashing
+
+
+@pytest.fixture
+def pool_en_hilos(monkeypatch):
+    # Mismo contrato que el ProcessPoolExecutor, sin lanzar procesos
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(hashing, "_obtener_pool", lambda: pool)
+    monkeypatch.setattr(hashing, "_stats", {k: 0 for k in hashing._stats})
+    yield pool
+    pool.shutdown()
+
+
+def test_hash_y_verificacion(loop, pool_en_hilos):
+    hashed = loop.run_until_complete(hashing.hash_password_async("secreta"))
+    valida, nuevo = loop.run_until_complete(hashing.verificar_password_async("secreta", hashed))
+    assert valida and nuevo is None
+    valida, _ = loop.run_until_complete(hashing.verificar_password_async("otra", hashed))
+    assert not valida
+    assert hashing.estadisticas()["completadas"] == 3
+
+
+def test_fallos_se_cuentan_aparte(loop, pool_en_hilos):
+    with pytest.raises(ValueError):
+        loop.run_until_complete(hashing.verificar_password_async("x", "no-es-un-hash"))
+    stats = hashing.estadisticas()
+    assert stats["fallidas"] == 1
+    assert stats["completadas"] == 0
+    assert stats["pendientes"] == 0
@@ -0,0 +1,88 @@
+# tests/test_historial.py
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from models.database import Registro, SaldoDiario
+from utils import historial
+
+MOVIMIENTOS = [
+    (datetime(2024, 1, 10, 10), -1000),
+    (datetime(2024, 1, 20, 12), 5000),
+    (datetime(2024, 2, 5, 9), -2000),
+    (datetime(2024, 3, 1, 8), -500),
+]
+
+
+@pytest.fixture
+def con_cortes(db, usuario, catalogo_base, cuenta):
+    """Saldo inicial 1000.00, cuatro movimientos y cortes hasta el 2024-02-29."""
+    for fecha, centavos in MOVIMIENTOS:
+        db.add(Registro(
+            usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+            monto=str(centavos / 100), monto_centavos=centavos, fecha_registro=fecha,
+        ))
+    db.commit()
+    dia = date(2024, 1, 1)
+    while dia <= date(2024, 2, 29):
+        historial.cortes(db, dia)
+        dia += timedelta(days=1)
+    db.commit()
+    return cuenta
+
+
+def _cortes(db, cuenta) -> dict:
+    db.expire_all()
+    return {
+        historial._a_fecha(c.fecha): c.saldo_centavos
+        for c in db.query(SaldoDiario).filter(SaldoDiario.lista_cuentas_id == cuenta)
+    }
+
+
+def test_cortes_solo_en_dias_con_movimientos(db, con_cortes):
+    assert _cortes(db, con_cortes) == {
+        date(2024, 1, 10): 99000,
+        date(2024, 1, 20): 104000,
+        date(2024, 2, 5): 102000,
+    }
+
+
+def test_saldo_en_es_corte_mas_delta(cliente, db, con_cortes):
+    def saldo(momento):
+        r = cliente.get(f"/lista_cuentas/{con_cortes}/historial", params={"fecha": momento.isoformat()})
+        return r.json()["saldo"]
+
+    assert saldo(datetime(2024, 1, 5)) == 1000.0
+    assert saldo(datetime(2024, 1, 20, 11)) == 990.0
+    assert saldo(datetime(2024, 3, 1, 12)) == 1015.0
+
+    # La lectura parte del corte: si el corte cambia, el saldo también
+    db.query(SaldoDiario).filter(SaldoDiario.fecha == date(2024, 2, 5)).update({"saldo_centavos": 50000})
+    db.commit()
+    assert saldo(datetime(2024, 3, 1, 12)) == 495.0  # 500.00 del corte - 5.00 del 1 de marzo
+
+
+def test_registro_en_el_pasado_desplaza_los_cortes_posteriores(cliente, db, con_cortes):
+    id_ = db.query(Registro.id).filter(Registro.monto_centavos == 5000).scalar()
+
+    assert cliente.delete(f"/registros/{id_}").status_code == 200
+
+    assert _cortes(db, con_cortes) == {
+        date(2024, 1, 10): 99000,
+        date(2024, 1, 20): 99000,
+        date(2024, 2, 5): 97000,
+    }
+    r = cliente.get(f"/lista_cuentas/{con_cortes}/historial", params={"fecha": "2024-03-01T12:00:00"})
+    assert r.json()["saldo"] == 965.0
+
+
+def test_serie_mensual_un_cierre_por_mes(cliente, con_cortes):
+    r = cliente.get(f"/lista_cuentas/{con_cortes}/historial", params={
+        "desde": "2024-01-01", "hasta": "2024-03-31", "intervalo": "mes",
+    })
+
+    assert r.json()["saldos"] == [
+        {"fecha": "2024-01-31", "saldo": 1040.0},
+        {"fecha": "2024-02-29", "saldo": 1020.0},
+        {"fecha": "2024-03-31", "saldo": 1015.0},
+    ]
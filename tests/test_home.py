@@ -0,0 +1,16 @@
+# tests/test_home.py
+def test_home_responde_con_todas_las_secciones(cliente, cuenta):
+    r = cliente.get("/home")
+    assert r.status_code == 200
+    datos = r.json()
+    assert set(datos) == {"resumen", "presupuestos_activos", "pagos_proximos", "objetivos", "cuentas"}
+    assert [c["id"] for c in datos["cuentas"]] == [cuenta]
+    assert datos["objetivos"] == []
+    assert datos["resumen"]["total_saldo"] == 1000.0
+
+
+def test_home_incluye_objetivos_del_usuario(cliente):
+    r = cliente.post("/objetivos/", json={"nombre": "Viaje", "monto_meta": 500})
+    assert r.status_code == 201
+    datos = cliente.get("/home").json()
+    assert [o["nombre"] for o in datos["objetivos"]] == ["Viaje"]
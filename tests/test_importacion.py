@@ -0,0 +1,150 @@
+# tests/test_importacion.py
+import os
+import time
+from datetime import datetime, timedelta
+
+from models.database import ListaCuenta, Presupuesto, Registro
+from utils import gastado, importacion, saldos
+
+# La petición pide 100k filas "en segundos"
+FILAS_BENCH = int(os.getenv("IMPORT_FILAS_PRUEBA", "100000"))
+TECHO_SEGUNDOS = float(os.getenv("IMPORT_TECHO_SEGUNDOS", "60"))
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20240305120000[-6:CST]
+<TRNAMT>-45.10
+<FITID>A1
+<NAME>SUPER
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20240306
+<TRNAMT>1500.00
+<FITID>A2
+<NAME>NOMINA
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def _importar(cliente, contenido: str, nombre="estado.csv", **form):
+    r = cliente.post("/registros/import", files={"archivo": (nombre, contenido.encode(), "text/plain")}, data=form)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _saldo(db, cuenta):
+    db.expire_all()
+    return db.get(ListaCuenta, cuenta).cantidad_centavos
+
+
+def test_csv_nombres_formatos_y_errores(cliente, db, catalogo_base, cuenta):
+    csv = (
+        "Fecha;Importe;Cuenta;Subcategoria;Metodo;Concepto\n"
+        "05/03/2024;-1.234,50;débito;Renta;efectivo;renta marzo\n"
+        "2024-03-06T10:30:00;12,50;Débito;2;Efectivo;reembolso\n"
+        "31/02/2024;-1;Débito;Renta;;fecha imposible\n"
+        "2024-03-07;-3;Crédito;Renta;;cuenta ajena\n"
+        "2024-03-08;-3;Débito;Renta;;sin método\n"
+    )
+    resumen = _importar(cliente, csv)
+
+    assert (resumen["leidas"], resumen["insertadas"], resumen["errores"]) == (5, 2, 3)
+    assert [e["linea"] for e in resumen["detalle_errores"]] == [4, 5, 6]
+    filas = {r.monto_centavos: r for r in db.query(Registro).all()}
+    assert set(filas) == {-123450, 1250}
+    assert filas[-123450].fecha_registro == datetime(2024, 3, 5)
+    assert (filas[-123450].subCategorias_id, filas[-123450].categori_metodos_id) == (1, 1)
+    assert filas[1250].subCategorias_id == 2
+    assert _saldo(db, cuenta) == 100000 - 123450 + 1250
+
+
+def test_ofx_con_valores_por_defecto(cliente, db, catalogo_base, cuenta):
+    resumen = _importar(cliente, OFX, nombre="estado.ofx", lista_cuentas_id=str(cuenta),
+                        subCategorias_id="Renta", categori_metodos_id="1")
+
+    assert resumen["insertadas"] == 2
+    filas = sorted((r.fecha_registro, r.monto_centavos) for r in db.query(Registro).all())
+    assert filas == [(datetime(2024, 3, 5, 12), -4510), (datetime(2024, 3, 6), 150000)]
+
+
+def test_reimportar_no_duplica_y_cargos_iguales_se_conservan(cliente, db, catalogo_base, cuenta):
+    csv = (
+        "fecha,monto,cuenta,subcategoria,metodo\n"
+        "2024-03-05,-20,Débito,1,1\n"
+        "2024-03-05,-20,Débito,1,1\n"  # dos cafés iguales el mismo día
+        "2024-03-06,-5,Débito,1,1\n"
+    )
+    primero = _importar(cliente, csv)
+    assert (primero["insertadas"], primero["duplicadas"]) == (3, 0)
+    saldo = _saldo(db, cuenta)
+
+    segundo = _importar(cliente, csv)
+    assert (segundo["insertadas"], segundo["duplicadas"]) == (0, 3)
+    assert db.query(Registro).count() == 3
+    assert _saldo(db, cuenta) == saldo == 100000 - 4500
+
+    # Un estado que se traslapa: solo entra lo nuevo (un tercer cargo igual)
+    tercero = _importar(cliente, csv + "2024-03-05,-20,Débito,1,1\n")
+    assert (tercero["insertadas"], tercero["duplicadas"]) == (1, 3)
+
+
+def test_un_delta_de_saldo_por_cuenta(cliente, db, usuario, catalogo_base, cuenta, sentencias):
+    otra = ListaCuenta(usuarios_id=usuario.id, nombre="Ahorro", cantidad="50.00",
+                       cantidad_centavos=5000, saldo_inicial_centavos=5000)
+    db.add(otra)
+    db.commit()
+    filas = "".join(
+        f"2024-03-{1 + i % 28:02d},{-1 if i % 2 else 2},{'Débito' if i % 3 else 'Ahorro'},1,1\n" for i in range(300)
+    )
+
+    sentencias.clear()
+    _importar(cliente, "fecha,monto,cuenta,subcategoria,metodo\n" + filas)
+
+    # Un UPDATE de saldo por cuenta (no uno por fila)
+    assert len([s for s in sentencias if s.lstrip().upper().startswith("UPDATE LISTA_CUENTAS")]) == 2
+    esperado = {cuenta: 100000, otra.id: 5000}
+    for i in range(300):
+        esperado[otra.id if i % 3 == 0 else cuenta] += -100 if i % 2 else 200
+    assert {c: _saldo(db, c) for c in esperado} == esperado
+    assert saldos.conciliar() == 0
+
+
+def test_gastado_por_deltas_sin_recorrer_el_historial(cliente, db, usuario, catalogo_base, cuenta, sentencias, monkeypatch):
+    cliente.post("/presupuestos/", data={"categorias_id": 1, "monto_limite": 100000})
+    monkeypatch.setattr(importacion, "IMPORT_LOTE", 10)
+    hoy = datetime.utcnow() + timedelta(seconds=1)
+    filas = "".join(f"{hoy.isoformat()},-{i + 1},Débito,{1 + i % 2},1\n" for i in range(40))
+
+    sentencias.clear()
+    _importar(cliente, "fecha,monto,cuenta,subcategoria,metodo\n" + filas)
+
+    # Renta (categoría 1) son los i pares: 1 + 3 + ... + 39 pesos
+    assert db.query(Presupuesto).one().gastado_centavos == sum(range(1, 41, 2)) * 100
+    assert gastado.verificar(db, usuario.id) == 0
+    # 4 lotes: ningún UPDATE de presupuestos con la subconsulta sobre registros
+    updates = [s for s in sentencias if s.lstrip().upper().startswith("UPDATE PRESUPUESTOS")]
+    assert len(updates) == 4
+    assert not any("registros" in s for s in updates)
+
+
+def test_benchmark_importacion(cliente, db, catalogo_base, cuenta):
+    inicio = datetime(2020, 1, 1)
+    filas = "".join(
+        f"{(inicio + timedelta(minutes=i)).isoformat()},{-1.25 if i % 4 else 10},Débito,{1 + i % 2},1,ref{i}\n"
+        for i in range(FILAS_BENCH)
+    )
+
+    t0 = time.perf_counter()
+    resumen = _importar(cliente, "fecha,monto,cuenta,subcategoria,metodo,referencia\n" + filas)
+    segundos = time.perf_counter() - t0
+
+    print(f"[BENCH] importación de {FILAS_BENCH} filas en {segundos:.1f}s "
+          f"({FILAS_BENCH / segundos:.0f} filas/s)")
+    assert resumen["insertadas"] == FILAS_BENCH
+    assert db.query(Registro).count() == FILAS_BENCH
+    assert segundos < TECHO_SEGUNDOS
@@ -0,0 +1,61 @@
+# tests/test_migraciones.py
+from sqlalchemy import text
+
+from models.database import engine, ListaCuenta, Presupuesto
+from utils import migraciones
+
+
+def _esquema_previo():
+    """Deja registros / lista_cuentas / presupuestos como antes de los centavos."""
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_registros_usuario_fecha_monto"))
+        conn.execute(text("ALTER TABLE registros DROP COLUMN monto_centavos"))
+        conn.execute(text("ALTER TABLE lista_cuentas DROP COLUMN cantidad_centavos"))
+        conn.execute(text("ALTER TABLE lista_cuentas DROP COLUMN saldo_inicial_centavos"))
+        conn.execute(text("ALTER TABLE presupuestos DROP COLUMN gastado_centavos"))
+
+
+def test_migrar_llena_centavos_antes_de_derivar_saldos_y_gastado(db, usuario, catalogo_base):
+    _esquema_previo()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO lista_cuentas (id, usuarios_id, nombre, cantidad) VALUES (1, :u, 'Vieja', '70.00')"
+        ), {"u": usuario.id})
+        conn.execute(text(
+            "INSERT INTO registros (usuarios_id, lista_cuentas_id, subCategorias_id, monto, "
+            "fecha_registro, categori_metodos_id) VALUES (:u, 1, 1, '-30.00', '2030-01-01 10:00:00', 1)"
+        ), {"u": usuario.id})
+        conn.execute(text(
+            "INSERT INTO presupuestos (usuarios_id, categorias_id, monto_limite, estado, fecha_creacion, periodo) "
+            "VALUES (:u, 1, 100, 'activo', '2029-12-01 00:00:00', 'unico')"
+        ), {"u": usuario.id})
+
+    migraciones.migrar()
+
+    cuenta = db.get(ListaCuenta, 1)
+    assert cuenta.cantidad_centavos == 7000
+    assert cuenta.saldo_inicial_centavos == 10000  # 70.00 + 30.00 de gasto
+    assert db.query(Presupuesto).one().gastado_centavos == 3000
+
+    # Idempotente: una segunda corrida no cambia nada
+    migraciones.migrar()
+    db.expire_all()
+    assert db.get(ListaCuenta, 1).saldo_inicial_centavos == 10000
+
+
+def test_migrar_deja_el_corte_pendiente_si_hay_diferencias(db, usuario, catalogo_base, capsys):
+    _esquema_previo()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO lista_cuentas (id, usuarios_id, nombre, cantidad) VALUES (1, :u, 'Vieja', '70.00')"
+        ), {"u": usuario.id})
+        conn.execute(text(
+            "INSERT INTO registros (usuarios_id, lista_cuentas_id, subCategorias_id, monto, "
+            "fecha_registro, categori_metodos_id) VALUES (:u, 1, 1, 'n/d', '2030-01-01 10:00:00', 1)"
+        ), {"u": usuario.id})
+
+    migraciones.migrar()
+
+    salida = capsys.readouterr().out
+    assert "registros.monto_centavos: corte pendiente (1 diferencias" in salida
+    assert "lista_cuentas.cantidad_centavos: corte pendiente" not in salida
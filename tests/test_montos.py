@@ -0,0 +1,28 @@
+# tests/test_montos.py
+"""Montos en centavos: texto normalizado al escribir y lecturas sin CAST."""
+from models.database import ListaCuenta, Registro
+from utils import montos
+
+
+def test_a_centavos_redondea_medio_hacia_arriba():
+    assert montos.a_centavos("123.455") == 12346
+    assert montos.a_centavos("-12.5") == -1250
+    assert montos.a_texto(-1250) == "-12.50"
+
+
+def test_altas_guardan_el_texto_desde_los_centavos(cliente, db, catalogo_base):
+    cuenta = cliente.post("/lista_cuentas/", data={"nombre": "Débito", "cantidad": " 1e2 "}).json()
+    assert cuenta["cantidad"] == "100.00"
+
+    cliente.post("/registros/", data={
+        "lista_cuentas_id": cuenta["id"], "subCategorias_id": 1, "monto": "-12.5", "categori_metodos_id": "1",
+    })
+    registro = db.query(Registro).one()
+    assert (registro.monto, registro.monto_centavos) == ("-12.50", -1250)
+    assert db.get(ListaCuenta, cuenta["id"]).cantidad_centavos == 8750
+
+
+def test_filtro_por_signo_sin_cast(cliente, cuenta, sentencias):
+    cliente.get("/registros/", params={"tipo": "gasto"})
+    sql = sentencias.de_tabla("registros")
+    assert sql and not any("CAST" in s.upper() for s in sql)
@@ -0,0 +1,36 @@
+# tests/test_outbox.py
+import sys
+
+from models.database import Notificacion
+from utils import outbox
+
+
+def test_worker_entrega_lo_encolado(db, monkeypatch):
+    monkeypatch.setenv("OUTBOX_FAKE_LATENCIA", "0")
+    for i in range(3):
+        outbox.encolar(db, "email", f"n{i}@example.com", "hola", asunto="prueba")
+    db.commit()
+
+    proveedores = {"email": outbox.FakeProveedor(0)}
+    assert outbox.procesar(db, proveedores) == 3
+    assert {n.estado for n in db.query(Notificacion).all()} == {"enviada"}
+
+
+def test_generar_siempre_usa_el_proveedor_fake(db, monkeypatch):
+    usados = {}
+
+    def correr(una_vez, forzar_fake, lote):
+        usados.update(una_vez=una_vez, forzar_fake=forzar_fake)
+        return 0
+
+    monkeypatch.setattr(outbox, "correr", correr)
+    monkeypatch.setattr(sys, "argv", ["outbox", "--generar", "2"])
+    outbox.main()
+    assert usados == {"una_vez": True, "forzar_fake": True}
+    assert db.query(Notificacion).count() == 2
+
+
+def test_metricas_incluye_outbox(cliente):
+    r = cliente.get("/metricas")
+    assert r.status_code == 200
+    assert "outbox" in r.json()
@@ -0,0 +1,60 @@
+# tests/test_paginacion.py
+from datetime import datetime, timedelta
+
+from models.database import Registro
+
+
+def _registros(db, usuario, cuenta, fechas) -> list[tuple[datetime, int]]:
+    filas = [
+        Registro(
+            usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+            monto="-1.00", monto_centavos=-100, fecha_registro=fecha,
+        )
+        for fecha in fechas
+    ]
+    db.add_all(filas)
+    db.commit()
+    # Orden de la paginación: (fecha_registro DESC, id DESC)
+    return sorted(((r.fecha_registro, r.id) for r in filas), reverse=True)
+
+
+def _fechas_con_empates(base: datetime) -> list[datetime]:
+    # 5 instantes distintos, cada uno repetido 1..5 veces, intercalados
+    return [base - timedelta(minutes=m) for r in range(5) for m in range(5) if r <= m]
+
+
+def test_cursor_no_repite_ni_salta_con_fechas_iguales(cliente, db, usuario, catalogo_base, cuenta):
+    esperado = [id_ for _, id_ in _registros(db, usuario, cuenta, _fechas_con_empates(datetime(2024, 5, 1, 12)))]
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        params = {"limite": 4, **({"cursor": cursor} if cursor else {})}
+        r = cliente.get("/registros/", params=params)
+        assert r.status_code == 200
+        vistos += [fila["id"] for fila in r.json()]
+        paginas += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert vistos == esperado
+    assert paginas == 4  # 15 registros en páginas de 4
+
+
+def test_siguiente_cursor_de_por_dias_movimientos(cliente, db, usuario, catalogo_base, cuenta):
+    base = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    esperado = [id_ for _, id_ in _registros(db, usuario, cuenta, _fechas_con_empates(base))]
+
+    primera = cliente.get("/graficos/por-dias", params={"dias": 7, "limite": 4}).json()
+    vistos = [m["id"] for m in primera["movimientos_individuales"]]
+    cursor = primera["siguiente_cursor"]
+    while cursor:
+        pagina = cliente.get("/graficos/por-dias/movimientos", params={"dias": 7, "limite": 4, "cursor": cursor}).json()
+        vistos += [m["id"] for m in pagina["movimientos"]]
+        cursor = pagina["siguiente_cursor"]
+
+    assert vistos == esperado
+
+
+def test_cursor_invalido(cliente):
+    assert cliente.get("/registros/", params={"limite": 2, "cursor": "no-es-un-cursor"}).status_code == 422
@@ -0,0 +1,46 @@
+# tests/test_presupuestos.py
+from datetime import datetime
+
+from models.database import Presupuesto
+
+
+def _presupuestos(db, usuario, cantidad):
+    for i in range(cantidad):
+        db.add(Presupuesto(
+            usuarios_id=usuario.id, categorias_id=1 + i % 2, monto_limite=100.0 + i,
+            estado="activo" if i % 3 else "inactivo", fecha_creacion=datetime(2024, 1, 1),
+            periodo="mensual" if i % 2 else "unico",
+            periodo_inicio=datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0) if i % 2 else None,
+            gastado_centavos=1000 * i,
+        ))
+    db.commit()
+
+
+def _sentencias_listado(cliente, sentencias, ruta):
+    sentencias.clear()
+    r = cliente.get(ruta)
+    assert r.status_code == 200
+    return len(sentencias), r.json()
+
+
+def test_listados_con_numero_constante_de_sentencias(cliente, db, usuario, catalogo_base, sentencias):
+    _presupuestos(db, usuario, 1)
+    pocas, _ = _sentencias_listado(cliente, sentencias, "/presupuestos/")
+    pocas_activos, _ = _sentencias_listado(cliente, sentencias, "/presupuestos/activos")
+
+    _presupuestos(db, usuario, 30)
+    muchas, datos = _sentencias_listado(cliente, sentencias, "/presupuestos/")
+    muchas_activos, activos = _sentencias_listado(cliente, sentencias, "/presupuestos/activos")
+
+    assert len(datos) == 31
+    assert all(p["estado"] == "activo" for p in activos)
+    assert muchas == pocas
+    assert muchas_activos == pocas_activos
+
+
+def test_listado_hidrata_nombre_y_metricas(cliente, db, usuario, catalogo_base):
+    _presupuestos(db, usuario, 2)
+    por_id = {p["categorias_id"]: p for p in cliente.get("/presupuestos/").json()}
+    assert por_id[1]["categoria_nombre"] == "Hogar"
+    assert por_id[2]["gastado"] == 10.0
+    assert por_id[2]["restante"] == 91.0
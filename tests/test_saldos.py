@@ -0,0 +1,102 @@
+# tests/test_saldos.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from models.database import SessionLocal, ListaCuenta, Registro, ResumenDiario
+from routers import registros
+from utils import gastado, rollups, saldos
+
+ESCRITORES = 100
+
+
+def _en_paralelo(tareas):
+    """Corre las tareas en ESCRITORES hilos que arrancan a la vez, cada una con su sesión."""
+    salida = threading.Barrier(len(tareas))
+
+    def correr(tarea):
+        db = SessionLocal()
+        try:
+            salida.wait()
+            return tarea(db)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(max_workers=len(tareas)) as pool:
+        return list(pool.map(correr, tareas))
+
+
+def _rollup(db):
+    db.expire_all()
+    return sorted(
+        (f.fecha, f.subCategorias_id, f.categori_metodos_id, f.ingresos, f.gastos,
+         f.cantidad_ingresos, f.cantidad_gastos, f.cantidad_movimientos)
+        for f in db.query(ResumenDiario).all()
+        if f.cantidad_movimientos
+    )
+
+
+def test_saldo_exacto_con_100_escritores_concurrentes(cliente, db, usuario, catalogo_base, cuenta):
+    cliente.post("/presupuestos/", data={"categorias_id": 1, "monto_limite": 100000})
+
+    def alta(i):
+        monto = f"-{i + 1}.25" if i % 3 else f"{i + 1}.50"
+        return lambda s: registros.crear_registro(
+            lista_cuentas_id=cuenta, subCategorias_id=1 + i % 2, monto=monto,
+            categori_metodos_id="1", current_user=usuario, db=s,
+        ).id
+
+    # Altas concurrentes sobre la misma cuenta
+    ids = _en_paralelo([alta(i) for i in range(ESCRITORES)])
+
+    def cambio(i, id_):
+        if i % 2:
+            return lambda s: registros.actualizar_registro(
+                registro_id=id_, lista_cuentas_id=None, subCategorias_id=2 - i % 3 % 2, monto="-7.77",
+                categori_metodos_id=None, current_user=usuario, db=s,
+            )
+        return lambda s: registros.eliminar_registro(registro_id=id_, current_user=usuario, db=s)
+
+    # Ediciones y bajas concurrentes, mezcladas con nuevas altas
+    _en_paralelo([cambio(i, id_) for i, id_ in enumerate(ids[:50])] + [alta(i) for i in range(50)])
+
+    db.expire_all()
+    suma = sum(r.monto_centavos for r in db.query(Registro).all())
+    assert db.query(Registro).count() == ESCRITORES - 25 + 50
+    assert db.get(ListaCuenta, cuenta).cantidad_centavos == 100000 + suma
+    assert saldos.conciliar() == 0
+    assert gastado.verificar(db, usuario.id) == 0
+
+    # Rollup mantenido escritura a escritura == rollup recalculado desde cero
+    incremental = _rollup(db)
+    rollups.reconstruir(db, usuario.id)
+    db.commit()
+    assert incremental == _rollup(db)
+
+
+def test_fijar_mueve_el_saldo_inicial(cliente, db, usuario, catalogo_base, cuenta):
+    cliente.post("/registros/", data={"lista_cuentas_id": cuenta, "subCategorias_id": 1, "monto": "-200", "categori_metodos_id": "1"})
+
+    assert cliente.put(f"/lista_cuentas/{cuenta}", data={"cantidad": "1500"}).status_code == 200
+
+    db.expire_all()
+    fila = db.get(ListaCuenta, cuenta)
+    assert (fila.cantidad_centavos, fila.cantidad) == (150000, "1500.00")
+    assert fila.saldo_inicial_centavos == 170000
+    assert saldos.conciliar() == 0
+
+
+def test_inicializar_absorbe_el_desfase_y_lo_avisa(db, usuario, catalogo_base, cuenta, capsys):
+    db.add(Registro(
+        usuarios_id=usuario.id, lista_cuentas_id=cuenta, subCategorias_id=1, categori_metodos_id=1,
+        monto="-5.00", monto_centavos=-500,
+    ))
+    fila = db.get(ListaCuenta, cuenta)
+    fila.saldo_inicial_centavos = None  # saldo de 1000.00 que no descontó el registro
+    db.commit()
+
+    assert saldos.inicializar() == 1
+
+    db.expire_all()
+    assert db.get(ListaCuenta, cuenta).saldo_inicial_centavos == 100500
+    assert saldos.conciliar() == 0
+    assert "conciliar no los reporta" in capsys.readouterr().out
@@ -0,0 +1,87 @@
+# tests/test_sms.py
+import asyncio
+
+import httpx
+import pytest
+
+from utils import outbox, sms, sms_stub
+
+
+class _EnVuelo:
+    """Envuelve la app stub y cuenta los requests simultáneos."""
+
+    def __init__(self, app):
+        self.app = app
+        self.actuales = 0
+        self.maximo = 0
+        self.total = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.actuales += 1
+        self.total += 1
+        self.maximo = max(self.maximo, self.actuales)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.actuales -= 1
+
+
+@pytest.fixture
+def stub(monkeypatch, loop):
+    """enviar_sms real (TwilioHTTP) contra utils.sms_stub, sin red."""
+    app = _EnVuelo(sms_stub.app)
+    clientes = []
+    original = httpx.AsyncClient
+
+    class ClienteStub(original):
+        def __init__(self, **kwargs):
+            super().__init__(transport=httpx.ASGITransport(app=app), **kwargs)
+            clientes.append(self)
+
+    monkeypatch.setattr(httpx, "AsyncClient", ClienteStub)
+    monkeypatch.setattr(sms, "TWILIO_ACCOUNT_SID", "AC_stub")
+    monkeypatch.setattr(sms, "_proveedor", None)
+    monkeypatch.setitem(sms_stub._LATENCIA, "segundos", 0.02)
+    app.clientes = clientes
+    yield app
+    loop.run_until_complete(sms.cerrar())
+
+
+def _enviar(loop, n: int) -> list:
+    async def todos():
+        return await asyncio.gather(*(sms.enviar_sms(f"+52155{i:08d}", f"hola {i}") for i in range(n)))
+    return loop.run_until_complete(todos())
+
+
+def test_un_solo_cliente_entre_envios(stub, loop):
+    assert _enviar(loop, 5) == [True] * 5
+    assert _enviar(loop, 5) == [True] * 5
+
+    assert stub.total == 10
+    assert len(stub.clientes) == 1
+    assert sms._obtener_proveedor()._cliente is stub.clientes[0]
+
+
+def test_la_concurrencia_se_acota(stub, loop, monkeypatch):
+    monkeypatch.setattr(sms, "SMS_MAX_CONCURRENCIA", 3)
+
+    assert _enviar(loop, 30) == [True] * 30
+    assert stub.total == 30
+    assert stub.maximo == 3
+
+
+def test_sin_limite_los_envios_se_traslapan(stub, loop, monkeypatch):
+    # Control del anterior: el stub sí recibe requests en paralelo
+    monkeypatch.setattr(sms, "SMS_MAX_CONCURRENCIA", 30)
+
+    assert _enviar(loop, 30) == [True] * 30
+    assert stub.maximo > 3
+
+
+def test_los_proveedores_son_abstractos():
+    with pytest.raises(TypeError):
+        sms.ProveedorSMS()
+    with pytest.raises(TypeError):
+        outbox.Proveedor(1)
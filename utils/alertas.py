@@ -0,0 +1,130 @@
+# utils/alertas.py
+"""
+Alertas de presupuesto (>= 90% y >= 100%) evaluadas en la ruta de escritura.
+
+Se evalúan cuando cambia el gastado o el límite (registros de gasto, alta y
+edición de presupuestos), nunca en los GET. La deduplicación vive en la
+tabla presupuesto_alertas con llave única (presupuesto, nivel, periodo):
+el INSERT que gana es el único que emite la alerta, así que cada alerta
+sale exactamente una vez por periodo sin importar cuántos workers haya.
+
+evaluar() se llama antes del commit de la escritura: el INSERT de la alerta
+y el correo en el outbox (utils/outbox.py) se confirman junto con ella.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql, sqlite
+
+from models.database import Presupuesto, PresupuestoAlerta, Categoria, Subcategoria
+from utils import gastado, montos, outbox
+from utils.correo import get_user_email
+
+# Enviar 1 correo al llegar a 90% y otro al llegar/exceder 100%
+NEAR_THRESHOLD_PCT = 90.0
+EXCEEDED_THRESHOLD_PCT = 100.0
+
+_SIN_FECHA = datetime(1970, 1, 1)
+
+
+def _registrar(db: Session, p: Presupuesto, nivel: str) -> bool:
+    """
+    INSERT IGNORE (u ON CONFLICT DO NOTHING en sqlite) de la alerta.
+    True si esta transacción la insertó, es decir, si le toca enviarla.
+    """
+    valores = {
+        "presupuestos_id": p.id,
+        "usuarios_id": p.usuarios_id,
+        "nivel": nivel,
+        "periodo_inicio": p.periodo_inicio or p.fecha_creacion or _SIN_FECHA,
+    }
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "mysql":
+        stmt = mysql.insert(PresupuestoAlerta).values(**valores).prefix_with("IGNORE")
+    elif dialecto == "sqlite":
+        stmt = sqlite.insert(PresupuestoAlerta).values(**valores).on_conflict_do_nothing()
+    else:
+        raise RuntimeError(f"Dialecto no soportado para alertas: {dialecto}")
+    return db.execute(stmt).rowcount == 1
+
+
+def _mensaje(nivel: str, categoria_nombre: str, limite: float, gasto: float, pct: float) -> tuple[str, str]:
+    if nivel == "exceeded":
+        subject = f"Presupuesto EXCEDIDO: {categoria_nombre}"
+        body = (
+            f"Has excedido tu presupuesto activo para '{categoria_nombre}'.\n\n"
+            f"Límite: MXN {limite:,.2f}\n"
+            f"Gastado: MXN {gasto:,.2f}\n"
+            f"Uso: {pct:.1f}%\n\n"
+            f"Revisa tus gastos y ajusta tu consumo."
+        )
+    else:
+        subject = f"Tu presupuesto está por alcanzarse: {categoria_nombre}"
+        body = (
+            f"Tu presupuesto activo para '{categoria_nombre}' está por alcanzarse.\n\n"
+            f"Límite: MXN {limite:,.2f}\n"
+            f"Gastado: MXN {gasto:,.2f}\n"
+            f"Uso: {pct:.1f}%\n\n"
+            f"Considera moderar tus gastos para evitar exceder el límite."
+        )
+    return subject, body
+
+
+def evaluar(
+    db: Session,
+    user,
+    subCategorias_id: Optional[int] = None,
+    presupuesto_id: Optional[int] = None,
+) -> int:
+    """
+    Evalúa los presupuestos activos del usuario afectados por la escritura
+    (los de la categoría de 'subCategorias_id', o uno en particular) y encola
+    los correos. No hace commit. Devuelve cuántas alertas se emitieron.
+    """
+    # Un periodo vencido sin cerrar tendría el acumulado del periodo anterior
+    gastado.cerrar_periodos(db, user.id)
+
+    consulta = (
+        db.query(Presupuesto, Categoria.descripcion)
+        .outerjoin(Categoria, Categoria.id == Presupuesto.categorias_id)
+        .filter(Presupuesto.usuarios_id == user.id, Presupuesto.estado == "activo")
+        # gastado.recalcular / aplicar_registro son UPDATE sin sincronizar la
+        # sesión: sin esto se leería el gastado_centavos que ya estaba cargado
+        .populate_existing()
+    )
+    if subCategorias_id is not None:
+        categoria = (
+            select(Subcategoria.categorias_id)
+            .where(Subcategoria.id == subCategorias_id)
+            .scalar_subquery()
+        )
+        consulta = consulta.filter(Presupuesto.categorias_id == categoria)
+    if presupuesto_id is not None:
+        consulta = consulta.filter(Presupuesto.id == presupuesto_id)
+
+    to = get_user_email(user)
+    emitidas = 0
+    for p, categoria_nombre in consulta.all():
+        limite = float(p.monto_limite or 0)
+        if limite <= 0:
+            continue
+        gasto = montos.a_float(p.gastado_centavos)
+        pct = gasto / limite * 100
+
+        # Al exceder también se marca 'near': no tiene caso avisarlo después
+        if pct >= EXCEEDED_THRESHOLD_PCT:
+            nivel = "exceeded" if _registrar(db, p, "exceeded") else None
+            _registrar(db, p, "near")
+        elif pct >= NEAR_THRESHOLD_PCT:
+            nivel = "near" if _registrar(db, p, "near") else None
+        else:
+            nivel = None
+
+        if nivel and to:
+            nombre = categoria_nombre or f"Categoría {p.categorias_id}"
+            subject, body = _mensaje(nivel, nombre, limite, gasto, pct)
+            outbox.encolar(db, "email", to, body, asunto=subject, usuarios_id=user.id)
+            emitidas += 1
+    return emitidas
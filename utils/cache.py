@@ -0,0 +1,267 @@
+# utils/cache.py
+"""
+Cache de resultados por usuario con invalidación por versión.
+
+Cada usuario tiene un contador de versión por recurso. Las llaves del cache
+incluyen esa versión, así que cualquier escritura que la incremente deja
+inaccesibles (y luego expiran por TTL/LRU) todas las entradas anteriores:
+nunca se sirve un resultado viejo.
+
+Backends (variable CACHE_BACKEND):
+  - "memoria" (default): LRU con TTL dentro del proceso. Con un solo worker
+    de uvicorn es exacto; con varios workers cada uno tiene sus propias
+    versiones, así que en ese caso usar "redis".
+  - "redis": compartido entre workers (requiere REDIS_URL y el paquete redis).
+
+Los endpoints async usan la interfaz a* del backend (aget, aset,
+aversiones): con redis va por redis.asyncio y no bloquea el event loop; en
+memoria no hay E/S y responde directo.
+
+Las llaves de cache_por_usuario llevan también la versión del catálogo
+(VERSION_CATALOGO, la incrementa utils.catalogo.invalidar): los payloads
+de /graficos incluyen nombres de categorías, subcategorías y métodos.
+"""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional
+
+from utils import metricas
+
+CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "300"))
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "10000"))
+
+# Parámetros del endpoint que no forman parte de la llave
+_PARAMS_IGNORADOS = {"db", "current_user", "response", "request", "background_tasks"}
+
+# Versión global del catálogo (utils/catalogo.py)
+VERSION_CATALOGO = "ver:catalogo"
+
+
+class MemoriaBackend:
+    """LRU con TTL en proceso (también sirve de sustituto local de redis)."""
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._datos: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._versiones: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Los contadores viven en el proceso: al reiniciar vuelven a 0, así
+        # que los ETag llevan la época para no confundir versiones viejas
+        self.epoca = uuid.uuid4().hex[:8]
+
+    def get(self, llave: str) -> Optional[Any]:
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[llave]
+                return None
+            self._datos.move_to_end(llave)
+            return valor
+
+    def set(self, llave: str, valor: Any, ttl: int) -> None:
+        with self._lock:
+            self._datos[llave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def version(self, llave: str) -> int:
+        with self._lock:
+            return self._versiones.get(llave, 0)
+
+    def incr(self, llave: str) -> int:
+        with self._lock:
+            valor = self._versiones.get(llave, 0) + 1
+            self._versiones[llave] = valor
+            return valor
+
+    def versiones(self, llaves: list[str]) -> list[int]:
+        with self._lock:
+            return [self._versiones.get(llave, 0) for llave in llaves]
+
+    def tamano(self) -> int:
+        return len(self._datos)
+
+    # En memoria no hay E/S: la interfaz async responde directo
+    async def aget(self, llave: str) -> Optional[Any]:
+        return self.get(llave)
+
+    async def aset(self, llave: str, valor: Any, ttl: int) -> None:
+        self.set(llave, valor, ttl)
+
+    async def aversiones(self, llaves: list[str]) -> list[int]:
+        return self.versiones(llaves)
+
+
+class RedisBackend:
+    """Backend compartido entre workers. Los valores se guardan como JSON."""
+
+    def __init__(self, url: str):
+        import redis  # dependencia opcional
+        import redis.asyncio
+        self._cliente = redis.Redis.from_url(url)
+        # Cliente para los endpoints async (no bloquea el event loop)
+        self._cliente_async = redis.asyncio.Redis.from_url(url)
+        # Época compartida: cambia solo si redis pierde sus llaves (flush)
+        self._cliente.set("ver:epoca", uuid.uuid4().hex[:8], nx=True)
+        self.epoca = self._cliente.get("ver:epoca").decode()
+
+    def get(self, llave: str) -> Optional[Any]:
+        crudo = self._cliente.get(llave)
+        return json.loads(crudo) if crudo is not None else None
+
+    def set(self, llave: str, valor: Any, ttl: int) -> None:
+        self._cliente.setex(llave, ttl, json.dumps(valor, default=str))
+
+    def version(self, llave: str) -> int:
+        return int(self._cliente.get(llave) or 0)
+
+    def incr(self, llave: str) -> int:
+        return int(self._cliente.incr(llave))
+
+    def versiones(self, llaves: list[str]) -> list[int]:
+        return [int(v or 0) for v in self._cliente.mget(llaves)]
+
+    def tamano(self) -> int:
+        return int(self._cliente.dbsize())
+
+    async def aget(self, llave: str) -> Optional[Any]:
+        crudo = await self._cliente_async.get(llave)
+        return json.loads(crudo) if crudo is not None else None
+
+    async def aset(self, llave: str, valor: Any, ttl: int) -> None:
+        await self._cliente_async.setex(llave, ttl, json.dumps(valor, default=str))
+
+    async def aversiones(self, llaves: list[str]) -> list[int]:
+        return [int(v or 0) for v in await self._cliente_async.mget(llaves)]
+
+
+def _crear_backend():
+    if os.getenv("CACHE_BACKEND", "memoria") == "redis":
+        try:
+            return RedisBackend(os.environ["REDIS_URL"])
+        except Exception as e:
+            print(f"[CACHE] Redis no disponible ({e}); se usa cache en memoria")
+    return MemoriaBackend()
+
+
+backend = _crear_backend()
+
+_stats = {"hits": 0, "misses": 0, "invalidaciones": 0}
+_stats_por_endpoint: dict[str, dict[str, int]] = {}
+
+
+def _contar(endpoint: str, tipo: str) -> None:
+    _stats[tipo] += 1
+    por_endpoint = _stats_por_endpoint.setdefault(endpoint, {"hits": 0, "misses": 0})
+    por_endpoint[tipo] += 1
+
+
+# ===============================
+# Versiones por usuario
+# ===============================
+
+def _llave_version(usuarios_id: int, recurso: str) -> str:
+    return f"ver:{recurso}:{usuarios_id}"
+
+
+def version(usuarios_id: int, recurso: str = "graficos") -> int:
+    return backend.version(_llave_version(usuarios_id, recurso))
+
+
+async def version_async(usuarios_id: int, recurso: str = "graficos") -> int:
+    """version() para endpoints async."""
+    (valor,) = await backend.aversiones([_llave_version(usuarios_id, recurso)])
+    return valor
+
+
+def invalidar(usuarios_id: int, *recursos: str) -> None:
+    """
+    Incrementa la versión del usuario (por defecto, la de /graficos).
+    Llamar después del commit de cualquier escritura que cambie sus datos.
+    """
+    for recurso in recursos or ("graficos",):
+        backend.incr(_llave_version(usuarios_id, recurso))
+        _stats["invalidaciones"] += 1
+
+
+# ===============================
+# Decorador para endpoints
+# ===============================
+
+def _versiones_llave(usuarios_id: int) -> list[str]:
+    return [_llave_version(usuarios_id, "graficos"), VERSION_CATALOGO]
+
+
+def _llave(endpoint: str, usuarios_id: int, kwargs: dict, versiones: list[int]) -> str:
+    params = {k: v for k, v in kwargs.items() if k not in _PARAMS_IGNORADOS}
+    usuario, catalogo = versiones
+    return (
+        f"res:{endpoint}:{usuarios_id}:v{usuario}.c{catalogo}:"
+        f"{json.dumps(params, sort_keys=True, default=str)}"
+    )
+
+
+def cache_por_usuario(endpoint: str, ttl: int = CACHE_TTL_SEGUNDOS):
+    """
+    Cachea el resultado de un endpoint por (usuario, versión del usuario,
+    versión del catálogo, endpoint, params).
+    El endpoint debe recibir 'current_user'. Funciona con def y async def
+    (FastAPI ve la firma original vía functools.wraps).
+    """
+    def decorador(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def envoltura_async(*args, **kwargs):
+                usuarios_id = kwargs["current_user"].id
+                versiones = await backend.aversiones(_versiones_llave(usuarios_id))
+                llave = _llave(endpoint, usuarios_id, kwargs, versiones)
+                valor = await backend.aget(llave)
+                if valor is not None:
+                    _contar(endpoint, "hits")
+                    return valor
+                _contar(endpoint, "misses")
+                valor = await fn(*args, **kwargs)
+                await backend.aset(llave, valor, ttl)
+                return valor
+            return envoltura_async
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            usuarios_id = kwargs["current_user"].id
+            llave = _llave(endpoint, usuarios_id, kwargs, backend.versiones(_versiones_llave(usuarios_id)))
+            valor = backend.get(llave)
+            if valor is not None:
+                _contar(endpoint, "hits")
+                return valor
+            _contar(endpoint, "misses")
+            valor = fn(*args, **kwargs)
+            backend.set(llave, valor, ttl)
+            return valor
+        return envoltura
+
+    return decorador
+
+
+def estadisticas() -> dict:
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        "backend": type(backend).__name__,
+        "entradas": backend.tamano(),
+        "ttl_segundos": CACHE_TTL_SEGUNDOS,
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / total, 4) if total else 0.0,
+        "por_endpoint": _stats_por_endpoint,
+    }
+
+
+metricas.registrar("cache", estadisticas)
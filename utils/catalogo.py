@@ -0,0 +1,178 @@
+# utils/catalogo.py
+"""
+Catálogo de referencia en memoria: categorías, subcategorías y métodos.
+
+Son tablas globales que casi nunca cambian, pero cada registro, deuda y
+presupuesto las consultaba para validar ids, y los listados las volvían a
+leer en cada llamada. Aquí se cargan una vez (al arrancar o en el primer
+uso) y se sirven desde diccionarios:
+
+  - existe_*() / subcategoria(): validación como búsqueda en dict.
+  - categorias() / subcategorias() / metodos(): listados sin tocar la BD.
+  - arbol_json(): árbol categoría -> subcategorías más métodos, ya
+    serializado, con su huella (sha256 del contenido) para el ETag de /catalogo.
+
+Invalidación: los endpoints de escritura de los routers del catálogo llaman
+invalidar() después del commit. La versión vive en utils.cache.backend
+(con CACHE_BACKEND=redis se comparte entre workers); cada proceso recarga
+cuando su copia quedó en una versión vieja. CATALOGO_TTL_SEGUNDOS es la red
+de seguridad para cambios hechos directo en la base de datos.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from models.database import SessionLocal, Categoria, CategoriaMetodo
+from utils import cache, metricas
+
+CATALOGO_TTL_SEGUNDOS = int(os.getenv("CATALOGO_TTL_SEGUNDOS", "300"))
+
+_LLAVE_VERSION = cache.VERSION_CATALOGO
+
+_actual: Optional[dict] = None
+_lock = threading.Lock()
+_stats = {"cargas": 0, "invalidaciones": 0}
+
+
+def _leer(db: Session) -> dict:
+    # Categorías con sus subcategorías en un solo SELECT (JOIN)
+    filas = (
+        db.query(Categoria)
+        .options(joinedload(Categoria.subcategorias))
+        .order_by(Categoria.id)
+        .all()
+    )
+    categorias = {c.id: {"id": c.id, "descripcion": c.descripcion} for c in filas}
+    subcategorias = {}
+    ramas = []
+    for c in filas:
+        hijas = sorted(c.subcategorias, key=lambda s: s.id)
+        for s in hijas:
+            subcategorias[s.id] = {"id": s.id, "categorias_id": s.categorias_id, "descripcion": s.descripcion}
+        ramas.append({
+            "id": c.id,
+            "descripcion": c.descripcion,
+            "subcategorias": [{"id": s.id, "descripcion": s.descripcion} for s in hijas],
+        })
+    metodos = {
+        m.id: {"id": m.id, "nombre": m.nombre}
+        for m in db.query(CategoriaMetodo).order_by(CategoriaMetodo.id)
+    }
+
+    arbol = {"categorias": ramas, "metodos": list(metodos.values())}
+    # El cuerpo de /catalogo se serializa una vez por carga; su hash es la
+    # huella del catálogo: igual en todos los workers y entre reinicios
+    cuerpo = json.dumps(arbol, ensure_ascii=False, separators=(",", ":")).encode()
+    return {
+        "categorias": categorias,
+        "subcategorias": subcategorias,
+        "metodos": metodos,
+        "cuerpo": cuerpo,
+        "huella": hashlib.sha256(cuerpo).hexdigest()[:32],
+    }
+
+
+def cargar(db: Optional[Session] = None) -> None:
+    """Lee el catálogo y reemplaza la copia en memoria de una sola vez."""
+    global _actual
+    # La versión se lee antes que los datos: si alguien invalida durante la
+    # carga, la copia queda marcada como vieja y se vuelve a leer
+    version_actual = cache.backend.version(_LLAVE_VERSION)
+    propia = db is None
+    db = db or SessionLocal()
+    try:
+        datos = _leer(db)
+    finally:
+        if propia:
+            db.close()
+    _actual = {"version": version_actual, "cargado_en": time.monotonic(), **datos}
+    _stats["cargas"] += 1
+    print(f"[CATALOGO] v{version_actual}: {len(datos['categorias'])} categorías, "
+          f"{len(datos['subcategorias'])} subcategorías, {len(datos['metodos'])} métodos")
+
+
+def _vigente(actual: Optional[dict]) -> bool:
+    return (
+        actual is not None
+        and actual["version"] == cache.backend.version(_LLAVE_VERSION)
+        and time.monotonic() - actual["cargado_en"] < CATALOGO_TTL_SEGUNDOS
+    )
+
+
+def _datos() -> dict:
+    actual = _actual
+    if not _vigente(actual):
+        with _lock:
+            # Otro hilo pudo recargarlo mientras se esperaba el lock
+            if not _vigente(_actual):
+                cargar()
+            actual = _actual
+    return actual
+
+
+def invalidar() -> None:
+    """Llamar después del commit de cualquier escritura del catálogo."""
+    cache.backend.incr(_LLAVE_VERSION)
+    _stats["invalidaciones"] += 1
+
+
+def version() -> int:
+    return _datos()["version"]
+
+
+# ===============================
+# Lecturas
+# ===============================
+
+def categorias() -> list[dict]:
+    return list(_datos()["categorias"].values())
+
+
+def subcategorias() -> list[dict]:
+    return list(_datos()["subcategorias"].values())
+
+
+def metodos() -> list[dict]:
+    return list(_datos()["metodos"].values())
+
+
+def arbol_json() -> tuple[str, bytes]:
+    """(huella, árbol ya serializado) de la misma copia: cuerpo y ETag de /catalogo."""
+    datos = _datos()
+    return datos["huella"], datos["cuerpo"]
+
+
+def subcategoria(subcategoria_id: Optional[int]) -> Optional[dict]:
+    return _datos()["subcategorias"].get(subcategoria_id)
+
+
+def existe_categoria(categoria_id: Optional[int]) -> bool:
+    return categoria_id in _datos()["categorias"]
+
+
+def existe_subcategoria(subcategoria_id: Optional[int]) -> bool:
+    return subcategoria_id in _datos()["subcategorias"]
+
+
+def existe_metodo(metodo_id: Optional[int]) -> bool:
+    return metodo_id in _datos()["metodos"]
+
+
+def estadisticas() -> dict:
+    actual = _actual
+    return {
+        "version": actual["version"] if actual else None,
+        "huella": actual["huella"] if actual else None,
+        "categorias": len(actual["categorias"]) if actual else 0,
+        "subcategorias": len(actual["subcategorias"]) if actual else 0,
+        "metodos": len(actual["metodos"]) if actual else 0,
+        **_stats,
+    }
+
+
+metricas.registrar("catalogo", estadisticas)
@@ -0,0 +1,135 @@
+# utils/condicional.py
+"""
+GET condicional (ETag / If-None-Match -> 304).
+
+El cliente repite el ETag que recibió en If-None-Match; si coincide con el
+actual se responde 304 sin cuerpo. La comparación es la débil de RFC 9110
+(ignora el prefijo W/), que es la que aplica a If-None-Match.
+
+Listados por usuario (listado()): el ETag sale del contador de versión del
+usuario para ese recurso (utils.cache.version), que incrementa cada
+escritura del router. Se calcula ANTES de la consulta, así que un 304 no
+toca la base de datos. Si una escritura ocurre durante la consulta, el
+ETag queda viejo y el siguiente poll simplemente recibe 200.
+
+MedidorETag (middleware) cuenta 200 vs 304 por recurso y los bytes que se
+dejaron de enviar; se ve en /metricas bajo "condicional".
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+
+from utils import cache, metricas
+
+# Revalidar siempre, pero permitir al cliente guardar la respuesta
+CACHE_CONTROL = "private, no-cache"
+
+
+def etag(valor) -> str:
+    return f'"{valor}"'
+
+
+def coincide(if_none_match: Optional[str], etag_actual: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    actual = etag_actual.removeprefix("W/")
+    return any(
+        candidato.strip().removeprefix("W/") == actual
+        for candidato in if_none_match.split(",")
+    )
+
+
+def no_modificado(request: Request, etag_actual: str) -> Optional[Response]:
+    """Respuesta 304 si el ETag del cliente sigue vigente; si no, None."""
+    if coincide(request.headers.get("if-none-match"), etag_actual):
+        return Response(status_code=304, headers={"ETag": etag_actual, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+async def etag_usuario(request: Request, usuarios_id: int, recurso: str) -> str:
+    """ETag de un listado: recurso, usuario, versión y los parámetros de la URL."""
+    consulta = hashlib.sha1(request.url.query.encode()).hexdigest()[:8]
+    version = await cache.version_async(usuarios_id, recurso)
+    return etag(f"{recurso}.{usuarios_id}.{cache.backend.epoca}.{version}.{consulta}")
+
+
+async def listado(request: Request, response: Response, usuarios_id: int, recurso: str) -> Optional[Response]:
+    """
+    Para el inicio de un GET de listado (endpoints async): devuelve el 304 si
+    el cliente ya tiene la versión vigente; si no, deja ETag en 'response' y
+    devuelve None.
+    """
+    etag_actual = await etag_usuario(request, usuarios_id, recurso)
+    respuesta = no_modificado(request, etag_actual)
+    if respuesta is None:
+        response.headers["ETag"] = etag_actual
+        response.headers["Cache-Control"] = CACHE_CONTROL
+    return respuesta
+
+
+# ===============================
+# Medición
+# ===============================
+
+_MAX_TAMANOS = 10000
+_tamanos: "OrderedDict[str, int]" = OrderedDict()  # ETag -> bytes del último 200
+_stats: dict[str, dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def _registrar(ruta: str, estado: int, etag_actual: str, largo: int) -> None:
+    recurso = ruta.strip("/").split("/")[0] or "/"
+    with _lock:
+        stats = _stats.setdefault(recurso, {"200": 0, "304": 0, "bytes_enviados": 0, "bytes_evitados": 0})
+        if estado == 304:
+            stats["304"] += 1
+            stats["bytes_evitados"] += _tamanos.get(etag_actual, 0)
+        elif estado == 200:
+            stats["200"] += 1
+            stats["bytes_enviados"] += largo
+            _tamanos[etag_actual] = largo
+            _tamanos.move_to_end(etag_actual)
+            while len(_tamanos) > _MAX_TAMANOS:
+                _tamanos.popitem(last=False)
+
+
+class MedidorETag:
+    """Middleware ASGI: mide las respuestas GET que llevan ETag."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                headers = dict(mensaje.get("headers") or [])
+                etag_actual = headers.get(b"etag")
+                if etag_actual:
+                    largo = int(headers.get(b"content-length", b"0") or 0)
+                    _registrar(scope["path"], mensaje["status"], etag_actual.decode(), largo)
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
+
+
+def estadisticas() -> dict:
+    with _lock:
+        por_recurso = {r: dict(s) for r, s in _stats.items()}
+    for s in por_recurso.values():
+        total = s["200"] + s["304"]
+        # Cada 304 es una consulta de listado que no se ejecutó
+        s["consultas_evitadas"] = s["304"]
+        s["ratio_304"] = round(s["304"] / total, 4) if total else 0.0
+    return por_recurso
+
+
+metricas.registrar("condicional", estadisticas)
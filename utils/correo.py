@@ -0,0 +1,20 @@
+# utils/correo.py
+import os
+from typing import Optional
+
+# ===============================
+# Email helpers
+# (el envío lo hace el worker de utils/outbox.py)
+# ===============================
+
+def _resend_from() -> str:
+    # Usa RESEND_FROM si existe; si no, cae a FROM_EMAIL; si no, usa onboarding@resend.dev
+    return os.getenv("RESEND_FROM") or os.getenv("FROM_EMAIL") or "onboarding@resend.dev"
+
+def get_user_email(user) -> Optional[str]:
+    # Intenta varias convenciones de campo en tu modelo Usuario
+    for attr in ("correo", "email", "mail", "correo_electronico"):
+        val = getattr(user, attr, None)
+        if val:
+            return str(val)
+    return None
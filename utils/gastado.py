@@ -0,0 +1,306 @@
+# utils/gastado.py
+"""
+Contador persistido Presupuesto.gastado_centavos.
+
+Antes cada GET de /presupuestos volvía a sumar todos los gastos del usuario
+desde la creación del presupuesto (costo que crece sin límite con el
+historial). Ahora el acumulado vive en la fila del presupuesto:
+
+- aplicar_registro(): suma/resta un registro a los presupuestos que lo
+  cubren. Se llama dentro de la misma transacción que crea, actualiza o
+  elimina el registro (igual que rollups.aplicar_registro).
+- aplicar_lote(): lo mismo para muchos registros (importación, batch): un
+  delta por presupuesto, sin recorrer el historial.
+- recalcular(): recalcula el acumulado desde registros (alta de columna,
+  cambio de categoría, borrado masivo de registros).
+- verificar(): detecta (y con reparar=True corrige) diferencias.
+- cerrar_periodos(): en presupuestos semanales/mensuales, guarda la foto
+  inmutable de cada periodo vencido en presupuesto_periodos y reinicia el
+  acumulado al periodo actual.
+
+Se mantiene en todos los presupuestos, activos o no, para que reactivar uno
+no requiera recalcularlo. Los periodos se calculan en UTC (igual que
+fecha_registro): semanas de lunes a domingo y meses calendario.
+
+Uso por consola:
+    python -m utils.gastado verificar [--usuario 12] [--reparar]
+    python -m utils.gastado recalcular [--usuario 12]
+    python -m utils.gastado cerrar [--usuario 12]
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update, or_, and_
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, Presupuesto, PresupuestoPeriodo, Registro, Subcategoria
+from utils import catalogo, montos
+
+PERIODOS = ("unico", "semanal", "mensual")
+
+
+def inicio_periodo(periodo: str, fecha: datetime) -> Optional[datetime]:
+    """Inicio del periodo que contiene 'fecha' (None para 'unico')."""
+    dia = datetime(fecha.year, fecha.month, fecha.day)
+    if periodo == "semanal":
+        return dia - timedelta(days=dia.weekday())
+    if periodo == "mensual":
+        return dia.replace(day=1)
+    return None
+
+
+def fin_periodo(periodo: str, inicio: datetime) -> Optional[datetime]:
+    """Fin (exclusivo) del periodo que empieza en 'inicio'."""
+    if periodo == "semanal":
+        return inicio + timedelta(days=7)
+    if periodo == "mensual":
+        return (inicio + timedelta(days=32)).replace(day=1)
+    return None
+
+
+# Inicio de lo que cuenta el acumulado: el periodo abierto, o la creación
+_INICIO = func.coalesce(Presupuesto.periodo_inicio, Presupuesto.fecha_creacion)
+
+
+def _cubre(fecha_registro):
+    """El presupuesto solo cuenta gastos desde el inicio de su periodo abierto."""
+    return or_(_INICIO.is_(None), _INICIO <= fecha_registro)
+
+
+def aplicar_registro(db: Session, registro, signo: int = 1) -> None:
+    """
+    Aplica (signo=1) o revierte (signo=-1) un registro en los presupuestos de
+    su categoría. Solo los gastos (monto < 0) cuentan. UPDATE atómico con
+    incremento relativo: no hay lectura previa ni carreras entre requests.
+    """
+    centavos = montos.centavos_registro(registro)
+    if centavos >= 0:
+        return
+
+    categoria = (
+        select(Subcategoria.categorias_id)
+        .where(Subcategoria.id == registro.subCategorias_id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Presupuesto)
+        .where(
+            Presupuesto.usuarios_id == registro.usuarios_id,
+            Presupuesto.categorias_id == categoria,
+            _cubre(registro.fecha_registro),
+        )
+        .values(gastado_centavos=Presupuesto.gastado_centavos + signo * -centavos)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def aplicar_lote(db: Session, usuarios_id: int, cambios: Iterable[tuple]) -> int:
+    """
+    aplicar_registro() para muchos (registro, signo) de un usuario: los
+    gastos se suman en memoria por presupuesto y se aplica un UPDATE
+    relativo por presupuesto tocado, en orden de id. Solo lee los
+    presupuestos del usuario (la categoría sale del catálogo en memoria).
+    No hace commit. Devuelve cuántos presupuestos tocó.
+    """
+    gastos = [(r, signo) for r, signo in cambios if montos.centavos_registro(r) < 0]
+    if not gastos:
+        return 0
+    presupuestos = db.execute(
+        select(Presupuesto.id, Presupuesto.categorias_id, _INICIO.label("inicio"))
+        .where(Presupuesto.usuarios_id == usuarios_id)
+    ).all()
+    if not presupuestos:
+        return 0
+
+    deltas: dict[int, int] = defaultdict(int)
+    for registro, signo in gastos:
+        subcategoria = catalogo.subcategoria(registro.subCategorias_id)
+        if subcategoria is None:
+            continue
+        for p in presupuestos:
+            if p.categorias_id == subcategoria["categorias_id"] and (p.inicio is None or p.inicio <= registro.fecha_registro):
+                deltas[p.id] += signo * -montos.centavos_registro(registro)
+
+    tocados = [(id_, delta) for id_, delta in sorted(deltas.items()) if delta]
+    for id_, delta in tocados:
+        db.execute(
+            update(Presupuesto)
+            .where(Presupuesto.id == id_)
+            .values(gastado_centavos=Presupuesto.gastado_centavos + delta)
+            .execution_options(synchronize_session=False)
+        )
+    return len(tocados)
+
+
+def _gastado_real():
+    """Subconsulta correlacionada: gastado recalculado desde registros."""
+    return (
+        select(func.coalesce(func.sum(-Registro.monto_centavos), 0))
+        .join(Subcategoria, Registro.subCategorias_id == Subcategoria.id)
+        .where(
+            Subcategoria.categorias_id == Presupuesto.categorias_id,
+            Registro.usuarios_id == Presupuesto.usuarios_id,
+            Registro.monto_centavos < 0,
+            _cubre(Registro.fecha_registro),
+        )
+        .correlate(Presupuesto)
+        .scalar_subquery()
+    )
+
+
+def recalcular(db: Session, usuarios_id: Optional[int] = None, presupuesto_id: Optional[int] = None) -> int:
+    """
+    Recalcula el acumulado con un único UPDATE (de un presupuesto, de un
+    usuario o de todos). No hace commit. Devuelve filas afectadas.
+    """
+    stmt = update(Presupuesto).values(gastado_centavos=_gastado_real())
+    if usuarios_id is not None:
+        stmt = stmt.where(Presupuesto.usuarios_id == usuarios_id)
+    if presupuesto_id is not None:
+        stmt = stmt.where(Presupuesto.id == presupuesto_id)
+    return db.execute(stmt.execution_options(synchronize_session=False)).rowcount
+
+
+def verificar(db: Session, usuarios_id: Optional[int] = None, reparar: bool = False) -> int:
+    """
+    Compara el acumulado guardado contra el recalculado. Devuelve el número
+    de presupuestos con diferencia; con reparar=True los corrige (sin commit).
+    """
+    real = _gastado_real().label("real")
+    consulta = select(Presupuesto.id, Presupuesto.gastado_centavos, real).where(
+        Presupuesto.gastado_centavos != real
+    )
+    if usuarios_id is not None:
+        consulta = consulta.where(Presupuesto.usuarios_id == usuarios_id)
+
+    diferencias = db.execute(consulta).all()
+    for id_, guardado, esperado in diferencias:
+        print(f"[GASTADO] presupuesto#{id_}: guardado={guardado} esperado={esperado}")
+
+    if reparar and diferencias:
+        db.execute(
+            update(Presupuesto),
+            [{"id": id_, "gastado_centavos": esperado} for id_, _, esperado in diferencias],
+        )
+    return len(diferencias)
+
+
+def _gastos_por_dia(db: Session, p: Presupuesto, desde: datetime, hasta: datetime) -> list:
+    dia = func.date(Registro.fecha_registro)
+    return db.execute(
+        select(dia, func.sum(-Registro.monto_centavos))
+        .join(Subcategoria, Registro.subCategorias_id == Subcategoria.id)
+        .where(
+            Registro.usuarios_id == p.usuarios_id,
+            Subcategoria.categorias_id == p.categorias_id,
+            Registro.monto_centavos < 0,
+            Registro.fecha_registro >= desde,
+            Registro.fecha_registro < hasta,
+        )
+        .group_by(dia)
+    ).all()
+
+
+def cerrar_periodos(db: Session, usuarios_id: Optional[int] = None, ahora: Optional[datetime] = None) -> int:
+    """
+    Cierra los periodos vencidos de presupuestos recurrentes: escribe una
+    fila en presupuesto_periodos por cada periodo (aunque no haya gastos) y
+    mueve periodo_inicio al periodo actual. No hace commit. Devuelve el
+    número de periodos cerrados (0 en el caso común: una consulta barata).
+    """
+    ahora = ahora or datetime.utcnow()
+    vencidos = or_(*[
+        and_(Presupuesto.periodo == periodo, Presupuesto.periodo_inicio < inicio_periodo(periodo, ahora))
+        for periodo in PERIODOS if periodo != "unico"
+    ])
+    consulta = db.query(Presupuesto.id).filter(vencidos)
+    if usuarios_id is not None:
+        consulta = consulta.filter(Presupuesto.usuarios_id == usuarios_id)
+
+    # Lectura sin locks: en el caso común no hay nada vencido y no se bloquea
+    # nada. Un FOR UPDATE aquí bloquearía todas las filas recorridas por el
+    # índice de usuario (en InnoDB), es decir, todos sus presupuestos.
+    ids = [id_ for (id_,) in consulta.all()]
+    if not ids:
+        return 0
+
+    cerrados = 0
+    # FOR UPDATE por llave primaria, solo de los vencidos: dos requests
+    # simultáneos no escriben la misma foto dos veces
+    bloqueados = (
+        db.query(Presupuesto)
+        .filter(Presupuesto.id.in_(ids))
+        .order_by(Presupuesto.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    for p in bloqueados:
+        actual = inicio_periodo(p.periodo, ahora)
+        if actual is None or p.periodo_inicio is None or p.periodo_inicio >= actual:
+            continue  # otro request lo cerró (o lo cambió) mientras esperábamos el lock
+
+        # Una sola consulta por presupuesto; se reparte por periodo en Python
+        por_periodo: dict[datetime, int] = {}
+        for dia, centavos in _gastos_por_dia(db, p, p.periodo_inicio, actual):
+            dia = dia if isinstance(dia, date) else date.fromisoformat(str(dia))
+            llave = inicio_periodo(p.periodo, datetime(dia.year, dia.month, dia.day))
+            por_periodo[llave] = por_periodo.get(llave, 0) + int(centavos or 0)
+
+        limite = float(p.monto_limite or 0)
+        inicio = p.periodo_inicio
+        while inicio < actual:
+            fin = fin_periodo(p.periodo, inicio)
+            gastado = por_periodo.get(inicio, 0)
+            # centavos / límite en pesos == porcentaje
+            pct = Decimal(gastado) / Decimal(str(limite)) if limite > 0 else Decimal(0)
+            db.add(PresupuestoPeriodo(
+                presupuestos_id=p.id,
+                usuarios_id=p.usuarios_id,
+                inicio=inicio,
+                fin=fin,
+                monto_limite=limite,
+                gastado_centavos=gastado,
+                porcentaje_usado=round(pct, 2),
+            ))
+            cerrados += 1
+            inicio = fin
+
+        p.periodo_inicio = actual
+        db.flush()
+        recalcular(db, presupuesto_id=p.id)
+
+    return cerrados
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Acumulado de gastos por presupuesto")
+    parser.add_argument("accion", choices=["verificar", "recalcular", "cerrar"])
+    parser.add_argument("--usuario", type=int, default=None, help="ID de usuario (por defecto, todos)")
+    parser.add_argument("--reparar", action="store_true", help="Corrige diferencias (verificar)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.accion == "recalcular":
+            filas = recalcular(db, args.usuario)
+            print(f"[GASTADO] {filas} presupuestos recalculados")
+        elif args.accion == "cerrar":
+            cerrados = cerrar_periodos(db, args.usuario)
+            print(f"[GASTADO] {cerrados} periodos cerrados")
+        else:
+            diferencias = verificar(db, args.usuario, args.reparar)
+            print(f"[GASTADO] {diferencias} presupuestos con diferencias")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
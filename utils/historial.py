@@ -0,0 +1,212 @@
+# utils/historial.py
+"""
+Historial de saldos por cuenta con cortes diarios (tabla saldos_diarios).
+
+Un corte guarda el saldo de la cuenta al cierre de un día (UTC) en que
+hubo movimientos. El saldo en un momento X es el último corte anterior a X
+más los registros entre ese corte y X: el delta queda acotado a lo que pasó
+desde el último día procesado, no a todo el historial.
+
+- cortes(): job diario (idempotente) que escribe los cortes de un día a
+  partir del corte previo de cada cuenta más los registros del día.
+- desplazar(): lo llama utils/saldos al ajustar un saldo por un registro con
+  fecha pasada (editar/eliminar): mueve los cortes desde esa fecha.
+- saldo_en() / serie(): lecturas para /lista_cuentas/{id}/historial.
+
+Uso por consola:
+    python -m utils.historial                     # desde el último corte hasta ayer
+    python -m utils.historial --desde 2024-01-01 --hasta 2024-12-31
+"""
+import argparse
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, delete, insert, func, and_, or_, literal, Date
+from sqlalchemy.orm import Session, aliased
+
+from models.database import SessionLocal, engine, ListaCuenta, Registro, SaldoDiario
+
+
+def _inicio_dia(dia: date) -> datetime:
+    return datetime.combine(dia, time.min)
+
+
+def _a_fecha(valor) -> date:
+    # func.date() devuelve date en MySQL y texto en sqlite
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+
+
+# ===============================
+# Escritura
+# ===============================
+
+def desplazar(db: Session, cuenta_id: int, desde: Optional[date], delta_centavos: int) -> None:
+    """
+    Suma el delta a los cortes de la cuenta con fecha >= 'desde' (todos si
+    'desde' es None). En la ruta normal (registro de hoy) no toca filas.
+    """
+    if not delta_centavos:
+        return
+    stmt = update(SaldoDiario).where(SaldoDiario.lista_cuentas_id == cuenta_id)
+    if desde is not None:
+        stmt = stmt.where(SaldoDiario.fecha >= desde)
+    db.execute(
+        stmt.values(saldo_centavos=SaldoDiario.saldo_centavos + delta_centavos)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _corte_previo(dia: date):
+    """Último corte anterior a 'dia' de cada cuenta (subconsulta)."""
+    ultimo = (
+        select(SaldoDiario.lista_cuentas_id, func.max(SaldoDiario.fecha).label("fecha"))
+        .where(SaldoDiario.fecha < dia)
+        .group_by(SaldoDiario.lista_cuentas_id)
+        .subquery()
+    )
+    previo = aliased(SaldoDiario)
+    return (
+        select(previo.lista_cuentas_id, previo.fecha, previo.saldo_centavos)
+        .join(ultimo, and_(previo.lista_cuentas_id == ultimo.c.lista_cuentas_id, previo.fecha == ultimo.c.fecha))
+        .subquery()
+    )
+
+
+def cortes(db: Session, dia: date) -> int:
+    """
+    Escribe los cortes del día para las cuentas con movimientos ese día:
+    corte previo (o saldo inicial) + registros posteriores a él hasta el
+    cierre del día. Reemplaza los cortes del día si ya existían. No hace commit.
+    """
+    fin = _inicio_dia(dia + timedelta(days=1))
+    activas = (
+        select(Registro.lista_cuentas_id)
+        .where(Registro.fecha_registro >= _inicio_dia(dia), Registro.fecha_registro < fin)
+        .distinct()
+        .subquery()
+    )
+    previo = _corte_previo(dia)
+    saldo = (
+        func.coalesce(previo.c.saldo_centavos, ListaCuenta.saldo_inicial_centavos)
+        + func.coalesce(func.sum(Registro.monto_centavos), 0)
+    )
+    origen = (
+        select(ListaCuenta.id, literal(dia, Date), saldo)
+        .join(activas, activas.c.lista_cuentas_id == ListaCuenta.id)
+        .outerjoin(previo, previo.c.lista_cuentas_id == ListaCuenta.id)
+        .outerjoin(Registro, and_(
+            Registro.lista_cuentas_id == ListaCuenta.id,
+            Registro.fecha_registro < fin,
+            # Solo lo posterior al corte previo (todo, si la cuenta no tiene)
+            or_(previo.c.fecha.is_(None), func.date(Registro.fecha_registro) > previo.c.fecha),
+        ))
+        .where(ListaCuenta.saldo_inicial_centavos.is_not(None))
+        .group_by(ListaCuenta.id, previo.c.saldo_centavos, ListaCuenta.saldo_inicial_centavos)
+    )
+
+    db.execute(delete(SaldoDiario).where(SaldoDiario.fecha == dia))
+    resultado = db.execute(
+        insert(SaldoDiario).from_select(["lista_cuentas_id", "fecha", "saldo_centavos"], origen)
+    )
+    return resultado.rowcount
+
+
+# ===============================
+# Lectura
+# ===============================
+
+def _base(db: Session, cuenta: ListaCuenta, antes_de: date) -> tuple[Optional[date], int]:
+    """Último corte anterior a 'antes_de' -> (fecha, saldo); sin corte, el saldo inicial."""
+    corte = db.execute(
+        select(SaldoDiario.fecha, SaldoDiario.saldo_centavos)
+        .where(SaldoDiario.lista_cuentas_id == cuenta.id, SaldoDiario.fecha < antes_de)
+        .order_by(SaldoDiario.fecha.desc())
+        .limit(1)
+    ).first()
+    if corte:
+        return corte.fecha, corte.saldo_centavos
+    return None, cuenta.saldo_inicial_centavos or 0
+
+
+def saldo_en(db: Session, cuenta: ListaCuenta, momento: datetime) -> int:
+    """Saldo (centavos) de la cuenta en 'momento': corte + delta acotado."""
+    fecha_corte, saldo = _base(db, cuenta, momento.date())
+    condiciones = [Registro.lista_cuentas_id == cuenta.id, Registro.fecha_registro <= momento]
+    if fecha_corte is not None:
+        condiciones.append(Registro.fecha_registro >= _inicio_dia(fecha_corte + timedelta(days=1)))
+    delta = db.execute(
+        select(func.coalesce(func.sum(Registro.monto_centavos), 0)).where(*condiciones)
+    ).scalar()
+    return saldo + int(delta)
+
+
+def serie(db: Session, cuenta: ListaCuenta, desde: date, hasta: date, intervalo: str = "dia") -> list[tuple[date, int]]:
+    """
+    Saldo al cierre de cada día (o de cada mes) entre 'desde' y 'hasta'.
+    Parte del corte anterior a 'desde' y suma registros por día: el costo
+    depende del rango pedido, no de la antigüedad de la cuenta.
+    """
+    fecha_corte, saldo = _base(db, cuenta, desde)
+    inicio = _inicio_dia(fecha_corte + timedelta(days=1)) if fecha_corte else None
+
+    dia = func.date(Registro.fecha_registro)
+    consulta = (
+        select(dia, func.sum(Registro.monto_centavos))
+        .where(Registro.lista_cuentas_id == cuenta.id, Registro.fecha_registro < _inicio_dia(hasta + timedelta(days=1)))
+        .group_by(dia)
+    )
+    if inicio is not None:
+        consulta = consulta.where(Registro.fecha_registro >= inicio)
+    por_dia = {_a_fecha(d): int(c or 0) for d, c in db.execute(consulta).all()}
+
+    # Lo anterior a 'desde' se acumula en el saldo de partida
+    saldo += sum(c for d, c in por_dia.items() if d < desde)
+
+    puntos = []
+    actual = desde
+    while actual <= hasta:
+        saldo += por_dia.get(actual, 0)
+        siguiente = actual + timedelta(days=1)
+        if intervalo == "dia" or siguiente.day == 1 or actual == hasta:
+            puntos.append((actual, saldo))
+        actual = siguiente
+    return puntos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cortes diarios de saldo por cuenta")
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Por defecto, el día siguiente al último corte")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Por defecto, ayer (UTC)")
+    args = parser.parse_args()
+
+    SaldoDiario.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        hasta = args.hasta or (datetime.utcnow().date() - timedelta(days=1))
+        desde = args.desde
+        if desde is None:
+            ultimo = db.execute(select(func.max(SaldoDiario.fecha))).scalar()
+            primero = db.execute(select(func.min(Registro.fecha_registro))).scalar()
+            if ultimo:
+                desde = _a_fecha(ultimo) + timedelta(days=1)
+            elif primero:
+                desde = primero.date()
+            else:
+                desde = hasta + timedelta(days=1)
+
+        # En orden: cada día parte de los cortes del anterior
+        dia = desde
+        while dia <= hasta:
+            filas = cortes(db, dia)
+            db.commit()
+            print(f"[HISTORIAL] {dia}: {filas} cortes")
+            dia += timedelta(days=1)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
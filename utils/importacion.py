@@ -0,0 +1,314 @@
+# utils/importacion.py
+"""
+Importación de estados de cuenta (CSV u OFX) a registros.
+
+El archivo se lee en streaming, fila por fila; las filas válidas se juntan
+en lotes de IMPORT_LOTE y cada lote es una transacción:
+
+  1. lock de la fila del usuario (dos importaciones del mismo usuario se
+     serializan y la deduplicación es exacta),
+  2. SELECT de los hashes del lote que ya existen,
+  3. INSERT executemany de las filas nuevas,
+  4. efectos agregados con utils.movimientos (un delta de saldo por cuenta,
+     rollups en un executemany, un delta por presupuesto),
+  5. commit.
+
+Cuentas, subcategorías y métodos se resuelven con diccionarios (por id o por
+nombre): las cuentas se leen una vez por importación y el resto sale del
+catálogo en memoria (utils/catalogo.py), no hay una consulta por fila.
+
+Deduplicación: cada fila lleva hash_contenido = sha256(cuenta, fecha, monto,
+referencia, n), donde n numera las filas idénticas dentro del mismo archivo.
+Reimportar el mismo estado (o uno que se traslapa) no duplica nada, y dos
+cargos iguales el mismo día siguen contando como dos. El índice único
+(usuarios_id, hash_contenido) es la garantía final.
+
+Formato CSV: encabezado con (sin importar mayúsculas):
+    fecha, monto               obligatorias (monto con signo: gasto < 0)
+    cuenta                     id o nombre (o lista_cuentas_id por defecto)
+    subcategoria               id o descripción (o el valor por defecto)
+    metodo                     id o nombre (o el valor por defecto)
+    descripcion / referencia   opcional, solo para la deduplicación
+Separador ',' o ';' (se detecta en el encabezado). Fechas ISO o dd/mm/aaaa.
+
+Formato OFX/QFX: se leen los <STMTTRN> (DTPOSTED, TRNAMT, FITID, NAME,
+MEMO); la cuenta y la subcategoría salen de los valores por defecto.
+"""
+import csv
+import hashlib
+import itertools
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import InvalidOperation
+from types import SimpleNamespace
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from models.database import Registro, ListaCuenta, Usuario
+from utils import alertas, catalogo, montos, movimientos
+
+IMPORT_LOTE = int(os.getenv("IMPORT_LOTE", "1000"))
+IMPORT_MAX_FILAS = int(os.getenv("IMPORT_MAX_FILAS", "200000"))
+MAX_DETALLE_ERRORES = 50
+
+# Encabezado normalizado -> campo
+_COLUMNAS = {
+    "fecha": "fecha", "date": "fecha", "fecha_registro": "fecha",
+    "monto": "monto", "importe": "monto", "amount": "monto",
+    "cuenta": "cuenta", "lista_cuentas_id": "cuenta",
+    "subcategoria": "subcategoria", "subcategorias_id": "subcategoria",
+    "metodo": "metodo", "categori_metodos_id": "metodo",
+    "descripcion": "referencia", "concepto": "referencia", "referencia": "referencia",
+}
+
+_FORMATOS_FECHA = ("%d/%m/%Y", "%d/%m/%Y %H:%M", "%d-%m-%Y", "%Y/%m/%d")
+
+
+# ===============================
+# Lectura de archivos
+# ===============================
+
+def leer_csv(lineas: Iterable[str]) -> Iterator[dict]:
+    """Filas del CSV como dicts {linea, fecha, monto, cuenta, ...}."""
+    lineas = iter(lineas)
+    encabezado = next(lineas, "")
+    delimitador = ";" if encabezado.count(";") > encabezado.count(",") else ","
+    lector = csv.reader(itertools.chain([encabezado], lineas), delimiter=delimitador)
+
+    campos = [_COLUMNAS.get(c.strip().lower()) for c in next(lector, [])]
+    if "fecha" not in campos or "monto" not in campos:
+        raise ValueError("El CSV debe tener columnas 'fecha' y 'monto'")
+
+    for numero, valores in enumerate(lector, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        fila = {"linea": numero}
+        for campo, valor in zip(campos, valores):
+            if campo:
+                fila[campo] = valor.strip()
+        yield fila
+
+
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+
+def leer_ofx(lineas: Iterable[str]) -> Iterator[dict]:
+    """
+    Transacciones <STMTTRN> de un OFX (SGML sin cierres o XML). Cada
+    transacción se entrega al cerrar su bloque: memoria constante.
+    """
+    actual = None
+    numero = 0
+    for linea in lineas:
+        for cierre, tag, valor in _TAG_OFX.findall(linea):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if cierre and actual is not None:
+                    numero += 1
+                    yield {
+                        "linea": numero,
+                        "fecha": actual.get("DTPOSTED", ""),
+                        "monto": actual.get("TRNAMT", ""),
+                        "referencia": actual.get("FITID") or f"{actual.get('NAME', '')} {actual.get('MEMO', '')}".strip(),
+                    }
+                    actual = None
+                elif not cierre:
+                    actual = {}
+            elif actual is not None and not cierre and valor.strip():
+                actual[tag] = valor.strip()
+
+
+def _monto(valor: str) -> int:
+    valor = (valor or "").replace("$", "").replace(" ", "")
+    # El último separador es el decimal: '1,234.50' y '1.234,50' -> 1234.50;
+    # una sola coma sin punto ('12,50') también es decimal
+    if "," in valor and ("." not in valor and valor.count(",") == 1 or valor.rfind(",") > valor.rfind(".")):
+        valor = valor.replace(".", "").replace(",", ".")
+    else:
+        valor = valor.replace(",", "")
+    try:
+        return montos.a_centavos(valor)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"monto inválido: '{valor}'")
+
+
+def _fecha(valor: str) -> datetime:
+    valor = (valor or "").strip()
+    # OFX: AAAAMMDD[HHMMSS[.XXX]][[-5:EST]]
+    if re.match(r"^\d{8}", valor):
+        digitos = re.match(r"^\d+", valor).group()[:14]
+        return datetime.strptime(digitos, "%Y%m%d%H%M%S"[: len(digitos) - 2])
+    try:
+        fecha = datetime.fromisoformat(valor)
+        # fecha_registro se guarda en UTC sin zona
+        return fecha.astimezone(timezone.utc).replace(tzinfo=None) if fecha.tzinfo else fecha
+    except ValueError:
+        pass
+    for formato in _FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, formato)
+        except ValueError:
+            continue
+    raise ValueError(f"fecha inválida: '{valor}'")
+
+
+# ===============================
+# Resolución de catálogos
+# ===============================
+
+class Resolvedor:
+    """Ids válidos y nombres (en minúsculas) cargados una vez por importación."""
+
+    def __init__(self, db: Session, usuarios_id: int):
+        cuentas = db.execute(
+            select(ListaCuenta.id, ListaCuenta.nombre).where(ListaCuenta.usuarios_id == usuarios_id)
+        ).all()
+        # Subcategorías y métodos: del catálogo en memoria, sin consulta
+        subcategorias = [(s["id"], s["descripcion"]) for s in catalogo.subcategorias()]
+        metodos = [(m["id"], m["nombre"]) for m in catalogo.metodos()]
+        self._tablas = {
+            "cuenta": self._indice(cuentas),
+            "subcategoria": self._indice(subcategorias),
+            "metodo": self._indice(metodos),
+        }
+
+    @staticmethod
+    def _indice(filas) -> tuple[set, dict]:
+        ids = {id_ for id_, _ in filas}
+        nombres: dict[str, Optional[int]] = {}
+        for id_, nombre in filas:
+            llave = (nombre or "").strip().lower()
+            # Nombre repetido: ambiguo, hay que usar el id
+            nombres[llave] = None if llave in nombres else id_
+        return ids, nombres
+
+    def resolver(self, tabla: str, valor) -> Optional[int]:
+        """id por id o por nombre; None si el valor viene vacío. ValueError si no existe."""
+        if valor is None or str(valor).strip() == "":
+            return None
+        ids, nombres = self._tablas[tabla]
+        valor = str(valor).strip()
+        if valor.isdigit() and int(valor) in ids:
+            return int(valor)
+        id_ = nombres.get(valor.lower())
+        if id_ is None:
+            raise ValueError(f"{tabla} no encontrada: '{valor}'")
+        return id_
+
+
+# ===============================
+# Importación
+# ===============================
+
+def _registro(fila: dict, usuarios_id: int, resolvedor: Resolvedor, defaults: dict, ocurrencias: Counter) -> dict:
+    """Fila del archivo -> valores de Registro (con hash). ValueError si es inválida."""
+    cuenta = resolvedor.resolver("cuenta", fila.get("cuenta")) or defaults["cuenta"]
+    if cuenta is None:
+        raise ValueError("falta la cuenta")
+    subcategoria = resolvedor.resolver("subcategoria", fila.get("subcategoria")) or defaults["subcategoria"]
+    if subcategoria is None:
+        raise ValueError("falta la subcategoría")
+    metodo = resolvedor.resolver("metodo", fila.get("metodo")) or defaults["metodo"]
+    if metodo is None:
+        raise ValueError("falta el método")
+
+    fecha = _fecha(fila.get("fecha"))
+    centavos = _monto(fila.get("monto"))
+
+    base = "|".join([str(cuenta), fecha.isoformat(), str(centavos), (fila.get("referencia") or "").lower()])
+    ocurrencias[base] += 1
+    return {
+        "usuarios_id": usuarios_id,
+        "lista_cuentas_id": cuenta,
+        "subCategorias_id": subcategoria,
+        "categori_metodos_id": metodo,
+        "monto": montos.a_texto(centavos),
+        "monto_centavos": centavos,
+        "fecha_registro": fecha,
+        "hash_contenido": hashlib.sha256(f"{base}|{ocurrencias[base]}".encode()).hexdigest(),
+    }
+
+
+def _insertar(db: Session, usuarios_id: int, lote: list[dict], resumen: dict) -> None:
+    """Un lote = una transacción: dedup, executemany, efectos agregados, commit."""
+    try:
+        db.execute(select(Usuario.id).where(Usuario.id == usuarios_id).with_for_update())
+        existentes = set(db.execute(
+            select(Registro.hash_contenido).where(
+                Registro.usuarios_id == usuarios_id,
+                Registro.hash_contenido.in_([f["hash_contenido"] for f in lote]),
+            )
+        ).scalars())
+        nuevas = [f for f in lote if f["hash_contenido"] not in existentes]
+        if nuevas:
+            db.execute(insert(Registro), nuevas)
+            movimientos.aplicar(db, usuarios_id, [(SimpleNamespace(**f), 1) for f in nuevas])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    resumen["insertadas"] += len(nuevas)
+    resumen["duplicadas"] += len(lote) - len(nuevas)
+    resumen["gastos"] = resumen["gastos"] or any(f["monto_centavos"] < 0 for f in nuevas)
+
+
+def importar(
+    db: Session,
+    user,
+    lineas: Iterable[str],
+    formato: str,
+    cuenta_default: Optional[str] = None,
+    subcategoria_default: Optional[str] = None,
+    metodo_default: Optional[str] = None,
+) -> dict:
+    """
+    Importa el archivo (ya decodificado, como iterable de líneas). Las filas
+    inválidas se reportan y se saltan; los lotes ya confirmados se quedan
+    aunque falle uno posterior. Devuelve el resumen de la importación.
+    """
+    inicio = time.perf_counter()
+    resolvedor = Resolvedor(db, user.id)
+    defaults = {
+        "cuenta": resolvedor.resolver("cuenta", cuenta_default),
+        "subcategoria": resolvedor.resolver("subcategoria", subcategoria_default),
+        "metodo": resolvedor.resolver("metodo", metodo_default),
+    }
+    db.rollback()  # cada lote abre su propia transacción
+
+    resumen = {"leidas": 0, "insertadas": 0, "duplicadas": 0, "errores": 0, "detalle_errores": [], "gastos": False}
+    ocurrencias: Counter = Counter()
+    lote: list[dict] = []
+    filas = leer_ofx(lineas) if formato == "ofx" else leer_csv(lineas)
+
+    for fila in filas:
+        if resumen["leidas"] >= IMPORT_MAX_FILAS:
+            resumen["detalle_errores"].append({"linea": fila["linea"], "error": f"límite de {IMPORT_MAX_FILAS} filas"})
+            break
+        resumen["leidas"] += 1
+        try:
+            lote.append(_registro(fila, user.id, resolvedor, defaults, ocurrencias))
+        except ValueError as e:
+            resumen["errores"] += 1
+            if len(resumen["detalle_errores"]) < MAX_DETALLE_ERRORES:
+                resumen["detalle_errores"].append({"linea": fila["linea"], "error": str(e)})
+            continue
+        if len(lote) >= IMPORT_LOTE:
+            _insertar(db, user.id, lote, resumen)
+            lote = []
+    if lote:
+        _insertar(db, user.id, lote, resumen)
+
+    # Alertas de presupuesto una sola vez, con el gastado ya actualizado
+    if resumen.pop("gastos"):
+        alertas.evaluar(db, user)
+        db.commit()
+
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    print(f"[IMPORT] usuario#{user.id}: {resumen['insertadas']} insertadas, "
+          f"{resumen['duplicadas']} duplicadas, {resumen['errores']} con error en {resumen['segundos']}s")
+    return resumen
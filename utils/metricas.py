@@ -0,0 +1,22 @@
+# utils/metricas.py
+"""
+Registro mínimo de métricas en proceso. Cada módulo registra una función
+que devuelve un dict con sus contadores/gauges; GET /metricas los junta.
+"""
+from typing import Callable, Dict
+
+_PROVEEDORES: Dict[str, Callable[[], dict]] = {}
+
+
+def registrar(nombre: str, proveedor: Callable[[], dict]) -> None:
+    _PROVEEDORES[nombre] = proveedor
+
+
+def snapshot() -> dict:
+    datos = {}
+    for nombre, proveedor in _PROVEEDORES.items():
+        try:
+            datos[nombre] = proveedor()
+        except Exception as e:
+            datos[nombre] = {"error": str(e)}
+    return datos
@@ -0,0 +1,140 @@
+# utils/migraciones.py
+"""
+Migraciones idempotentes de esquema para tablas que ya existen en producción.
+Base.metadata.create_all() solo crea tablas nuevas: no agrega columnas ni
+índices a tablas existentes, así que esos pasos viven aquí.
+
+Uso por consola (se puede correr varias veces sin efecto):
+    python -m utils.migraciones
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from models.database import engine, SessionLocal
+
+
+def asegurar_columna(eng: Engine, tabla: str, columna: str, ddl: str) -> bool:
+    """Agrega la columna si no existe. Devuelve True si la creó."""
+    columnas = {c["name"] for c in inspect(eng).get_columns(tabla)}
+    if columna in columnas:
+        return False
+    with eng.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {ddl}"))
+    print(f"[MIGRACION] {tabla}.{columna} agregada")
+    return True
+
+
+def asegurar_indice(eng: Engine, tabla: str, nombre: str, columnas: list[str], unico: bool = False) -> bool:
+    """Crea el índice si no existe. Devuelve True si lo creó."""
+    indices = {i["name"] for i in inspect(eng).get_indexes(tabla)}
+    if nombre in indices:
+        return False
+    tipo = "UNIQUE INDEX" if unico else "INDEX"
+    with eng.begin() as conn:
+        conn.execute(text(f"CREATE {tipo} {nombre} ON {tabla} ({', '.join(columnas)})"))
+    print(f"[MIGRACION] índice {nombre} creado en {tabla}")
+    return True
+
+
+def asegurar_no_nulo(eng: Engine, tabla: str, columna: str, ddl: str) -> bool:
+    """Pasa la columna a NOT NULL si todavía acepta NULL. Devuelve True si la cambió."""
+    if not _acepta_nulos(eng, tabla, columna):
+        return False
+    if eng.dialect.name == "sqlite":
+        # SQLite no tiene ALTER COLUMN (el esquema local sale de create_all)
+        print(f"[MIGRACION] {tabla}.{columna}: NOT NULL no soportado en sqlite")
+        return False
+    modificar = f"MODIFY COLUMN {columna} {ddl}" if eng.dialect.name == "mysql" else f"ALTER COLUMN {columna} SET NOT NULL"
+    with eng.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {tabla} {modificar}"))
+    print(f"[MIGRACION] {tabla}.{columna} ahora es NOT NULL")
+    return True
+
+
+def _acepta_nulos(eng: Engine, tabla: str, columna: str) -> bool:
+    return next(c["nullable"] for c in inspect(eng).get_columns(tabla) if c["name"] == columna)
+
+
+def quitar_triggers_saldo(eng: Engine) -> list[str]:
+    """
+    Elimina los triggers de registros que tocaban lista_cuentas: los saldos
+    ahora los ajusta la API (utils/saldos.py) y con el trigger se sumarían
+    dos veces. Correr ANTES de desplegar la versión que ajusta saldos.
+    """
+    if eng.dialect.name != "mysql":
+        return []
+    with eng.begin() as conn:
+        nombres = conn.execute(text(
+            "SELECT TRIGGER_NAME FROM information_schema.TRIGGERS "
+            "WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = 'registros' "
+            "AND ACTION_STATEMENT LIKE '%lista_cuentas%'"
+        )).scalars().all()
+        for nombre in nombres:
+            conn.execute(text(f"DROP TRIGGER `{nombre}`"))
+            print(f"[MIGRACION] trigger {nombre} eliminado")
+    return nombres
+
+
+def migrar(eng: Engine = engine) -> None:
+    """
+    Orden: primero columnas y backfill de centavos; después los valores que
+    se derivan de ellos (saldo inicial, gastado). Cada paso de datos solo
+    toca filas que siguen en NULL, así que repetir migrar() no cambia nada.
+    """
+    from utils import montos, saldos, gastado
+
+    # Montos en centavos (fase de doble escritura) y backfill de filas viejas
+    asegurar_columna(eng, "registros", "monto_centavos", "BIGINT NULL")
+    asegurar_columna(eng, "lista_cuentas", "cantidad_centavos", "BIGINT NULL")
+    asegurar_indice(eng, "registros", "ix_registros_usuario_fecha_monto",
+                    ["usuarios_id", "fecha_registro", "monto_centavos"])
+    for tabla in ("registros", "lista_cuentas"):
+        montos.backfill(tabla)
+    # Corte: las lecturas usan la columna en centavos sin respaldo al texto.
+    # Solo se pasa a NOT NULL cuando verificar() no encuentra diferencias
+    for tabla, columna in (("registros", "monto_centavos"), ("lista_cuentas", "cantidad_centavos")):
+        if not _acepta_nulos(eng, tabla, columna):
+            continue
+        diferencias = montos.verificar(tabla)
+        if diferencias:
+            print(f"[MIGRACION] {tabla}.{columna}: corte pendiente ({diferencias} diferencias; "
+                  f"python -m utils.montos verificar --tabla {tabla} --reparar)")
+            continue
+        asegurar_no_nulo(eng, tabla, columna, "BIGINT NOT NULL")
+
+    # Paginación keyset de registros
+    asegurar_indice(eng, "registros", "ix_registros_usuario_fecha_id",
+                    ["usuarios_id", "fecha_registro", "id"])
+
+    # Historial de saldo por cuenta (la tabla saldos_diarios la crea create_all)
+    asegurar_indice(eng, "registros", "ix_registros_cuenta_fecha",
+                    ["lista_cuentas_id", "fecha_registro"])
+
+    # Importación de estados de cuenta: deduplicación por hash de contenido
+    asegurar_columna(eng, "registros", "hash_contenido", "VARCHAR(64) NULL")
+    asegurar_indice(eng, "registros", "uq_registros_usuario_hash",
+                    ["usuarios_id", "hash_contenido"], unico=True)
+
+    # Saldos: solo la API los ajusta; el saldo inicial permite conciliarlos.
+    # inicializar() llena solo las cuentas con saldo_inicial_centavos en NULL
+    quitar_triggers_saldo(eng)
+    asegurar_columna(eng, "lista_cuentas", "saldo_inicial_centavos", "BIGINT NULL")
+    saldos.inicializar()
+
+    # Presupuestos recurrentes (la tabla presupuesto_periodos la crea create_all)
+    asegurar_columna(eng, "presupuestos", "periodo", "VARCHAR(10) NOT NULL DEFAULT 'unico'")
+    asegurar_columna(eng, "presupuestos", "periodo_inicio", "DATETIME NULL")
+
+    # Acumulado de gastos por presupuesto: al crear la columna se llena una vez
+    # (ya con los centavos llenos; después lo mantiene la API)
+    if asegurar_columna(eng, "presupuestos", "gastado_centavos", "BIGINT NOT NULL DEFAULT 0"):
+        db = SessionLocal(bind=eng)
+        try:
+            gastado.recalcular(db)
+            db.commit()
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,172 @@
+# utils/montos.py
+"""
+Montos en centavos enteros.
+
+Registro.monto y ListaCuenta.cantidad son varchar. Para poder filtrar y
+agregar sin CAST (y usar el índice (usuarios_id, fecha_registro, monto_centavos))
+existen las columnas BIGINT monto_centavos / cantidad_centavos.
+
+Plan de migración:
+  1. python -m utils.migraciones            -> agrega columnas e índice
+  2. desplegar la API (escribe ambas columnas: doble escritura)
+  3. python -m utils.montos backfill         -> llena filas viejas por lotes
+  4. python -m utils.montos verificar        -> compara texto vs centavos
+     (con --reparar corrige las diferencias)
+  5. python -m utils.migraciones            -> corte: con 0 diferencias pasa
+     monto_centavos / cantidad_centavos a NOT NULL (si no, lo deja pendiente)
+Las lecturas en SQL (dashboard, export, rollups, presupuestos, saldos,
+historial) usan las columnas en centavos tal cual, sin CAST del texto, así
+que los filtros por signo aprovechan el índice; por eso el paso 3 debe
+correr justo después del despliegue. Las escrituras guardan el texto como
+a_texto(centavos): ambas columnas no pueden diferir.
+"""
+import argparse
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Union
+
+from sqlalchemy import func, cast, Numeric, update, select
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, Registro, ListaCuenta
+
+_CENTAVO = Decimal("0.01")
+
+
+def a_centavos(valor: Union[str, Decimal, int, float]) -> int:
+    """
+    '123.456' -> 12346. Lanza InvalidOperation/ValueError si no es numérico.
+    """
+    return int(Decimal(str(valor).strip()).quantize(_CENTAVO, rounding=ROUND_HALF_UP) * 100)
+
+
+def a_decimal(centavos: Optional[int]) -> Decimal:
+    return (Decimal(centavos or 0) / 100).quantize(_CENTAVO)
+
+
+def a_float(centavos: Optional[int]) -> float:
+    return float(a_decimal(centavos))
+
+
+def a_texto(centavos: Optional[int]) -> str:
+    """Representación para las columnas varchar ('-12.50')."""
+    return str(a_decimal(centavos))
+
+
+def centavos_registro(registro) -> int:
+    """Centavos de un registro; si la fila aún no tiene backfill, desde el texto."""
+    if registro.monto_centavos is not None:
+        return registro.monto_centavos
+    return a_centavos(registro.monto)
+
+
+def centavos_cuenta(cuenta) -> int:
+    """Saldo en centavos de una cuenta; si aún no tiene backfill, desde el texto."""
+    if cuenta.cantidad_centavos is not None:
+        return cuenta.cantidad_centavos
+    return a_centavos(cuenta.cantidad)
+
+
+# ===============================
+# Backfill y verificación
+# ===============================
+
+# (modelo, columna texto, columna centavos)
+_TABLAS = {
+    "registros": (Registro, Registro.monto, Registro.monto_centavos),
+    "lista_cuentas": (ListaCuenta, ListaCuenta.cantidad, ListaCuenta.cantidad_centavos),
+}
+
+
+def _rangos(db: Session, modelo, lote: int):
+    max_id = db.query(func.max(modelo.id)).scalar() or 0
+    inicio = 0
+    while inicio <= max_id:
+        yield inicio, inicio + lote
+        inicio += lote
+
+
+def backfill(tabla: str, lote: int = 5000, pausa: float = 0.0) -> int:
+    """
+    Llena la columna en centavos donde sigue en NULL, por rangos de id y con
+    un commit por lote (transacciones cortas: la tabla sigue en línea).
+    """
+    modelo, texto, centavos = _TABLAS[tabla]
+    total = 0
+    db = SessionLocal()
+    try:
+        for desde, hasta in _rangos(db, modelo, lote):
+            res = db.execute(
+                update(modelo)
+                .where(modelo.id >= desde, modelo.id < hasta, centavos.is_(None))
+                .values({centavos: func.round(cast(texto, Numeric(16, 2)) * 100)})
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            total += res.rowcount
+            if pausa:
+                time.sleep(pausa)
+        print(f"[MONTOS] {tabla}: {total} filas llenadas")
+        return total
+    finally:
+        db.close()
+
+
+def verificar(tabla: str, lote: int = 5000, reparar: bool = False) -> int:
+    """
+    Recorre la tabla por lotes comparando el valor de texto (parseado en
+    Python, igual que la API) contra la columna en centavos.
+    Devuelve el número de diferencias encontradas.
+    """
+    modelo, texto, centavos = _TABLAS[tabla]
+    diferencias = 0
+    db = SessionLocal()
+    try:
+        for desde, hasta in _rangos(db, modelo, lote):
+            filas = db.execute(
+                select(modelo.id, texto, centavos)
+                .where(modelo.id >= desde, modelo.id < hasta)
+            ).all()
+
+            correcciones = []
+            for id_, valor, actual in filas:
+                try:
+                    esperado = a_centavos(valor)
+                except Exception:
+                    print(f"[MONTOS] {tabla}#{id_}: valor no numérico {valor!r}")
+                    diferencias += 1
+                    continue
+                if actual != esperado:
+                    diferencias += 1
+                    print(f"[MONTOS] {tabla}#{id_}: texto={valor!r} centavos={actual} esperado={esperado}")
+                    correcciones.append({"id": id_, centavos.key: esperado})
+
+            if reparar and correcciones:
+                db.execute(update(modelo), correcciones)
+                db.commit()
+
+        print(f"[MONTOS] {tabla}: {diferencias} diferencias" + (" (reparadas)" if reparar else ""))
+        return diferencias
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill/verificación de montos en centavos")
+    parser.add_argument("accion", choices=["backfill", "verificar"])
+    parser.add_argument("--tabla", choices=list(_TABLAS), default=None, help="Por defecto, ambas")
+    parser.add_argument("--lote", type=int, default=5000)
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos entre lotes (backfill)")
+    parser.add_argument("--reparar", action="store_true", help="Corrige diferencias (verificar)")
+    args = parser.parse_args()
+
+    tablas = [args.tabla] if args.tabla else list(_TABLAS)
+    for tabla in tablas:
+        if args.accion == "backfill":
+            backfill(tabla, args.lote, args.pausa)
+        else:
+            verificar(tabla, args.lote, args.reparar)
+
+
+if __name__ == "__main__":
+    main()
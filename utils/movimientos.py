@@ -0,0 +1,51 @@
+# utils/movimientos.py
+"""
+Efectos agregados de muchos registros en una sola transacción (importación
+de estados de cuenta, /registros/batch).
+
+Los endpoints de un registro aplican cada efecto por separado (saldos,
+rollups, gastado). Con cientos o miles de filas eso serían miles de UPDATE,
+así que aquí primero se suman en memoria y luego se aplican una vez:
+
+  - saldos: un delta por cuenta (saldos.ajustar_varios, en orden de id) y
+    un desplazamiento de cortes de historial por (cuenta, día).
+  - rollups: una fila de resumen_diario por (día, subcategoría, método),
+    en un solo executemany.
+  - gastado: un delta por presupuesto (gastado.aplicar_lote), sin volver a
+    sumar el historial del usuario en cada lote.
+
+aplicar() no hace commit: va en la transacción que insertó/modificó los
+registros.
+"""
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy.orm import Session
+
+from utils import gastado, historial, montos, rollups, saldos
+
+
+def aplicar(db: Session, usuarios_id: int, cambios: Iterable[tuple]) -> dict:
+    """
+    Aplica una lista de (registro, signo): signo=1 suma el registro, -1 lo
+    revierte (una edición es la reversión del estado previo más la suma del
+    nuevo). Devuelve un resumen de lo aplicado.
+    """
+    cambios = list(cambios)
+    if not cambios:
+        return {"cuentas": 0, "rollups": 0, "presupuestos": 0}
+
+    por_cuenta: dict[int, int] = defaultdict(int)
+    por_dia: dict[tuple, int] = defaultdict(int)
+    for registro, signo in cambios:
+        centavos = signo * montos.centavos_registro(registro)
+        por_cuenta[registro.lista_cuentas_id] += centavos
+        por_dia[(registro.lista_cuentas_id, registro.fecha_registro.date())] += centavos
+
+    saldos.ajustar_varios(db, {c: d for c, d in por_cuenta.items() if d})
+    for (cuenta_id, dia), delta in sorted(por_dia.items()):
+        historial.desplazar(db, cuenta_id, dia, delta)
+
+    filas_rollup = rollups.aplicar_lote(db, cambios)
+    presupuestos = gastado.aplicar_lote(db, usuarios_id, cambios)
+    return {"cuentas": len(por_cuenta), "rollups": filas_rollup, "presupuestos": presupuestos}
@@ -0,0 +1,355 @@
+# utils/outbox.py
+"""
+Outbox de notificaciones y worker de entrega.
+
+La API no habla con Resend/Twilio: encolar() inserta una fila en
+notificaciones_outbox dentro de la misma transacción de la escritura que la
+origina (si la escritura hace rollback, la notificación no existe). Un
+proceso aparte drena la tabla:
+
+  - reclama lotes con SELECT ... FOR UPDATE SKIP LOCKED (varios workers no
+    se pisan) y los marca 'enviando' con una reserva que vence: si el worker
+    muere a medio envío, otro los retoma al vencer la reserva;
+  - entrega cada lote con el proveedor del canal (Resend usa su API batch:
+    hasta 100 correos por request), respetando un límite de requests por
+    segundo por proveedor;
+  - reintenta con backoff exponencial + jitter hasta OUTBOX_MAX_INTENTOS y
+    después deja la fila en 'fallida'.
+
+Proveedores (OUTBOX_PROVEEDOR_EMAIL / OUTBOX_PROVEEDOR_SMS):
+  resend | twilio | fake. "fake" no sale a la red (latencia y tasa de error
+  configurables) para medir throughput sin credenciales.
+
+Uso por consola:
+    python -m utils.outbox                    # worker (loop)
+    python -m utils.outbox --una-vez          # drena lo pendiente y sale
+    python -m utils.outbox --generar 5000     # benchmark local (siempre fake)
+"""
+import argparse
+import os
+import random
+import signal
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, engine, Notificacion
+from utils import metricas
+
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", "100"))
+OUTBOX_ESPERA = float(os.getenv("OUTBOX_ESPERA", "1.0"))  # segundos sin trabajo
+OUTBOX_MAX_INTENTOS = int(os.getenv("OUTBOX_MAX_INTENTOS", "6"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "30"))  # segundos
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))
+OUTBOX_RESERVA = int(os.getenv("OUTBOX_RESERVA", "300"))  # segundos
+
+CANALES = ("email", "sms")
+
+
+def encolar(
+    db: Session,
+    canal: str,
+    destino: str,
+    cuerpo: str,
+    asunto: Optional[str] = None,
+    usuarios_id: Optional[int] = None,
+) -> None:
+    """Agrega la notificación a la transacción actual. No hace commit."""
+    if canal not in CANALES:
+        raise ValueError(f"Canal inválido: {canal}")
+    db.add(Notificacion(
+        usuarios_id=usuarios_id,
+        canal=canal,
+        destino=destino,
+        asunto=asunto,
+        cuerpo=cuerpo,
+        estado="pendiente",
+        intentos=0,
+        proximo_intento=datetime.utcnow(),
+    ))
+
+
+# ===============================
+# Proveedores
+# ===============================
+
+class LimiteTasa:
+    """Token bucket: como máximo 'por_segundo' llamadas (con ráfaga igual)."""
+
+    def __init__(self, por_segundo: float):
+        self.por_segundo = por_segundo
+        self._tokens = por_segundo
+        self._ultimo = time.monotonic()
+
+    def esperar(self) -> None:
+        if self.por_segundo <= 0:
+            return
+        while True:
+            ahora = time.monotonic()
+            self._tokens = min(self.por_segundo, self._tokens + (ahora - self._ultimo) * self.por_segundo)
+            self._ultimo = ahora
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.por_segundo)
+
+
+class Proveedor(ABC):
+    """
+    enviar(lote) recibe notificaciones del mismo canal y devuelve, en el mismo
+    orden, None (entregada) o el texto del error.
+    """
+    nombre = "base"
+
+    def __init__(self, por_segundo: float):
+        self.limite = LimiteTasa(por_segundo)
+
+    @abstractmethod
+    def enviar(self, lote: list) -> list[Optional[str]]:
+        ...
+
+
+class ResendProveedor(Proveedor):
+    nombre = "resend"
+    MAX_POR_REQUEST = 100
+
+    def __init__(self, por_segundo: float):
+        super().__init__(por_segundo)
+        import resend
+        from utils.correo import _resend_from
+        resend.api_key = os.getenv("RESEND_API_KEY")
+        self._resend = resend
+        self._remitente = _resend_from()
+
+    def enviar(self, lote: list) -> list[Optional[str]]:
+        errores: list[Optional[str]] = []
+        for i in range(0, len(lote), self.MAX_POR_REQUEST):
+            parte = lote[i:i + self.MAX_POR_REQUEST]
+            self.limite.esperar()
+            try:
+                self._resend.Batch.send([
+                    {"from": self._remitente, "to": [n.destino], "subject": n.asunto or "", "text": n.cuerpo}
+                    for n in parte
+                ])
+                errores.extend([None] * len(parte))
+            except Exception as e:
+                errores.extend([str(e)] * len(parte))
+        return errores
+
+
+class TwilioProveedor(Proveedor):
+    nombre = "twilio"
+
+    def __init__(self, por_segundo: float):
+        super().__init__(por_segundo)
+        from twilio.rest import Client
+        from utils.sms import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
+        # Un solo cliente (y sesión HTTP) para toda la vida del worker
+        self._cliente = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+        self._origen = TWILIO_PHONE_NUMBER
+
+    def enviar(self, lote: list) -> list[Optional[str]]:
+        errores: list[Optional[str]] = []
+        for n in lote:
+            self.limite.esperar()
+            try:
+                self._cliente.messages.create(body=n.cuerpo, from_=self._origen, to=n.destino)
+                errores.append(None)
+            except Exception as e:
+                errores.append(str(e))
+        return errores
+
+
+class FakeProveedor(Proveedor):
+    """No sale a la red. OUTBOX_FAKE_LATENCIA (s por request) y OUTBOX_FAKE_ERROR (0-1)."""
+    nombre = "fake"
+
+    def __init__(self, por_segundo: float):
+        super().__init__(por_segundo)
+        self.latencia = float(os.getenv("OUTBOX_FAKE_LATENCIA", "0.05"))
+        self.tasa_error = float(os.getenv("OUTBOX_FAKE_ERROR", "0"))
+
+    def enviar(self, lote: list) -> list[Optional[str]]:
+        self.limite.esperar()
+        time.sleep(self.latencia)
+        return ["fallo simulado" if random.random() < self.tasa_error else None for _ in lote]
+
+
+_PROVEEDORES = {"resend": ResendProveedor, "twilio": TwilioProveedor, "fake": FakeProveedor}
+
+
+def _crear_proveedor(canal: str, forzar_fake: bool = False) -> Proveedor:
+    por_defecto = {"email": "resend", "sms": "twilio"}[canal]
+    nombre = "fake" if forzar_fake else os.getenv(f"OUTBOX_PROVEEDOR_{canal.upper()}", por_defecto)
+    # Sin credenciales no hay a quién enviar: se usa fake (equivale al DRYRUN de antes)
+    if nombre == "resend" and not os.getenv("RESEND_API_KEY"):
+        print("[OUTBOX] Falta RESEND_API_KEY; correo con proveedor fake")
+        nombre = "fake"
+    if nombre == "twilio" and not os.getenv("TWILIO_ACCOUNT_SID"):
+        print("[OUTBOX] Falta TWILIO_ACCOUNT_SID; SMS con proveedor fake")
+        nombre = "fake"
+    tasa = float(os.getenv(f"OUTBOX_TASA_{canal.upper()}", "2" if canal == "email" else "10"))
+    return _PROVEEDORES[nombre](tasa)
+
+
+# ===============================
+# Worker
+# ===============================
+
+def _backoff(intentos: int) -> timedelta:
+    segundos = min(OUTBOX_BACKOFF_BASE * 2 ** (intentos - 1), OUTBOX_BACKOFF_MAX)
+    return timedelta(seconds=segundos * random.uniform(0.8, 1.2))
+
+
+def reclamar(db: Session, canal: str, lote: int = OUTBOX_LOTE) -> list:
+    """
+    Reserva hasta 'lote' notificaciones vencidas del canal (pendientes o con
+    reserva expirada) y hace commit. Devuelve copias planas (sin ORM) para no
+    recargar cada fila después del commit.
+    """
+    ahora = datetime.utcnow()
+    filas = (
+        db.query(Notificacion)
+        .filter(
+            Notificacion.canal == canal,
+            Notificacion.estado.in_(("pendiente", "enviando")),
+            Notificacion.proximo_intento <= ahora,
+        )
+        .order_by(Notificacion.proximo_intento, Notificacion.id)
+        .limit(lote)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    reservadas = [
+        SimpleNamespace(id=n.id, destino=n.destino, asunto=n.asunto, cuerpo=n.cuerpo, intentos=n.intentos)
+        for n in filas
+    ]
+    if reservadas:
+        db.execute(
+            update(Notificacion)
+            .where(Notificacion.id.in_([n.id for n in reservadas]))
+            .values(estado="enviando", proximo_intento=ahora + timedelta(seconds=OUTBOX_RESERVA))
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return reservadas
+
+
+def registrar_resultados(db: Session, lote: list, errores: list[Optional[str]]) -> tuple[int, int]:
+    """Guarda el resultado de un lote en un solo executemany. Devuelve (ok, fallos)."""
+    ahora = datetime.utcnow()
+    cambios = []
+    for n, error in zip(lote, errores):
+        if error is None:
+            cambios.append({"id": n.id, "estado": "enviada", "fecha_envio": ahora, "ultimo_error": None})
+            continue
+        intentos = n.intentos + 1
+        agotado = intentos >= OUTBOX_MAX_INTENTOS
+        cambios.append({
+            "id": n.id,
+            "estado": "fallida" if agotado else "pendiente",
+            "intentos": intentos,
+            "proximo_intento": ahora + _backoff(intentos),
+            "ultimo_error": error[:1000],
+        })
+        print(f"[OUTBOX] #{n.id} intento {intentos} falló: {error}")
+    # executemany agrupa por conjunto de columnas
+    for columnas in {tuple(sorted(c)) for c in cambios}:
+        db.execute(update(Notificacion), [c for c in cambios if tuple(sorted(c)) == columnas])
+    db.commit()
+    ok = sum(1 for e in errores if e is None)
+    return ok, len(errores) - ok
+
+
+def procesar(db: Session, proveedores: dict, lote: int = OUTBOX_LOTE) -> int:
+    """Una pasada por canal. Devuelve cuántas notificaciones se intentaron."""
+    total = 0
+    for canal, proveedor in proveedores.items():
+        reservadas = reclamar(db, canal, lote)
+        if not reservadas:
+            continue
+        errores = proveedor.enviar(reservadas)
+        ok, fallos = registrar_resultados(db, reservadas, errores)
+        total += len(reservadas)
+        print(f"[OUTBOX] {canal}/{proveedor.nombre}: {ok} enviadas, {fallos} con error")
+    return total
+
+
+def correr(una_vez: bool = False, forzar_fake: bool = False, lote: int = OUTBOX_LOTE) -> int:
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    signal.signal(signal.SIGINT, lambda *_: detener.set())
+
+    proveedores = {canal: _crear_proveedor(canal, forzar_fake) for canal in CANALES}
+    print(f"[OUTBOX] worker iniciado ({', '.join(f'{c}={p.nombre}' for c, p in proveedores.items())})")
+    total = 0
+    while not detener.is_set():
+        db = SessionLocal()
+        try:
+            procesadas = procesar(db, proveedores, lote)
+        except Exception as e:
+            db.rollback()
+            print(f"[OUTBOX] error en la pasada: {e}")
+            procesadas = 0
+        finally:
+            db.close()
+        total += procesadas
+        if procesadas == 0:
+            if una_vez:
+                break
+            detener.wait(OUTBOX_ESPERA)
+    return total
+
+
+def estadisticas() -> dict:
+    db = SessionLocal()
+    try:
+        filas = db.query(Notificacion.estado, func.count(Notificacion.id)).group_by(Notificacion.estado).all()
+        return {estado: cantidad for estado, cantidad in filas}
+    finally:
+        db.close()
+
+
+metricas.registrar("outbox", estadisticas)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker del outbox de notificaciones")
+    parser.add_argument("--una-vez", action="store_true", help="Drena lo pendiente y termina")
+    parser.add_argument("--fake", action="store_true", help="Usa el proveedor fake en todos los canales")
+    parser.add_argument("--lote", type=int, default=OUTBOX_LOTE)
+    parser.add_argument("--generar", type=int, default=0,
+                        help="Encola N correos de prueba y mide (implica --una-vez y --fake)")
+    args = parser.parse_args()
+
+    Notificacion.__table__.create(bind=engine, checkfirst=True)
+
+    if args.generar:
+        db = SessionLocal()
+        try:
+            for i in range(args.generar):
+                encolar(db, "email", f"bench{i}@example.com", "Prueba de throughput", asunto="bench")
+            db.commit()
+        finally:
+            db.close()
+
+    inicio = time.perf_counter()
+    # Los correos de prueba van a direcciones inventadas: nunca a un proveedor real
+    total = correr(
+        una_vez=args.una_vez or bool(args.generar),
+        forzar_fake=args.fake or bool(args.generar),
+        lote=args.lote,
+    )
+    segundos = time.perf_counter() - inicio
+    if total:
+        print(f"[OUTBOX] {total} notificaciones en {segundos:.2f}s ({total / segundos:.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
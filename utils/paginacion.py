@@ -0,0 +1,96 @@
+# utils/paginacion.py
+"""
+Paginación keyset (por cursor) sobre registros, ordenados por
+(fecha_registro DESC, id DESC). El cursor es opaco para el cliente: codifica
+la fecha e id del último elemento de la página anterior.
+"""
+import base64
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import Registro
+
+LIMITE_MAXIMO = 500
+
+
+def codificar_cursor(fecha: datetime, registro_id: int) -> str:
+    crudo = f"{fecha.isoformat()}|{registro_id}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha, registro_id = base64.urlsafe_b64decode(cursor + relleno).decode().split("|")
+        return datetime.fromisoformat(fecha), int(registro_id)
+    except Exception:
+        raise HTTPException(status_code=422, detail="cursor inválido")
+
+
+def filtros_registros(
+    usuarios_id: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    lista_cuentas_id: Optional[int] = None,
+    subCategorias_id: Optional[int] = None,
+    categori_metodos_id: Optional[int] = None,
+    tipo: Optional[str] = None,
+) -> list:
+    """
+    Condiciones WHERE para los filtros opcionales de listados de registros.
+    'hasta' es exclusivo. tipo: 'ingreso' (monto > 0) | 'gasto' (monto < 0).
+    """
+    condiciones = [Registro.usuarios_id == usuarios_id]
+    if desde is not None:
+        condiciones.append(Registro.fecha_registro >= desde)
+    if hasta is not None:
+        condiciones.append(Registro.fecha_registro < hasta)
+    if lista_cuentas_id is not None:
+        condiciones.append(Registro.lista_cuentas_id == lista_cuentas_id)
+    if subCategorias_id is not None:
+        condiciones.append(Registro.subCategorias_id == subCategorias_id)
+    if categori_metodos_id is not None:
+        condiciones.append(Registro.categori_metodos_id == categori_metodos_id)
+    if tipo == "ingreso":
+        condiciones.append(Registro.monto_centavos > 0)
+    elif tipo == "gasto":
+        condiciones.append(Registro.monto_centavos < 0)
+    return condiciones
+
+
+def condicion_cursor(cursor: str):
+    """
+    Registros estrictamente "después" del cursor en orden descendente.
+    Se expande el OR (en vez de comparar tuplas) para que MySQL use el
+    índice (usuarios_id, fecha_registro, id) como rango.
+    """
+    fecha, registro_id = decodificar_cursor(cursor)
+    return or_(
+        Registro.fecha_registro < fecha,
+        and_(Registro.fecha_registro == fecha, Registro.id < registro_id),
+    )
+
+
+async def paginar(db: AsyncSession, stmt, limite: int, cursor: Optional[str] = None, escalares: bool = False):
+    """
+    Aplica cursor, orden y límite a un select() que incluya Registro.id y
+    Registro.fecha_registro. Devuelve (filas, siguiente_cursor | None).
+    escalares=True para select(Registro) (devuelve objetos, no Rows).
+    """
+    if cursor:
+        stmt = stmt.where(condicion_cursor(cursor))
+    resultado = await db.execute(
+        stmt.order_by(Registro.fecha_registro.desc(), Registro.id.desc())
+        .limit(limite + 1)
+    )
+    filas = resultado.scalars().all() if escalares else resultado.all()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(ultima.fecha_registro, ultima.id)
+    return filas, siguiente
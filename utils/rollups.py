@@ -0,0 +1,162 @@
+# utils/rollups.py
+"""
+Mantenimiento de la tabla resumen_diario (rollup de registros).
+
+- aplicar_registro(): suma/resta un registro al rollup. Se llama dentro de la
+  misma transacción que crea, actualiza o elimina el registro.
+- aplicar_lote(): lo mismo para muchos registros, agrupados por fila del
+  rollup y aplicados con un solo executemany (importaciones y batch).
+- reconstruir(): recalcula el rollup desde cero (backfill o reparación).
+
+Uso por consola:
+    python -m utils.rollups                # reconstruye todos los usuarios
+    python -m utils.rollups --usuario 12   # solo un usuario
+"""
+import argparse
+from decimal import Decimal
+from typing import Iterable, Optional, Union
+
+from sqlalchemy import func, case, cast, Numeric, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import mysql, sqlite
+
+from models.database import SessionLocal, engine, Registro, ResumenDiario
+from utils import montos
+
+
+def _upsert(db: Session, valores: Union[dict, list[dict]]) -> None:
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (o ON CONFLICT en sqlite) que acumula
+    los deltas sobre la fila existente. Es atómico, sin SELECT previo.
+    Con una lista de filas se ejecuta como executemany.
+    """
+    acumulables = ("ingresos", "gastos", "cantidad_ingresos", "cantidad_gastos", "cantidad_movimientos")
+    dialecto = db.get_bind().dialect.name
+
+    if dialecto == "mysql":
+        stmt = mysql.insert(ResumenDiario)
+        stmt = stmt.on_duplicate_key_update(
+            {c: getattr(ResumenDiario, c) + stmt.inserted[c] for c in acumulables}
+        )
+    elif dialecto == "sqlite":
+        stmt = sqlite.insert(ResumenDiario)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["usuarios_id", "fecha", "subCategorias_id", "categori_metodos_id"],
+            set_={c: getattr(ResumenDiario, c) + stmt.excluded[c] for c in acumulables},
+        )
+    else:
+        raise RuntimeError(f"Dialecto no soportado para rollups: {dialecto}")
+
+    db.execute(stmt, valores)
+
+
+def _fila(registro, signo: int) -> dict:
+    monto = montos.a_decimal(montos.centavos_registro(registro))
+    es_ingreso = monto > 0
+    es_gasto = monto < 0
+    return {
+        "usuarios_id": registro.usuarios_id,
+        "fecha": registro.fecha_registro.date(),
+        "subCategorias_id": registro.subCategorias_id,
+        "categori_metodos_id": registro.categori_metodos_id or 0,
+        "ingresos": signo * (monto if es_ingreso else Decimal(0)),
+        "gastos": signo * (-monto if es_gasto else Decimal(0)),
+        "cantidad_ingresos": signo * int(es_ingreso),
+        "cantidad_gastos": signo * int(es_gasto),
+        "cantidad_movimientos": signo,
+    }
+
+
+def aplicar_registro(db: Session, registro, signo: int = 1) -> None:
+    """
+    Aplica (signo=1) o revierte (signo=-1) un registro en resumen_diario.
+    'registro' puede ser un Registro o cualquier objeto con los mismos campos
+    (p. ej. un snapshot del estado previo en actualizar_registro).
+    """
+    _upsert(db, _fila(registro, signo))
+
+
+_LLAVE = ("usuarios_id", "fecha", "subCategorias_id", "categori_metodos_id")
+
+
+def aplicar_lote(db: Session, cambios: Iterable[tuple]) -> int:
+    """
+    Aplica muchos (registro, signo) sumando primero en memoria los que caen
+    en la misma fila del rollup. Devuelve cuántas filas del rollup tocó.
+    """
+    filas: dict[tuple, dict] = {}
+    for registro, signo in cambios:
+        fila = _fila(registro, signo)
+        llave = tuple(fila[c] for c in _LLAVE)
+        if llave in filas:
+            for c, v in fila.items():
+                if c not in _LLAVE:
+                    filas[llave][c] += v
+        else:
+            filas[llave] = fila
+    if filas:
+        _upsert(db, list(filas.values()))
+    return len(filas)
+
+
+def reconstruir(db: Session, usuarios_id: Optional[int] = None) -> int:
+    """
+    Borra y recalcula el rollup (de un usuario o de todos) con un único
+    INSERT ... SELECT agrupado. No hace commit.
+    """
+    borrar = db.query(ResumenDiario)
+    if usuarios_id is not None:
+        borrar = borrar.filter(ResumenDiario.usuarios_id == usuarios_id)
+    borrar.delete(synchronize_session=False)
+
+    monto = cast(Registro.monto_centavos, Numeric(16, 2)) / 100
+    fecha = func.date(Registro.fecha_registro)
+    metodo = func.coalesce(Registro.categori_metodos_id, 0)
+
+    origen = db.query(
+        Registro.usuarios_id,
+        fecha,
+        Registro.subCategorias_id,
+        metodo,
+        func.sum(case((monto > 0, monto), else_=0)),
+        func.sum(case((monto < 0, -monto), else_=0)),
+        func.sum(case((monto > 0, 1), else_=0)),
+        func.sum(case((monto < 0, 1), else_=0)),
+        func.count(Registro.id),
+    )
+    if usuarios_id is not None:
+        origen = origen.filter(Registro.usuarios_id == usuarios_id)
+    origen = origen.group_by(Registro.usuarios_id, fecha, Registro.subCategorias_id, metodo)
+
+    resultado = db.execute(
+        insert(ResumenDiario).from_select(
+            [
+                "usuarios_id", "fecha", "subCategorias_id", "categori_metodos_id",
+                "ingresos", "gastos", "cantidad_ingresos", "cantidad_gastos", "cantidad_movimientos",
+            ],
+            origen.statement,
+        )
+    )
+    return resultado.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconstruye la tabla resumen_diario")
+    parser.add_argument("--usuario", type=int, default=None, help="ID de usuario (por defecto, todos)")
+    args = parser.parse_args()
+
+    ResumenDiario.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        filas = reconstruir(db, args.usuario)
+        db.commit()
+        print(f"[ROLLUPS] resumen_diario reconstruido: {filas} filas")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# utils/saldos.py
+"""
+Ajustes de saldo de ListaCuenta hechos por la base de datos.
+
+Cada movimiento es un solo UPDATE relativo (saldo = saldo + delta) dentro de
+la transacción del registro: no hay lectura previa en Python, así que dos
+requests concurrentes sobre la misma cuenta no se pisan (el lock de fila del
+UPDATE las serializa) y el saldo queda exacto.
+
+Antes el AFTER INSERT de registros lo hacía un trigger de MySQL (solo en la
+columna de texto). utils.migraciones lo elimina: desde este cambio la API es
+la única que ajusta saldos, en todas las rutas (crear, editar y eliminar).
+
+Conciliación: el saldo esperado de una cuenta es saldo_inicial_centavos más
+la suma de sus registros. conciliar() lo recalcula por rangos de id de
+cuenta con una consulta agrupada por rango (nada de una consulta por
+cuenta) y reporta o corrige las diferencias.
+
+Historial: los ajustes con 'fecha' (registros de días pasados) también
+desplazan los cortes diarios de utils/historial desde ese día.
+
+Uso por consola (requiere el backfill de utils.montos):
+    python -m utils.saldos inicializar          # saldo_inicial de cuentas sin él
+                                                # (absorbe el desfase que ya tengan)
+    python -m utils.saldos conciliar [--lote 1000] [--reparar]
+
+--reparar invalida los ETag de /lista_cuentas y el cache de /graficos de los
+usuarios corregidos. Esas versiones viven en utils.cache.backend: solo llegan
+a los workers de la API con CACHE_BACKEND=redis. Con el backend en memoria
+el CLI incrementa sus propios contadores; hay que reiniciar la API (cambia la
+época de los ETag) para que los clientes dejen de recibir 304 viejos.
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update, select, cast, func, literal, Numeric, String
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, ListaCuenta, Registro
+from utils import montos, historial, cache
+
+
+def ajustar(db: Session, cuenta_id: int, delta_centavos: int, fecha: Optional[datetime] = None) -> None:
+    """
+    Suma 'delta_centavos' al saldo de la cuenta (doble escritura) y, si viene
+    'fecha' (la del registro), a los cortes de historial desde ese día. No hace commit.
+    """
+    if not delta_centavos:
+        return
+    texto = cast(ListaCuenta.cantidad, Numeric(16, 2))
+    delta = literal(montos.a_decimal(delta_centavos), Numeric(16, 2))
+    db.execute(
+        update(ListaCuenta)
+        .where(ListaCuenta.id == cuenta_id)
+        # Orden explícito: MySQL evalúa el SET de izquierda a derecha con los
+        # valores ya asignados. Los centavos van primero porque su respaldo
+        # (filas sin backfill) lee la columna de texto todavía sin modificar.
+        .ordered_values(
+            (ListaCuenta.cantidad_centavos,
+             func.coalesce(ListaCuenta.cantidad_centavos, func.round(texto * 100)) + delta_centavos),
+            (ListaCuenta.cantidad, cast(texto + delta, String)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if fecha is not None:
+        historial.desplazar(db, cuenta_id, fecha.date(), delta_centavos)
+
+
+def ajustar_varios(db: Session, deltas: dict[int, int], fecha: Optional[datetime] = None) -> None:
+    """
+    Aplica varios ajustes en orden de id de cuenta: dos transacciones que
+    tocan las mismas cuentas toman los locks en el mismo orden (sin deadlock).
+    """
+    for cuenta_id in sorted(deltas):
+        ajustar(db, cuenta_id, deltas[cuenta_id], fecha)
+
+
+def fijar(db: Session, cuenta_id: int, centavos: int) -> None:
+    """
+    Fija el saldo a mano (edición de la cuenta) moviendo el saldo inicial en
+    la misma diferencia, para que la conciliación siga cuadrando. Los cortes
+    del historial se mueven igual (el saldo inicial cambió). No hace commit.
+    """
+    fila = db.execute(
+        select(ListaCuenta.cantidad_centavos, ListaCuenta.cantidad)
+        .where(ListaCuenta.id == cuenta_id)
+        .with_for_update()
+    ).one_or_none()
+    if fila is None:
+        return
+    # Con el texto de respaldo (antes del corte de utils.montos puede no
+    # haber centavos): con NULL el saldo inicial quedaría en NULL y la
+    # cuenta saldría de la conciliación
+    diferencia = centavos - montos.centavos_cuenta(fila)
+    historial.desplazar(db, cuenta_id, None, diferencia)
+    db.execute(
+        update(ListaCuenta)
+        .where(ListaCuenta.id == cuenta_id)
+        .values(
+            saldo_inicial_centavos=ListaCuenta.saldo_inicial_centavos + diferencia,
+            cantidad_centavos=centavos,
+            cantidad=montos.a_texto(centavos),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ===============================
+# Conciliación
+# ===============================
+
+def _suma_registros():
+    """Suma de registros por cuenta (subconsulta correlacionada)."""
+    return (
+        select(func.coalesce(func.sum(Registro.monto_centavos), 0))
+        .where(Registro.lista_cuentas_id == ListaCuenta.id)
+        .correlate(ListaCuenta)
+        .scalar_subquery()
+    )
+
+
+def inicializar(lote: int = 1000) -> int:
+    """
+    Llena saldo_inicial_centavos donde falta, tomando el saldo actual como
+    verdadero: saldo_inicial = cantidad_centavos - suma de registros.
+    Por rangos de id con commit por lote.
+
+    Ojo: cualquier desfase que el saldo ya tenga (p. ej. el de los
+    eliminar_registro anteriores a utils/saldos, que no revertían el saldo)
+    queda absorbido en el saldo inicial y conciliar() no lo va a reportar.
+    Si hay una fuente confiable del saldo (estado de cuenta), corregir la
+    cuenta con fijar() después de inicializar.
+    """
+    total = 0
+    db = SessionLocal()
+    try:
+        for desde, hasta in montos._rangos(db, ListaCuenta, lote):
+            res = db.execute(
+                update(ListaCuenta)
+                .where(
+                    ListaCuenta.id >= desde, ListaCuenta.id < hasta,
+                    ListaCuenta.saldo_inicial_centavos.is_(None),
+                )
+                .values(saldo_inicial_centavos=ListaCuenta.cantidad_centavos - _suma_registros())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            total += res.rowcount
+        print(f"[SALDOS] saldo inicial llenado en {total} cuentas")
+        if total:
+            print("[SALDOS] aviso: se tomó el saldo actual como correcto; los desfases que ya "
+                  "tuvieran esas cuentas quedan en el saldo inicial y conciliar no los reporta")
+        return total
+    finally:
+        db.close()
+
+
+def conciliar(lote: int = 1000, reparar: bool = False, pausa: float = 0.0) -> int:
+    """
+    Compara cantidad_centavos contra saldo_inicial + suma de registros, un
+    rango de cuentas a la vez (una consulta agrupada por rango).
+
+    Con reparar=True las cuentas del rango se bloquean (FOR UPDATE) antes de
+    sumar: las escrituras concurrentes esperan y aplican su delta relativo
+    sobre el valor corregido, así que la corrección no pisa movimientos.
+    Devuelve el número de diferencias.
+    """
+    diferencias = 0
+    revisadas = 0
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rangos = list(montos._rangos(db, ListaCuenta, lote))
+        db.rollback()  # cada rango empieza transacción (y snapshot) nueva
+        for desde, hasta in rangos:
+            en_rango = (ListaCuenta.id >= desde, ListaCuenta.id < hasta)
+            if reparar:
+                # Primera lectura de la transacción: el snapshot de la suma
+                # se toma ya con los locks
+                db.execute(select(ListaCuenta.id).where(*en_rango).with_for_update()).all()
+
+            filas = db.execute(
+                select(
+                    ListaCuenta.id,
+                    ListaCuenta.usuarios_id,
+                    ListaCuenta.cantidad_centavos,
+                    ListaCuenta.saldo_inicial_centavos,
+                    func.coalesce(func.sum(Registro.monto_centavos), 0),
+                )
+                .outerjoin(Registro, Registro.lista_cuentas_id == ListaCuenta.id)
+                .where(*en_rango, ListaCuenta.saldo_inicial_centavos.is_not(None))
+                .group_by(ListaCuenta.id, ListaCuenta.usuarios_id, ListaCuenta.cantidad_centavos, ListaCuenta.saldo_inicial_centavos)
+            ).all()
+
+            correcciones = []
+            usuarios = set()
+            for id_, usuarios_id, actual, inicial, suma in filas:
+                esperado = inicial + int(suma)
+                if actual != esperado:
+                    print(f"[SALDOS] cuenta#{id_}: saldo={actual} esperado={esperado} (diferencia {esperado - (actual or 0)})")
+                    correcciones.append({"id": id_, "cantidad_centavos": esperado, "cantidad": montos.a_texto(esperado)})
+                    usuarios.add(usuarios_id)
+            revisadas += len(filas)
+            diferencias += len(correcciones)
+
+            if reparar and correcciones:
+                db.execute(update(ListaCuenta), correcciones)
+            db.commit()
+            if reparar:
+                # Solo alcanza a la API con CACHE_BACKEND=redis (ver docstring)
+                for usuarios_id in usuarios:
+                    cache.invalidar(usuarios_id, "lista_cuentas", "graficos")
+            if pausa:
+                time.sleep(pausa)
+
+        segundos = time.perf_counter() - inicio
+        print(f"[SALDOS] {revisadas} cuentas revisadas en {segundos:.1f}s, {diferencias} con diferencias"
+              + (" (corregidas)" if reparar and diferencias else ""))
+        return diferencias
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Saldo inicial y conciliación de saldos de cuentas")
+    parser.add_argument("accion", choices=["inicializar", "conciliar"])
+    parser.add_argument("--lote", type=int, default=1000, help="Cuentas por rango")
+    parser.add_argument("--pausa", type=float, default=0.0, help="Segundos entre rangos")
+    parser.add_argument("--reparar", action="store_true", help="Corrige diferencias (conciliar)")
+    args = parser.parse_args()
+
+    if args.accion == "inicializar":
+        inicializar(args.lote)
+    else:
+        if args.reparar and isinstance(cache.backend, cache.MemoriaBackend):
+            print("[SALDOS] aviso: CACHE_BACKEND no es redis; la API seguirá sirviendo "
+                  "/lista_cuentas y /graficos cacheados hasta reiniciarse")
+        conciliar(args.lote, args.reparar, args.pausa)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,124 @@
+# utils/sms.py
+"""
+Envío de SMS sin bloquear el event loop.
+
+Un solo httpx.AsyncClient por proceso (conexiones y TLS reutilizados), con
+timeouts y un semáforo que acota los envíos simultáneos. El proveedor se
+elige detrás de una interfaz mínima (ProveedorSMS.enviar):
+
+  - TwilioHTTP: API REST de Twilio. SMS_BASE_URL permite apuntarlo a un
+    servidor stub local (python -m utils.sms_stub) para pruebas y
+    mediciones de latencia sin credenciales.
+  - Desactivado: solo imprime (sin TWILIO_ACCOUNT_SID), igual que antes.
+"""
+import asyncio
 import os
+import time
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import httpx
+
+from utils import metricas
 
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN", "")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER", "")
 
-async def enviar_sms(numero: str, mensaje: str):
-    if not TWILIO_ACCOUNT_SID:
+SMS_BASE_URL = os.getenv("SMS_BASE_URL", "https://api.twilio.com")
+SMS_TIMEOUT = float(os.getenv("SMS_TIMEOUT", "10"))
+SMS_MAX_CONCURRENCIA = int(os.getenv("SMS_MAX_CONCURRENCIA", "10"))
+
+_stats = {"enviados": 0, "errores": 0, "segundos": 0.0}
+
+
+class ProveedorSMS(ABC):
+    nombre = "base"
+
+    @abstractmethod
+    async def enviar(self, numero: str, mensaje: str) -> bool:
+        """True si el proveedor aceptó el mensaje."""
+
+    async def cerrar(self) -> None:
+        pass
+
+
+class Desactivado(ProveedorSMS):
+    nombre = "desactivado"
+
+    async def enviar(self, numero: str, mensaje: str) -> bool:
         print(f"SMS (disabled): TO={numero}, MSG={mensaje[:50]}...")
         return False
-    
-    try:
-        from twilio.rest import Client
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
-        message = client.messages.create(
-            body=mensaje,
-            from_=TWILIO_PHONE_NUMBER,
-            to=numero
+
+
+class TwilioHTTP(ProveedorSMS):
+    nombre = "twilio"
+
+    def __init__(self, base_url: str = SMS_BASE_URL):
+        self._cliente = httpx.AsyncClient(
+            base_url=base_url,
+            auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+            timeout=httpx.Timeout(SMS_TIMEOUT, connect=min(SMS_TIMEOUT, 5.0)),
+            limits=httpx.Limits(
+                max_connections=SMS_MAX_CONCURRENCIA,
+                max_keepalive_connections=SMS_MAX_CONCURRENCIA,
+            ),
         )
-        
-        print(f"SMS sent to {numero}: {message.sid}")
-        return True
-    except ImportError:
-        print("Twilio not installed. Run: pip install twilio")
-        return False
-    except Exception as e:
-        print(f"SMS error: {e}")
-        return False
\ No newline at end of file
+        # Más allá del límite se espera aquí, no dentro del pool de httpx
+        self._semaforo = asyncio.Semaphore(SMS_MAX_CONCURRENCIA)
+
+    async def enviar(self, numero: str, mensaje: str) -> bool:
+        async with self._semaforo:
+            try:
+                resp = await self._cliente.post(
+                    f"/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Messages.json",
+                    data={"To": numero, "From": TWILIO_PHONE_NUMBER, "Body": mensaje},
+                )
+                resp.raise_for_status()
+                print(f"SMS sent to {numero}: {resp.json().get('sid')}")
+                return True
+            except Exception as e:
+                print(f"SMS error: {e}")
+                return False
+
+    async def cerrar(self) -> None:
+        await self._cliente.aclose()
+
+
+_proveedor: Optional[ProveedorSMS] = None
+
+
+def _obtener_proveedor() -> ProveedorSMS:
+    global _proveedor
+    if _proveedor is None:
+        _proveedor = TwilioHTTP() if TWILIO_ACCOUNT_SID else Desactivado()
+    return _proveedor
+
+
+async def cerrar() -> None:
+    global _proveedor
+    if _proveedor is not None:
+        await _proveedor.cerrar()
+        _proveedor = None
+
+
+async def enviar_sms(numero: str, mensaje: str) -> bool:
+    inicio = time.perf_counter()
+    enviado = await _obtener_proveedor().enviar(numero, mensaje)
+    _stats["enviados" if enviado else "errores"] += 1
+    _stats["segundos"] += time.perf_counter() - inicio
+    return enviado
+
+
+def estadisticas() -> dict:
+    total = _stats["enviados"] + _stats["errores"]
+    return {
+        "proveedor": _obtener_proveedor().nombre,
+        "max_concurrencia": SMS_MAX_CONCURRENCIA,
+        "enviados": _stats["enviados"],
+        "errores": _stats["errores"],
+        "promedio_ms": round(_stats["segundos"] / total * 1000, 1) if total else 0.0,
+    }
+
+
+metricas.registrar("sms", estadisticas)
@@ -0,0 +1,39 @@
+# utils/sms_stub.py
+"""
+Servidor stub que imita el endpoint de mensajes de Twilio, para probar y
+medir utils/sms.py sin credenciales ni red.
+
+    python -m utils.sms_stub --puerto 8099 --latencia 0.2
+    SMS_BASE_URL=http://127.0.0.1:8099 TWILIO_ACCOUNT_SID=AC_stub uvicorn main:app
+"""
+import argparse
+import asyncio
+import itertools
+
+from fastapi import FastAPI, Form
+
+app = FastAPI(title="SMS stub")
+_LATENCIA = {"segundos": 0.0}
+_ids = itertools.count(1)
+
+
+@app.post("/2010-04-01/Accounts/{sid}/Messages.json", status_code=201)
+async def crear_mensaje(sid: str, To: str = Form(...), From: str = Form(""), Body: str = Form(...)):
+    await asyncio.sleep(_LATENCIA["segundos"])
+    return {"sid": f"SM{next(_ids):032d}", "to": To, "from": From, "body": Body, "status": "queued"}
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub local de la API de SMS")
+    parser.add_argument("--puerto", type=int, default=8099)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos por request")
+    args = parser.parse_args()
+
+    _LATENCIA["segundos"] = args.latencia
+    uvicorn.run(app, host="127.0.0.1", port=args.puerto)
+
+
+if __name__ == "__main__":
+    main()